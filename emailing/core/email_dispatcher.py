@@ -0,0 +1,333 @@
+"""
+Envío masivo de correos en segundo plano con registro de entregas.
+
+Los mensajes se envían desde un bucle asyncio que corre en un hilo propio,
+de modo que Streamlit puede seguir respondiendo (y volver a ejecutar el
+script) mientras avanza el envío. La concurrencia está acotada y cada envío
+usa las conexiones persistentes de `SMTPSender`.
+
+El estado de cada mensaje (queued / sent / failed) se anota en un registro en
+disco (JSON Lines, una línea por cambio de estado) identificado por el Yaku y
+su asignación. Al reanudar un envío interrumpido se omiten los mensajes ya
+marcados como enviados, así que nadie recibe el mismo correo dos veces.
+
+Cada envío (su registro en disco y su hilo) se identifica por el nombre del
+envío más una huella del conjunto de mensajes (claves y destinatarios): dos
+coordinadores que envían conjuntos distintos no comparten ni el envío en
+curso ni el registro, y el mismo conjunto de mensajes se puede reanudar
+desde cualquier sesión, incluso después de recargar el navegador.
+"""
+
+import asyncio
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from shared.digest import config_digest
+from .email_sender import SMTPSender, EMAIL_POOL_SIZE
+
+# Envíos simultáneos (ajustable por variable de entorno)
+EMAIL_DISPATCH_CONCURRENCY = int(os.getenv("EMAIL_DISPATCH_CONCURRENCY", EMAIL_POOL_SIZE))
+
+# Registros de entrega (fuera del almacén temporal: no deben evictarse)
+EMAIL_JOURNAL_DIR = os.getenv(
+    "EMAIL_JOURNAL_DIR",
+    os.path.join(tempfile.gettempdir(), "match_yaku_ruru_email_journal")
+)
+
+STATUS_QUEUED = "queued"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+_jobs_lock = threading.Lock()
+_active_jobs: Dict[str, "DispatchJob"] = {}
+
+
+def dispatch_key(yaku_id: Any, ruru_id: Any, area: Any) -> str:
+    """
+    Clave de un correo en el registro: un Yaku y su asignación.
+
+    Args:
+        yaku_id: ID del Yaku
+        ruru_id: ID del Ruru asignado
+        area: Área de la asignación
+
+    Returns:
+        Clave de texto
+    """
+    return "|".join(str(value).strip() for value in (yaku_id, ruru_id, area))
+
+
+def dispatch_name(journal_name: str, messages: List[Dict[str, str]]) -> str:
+    """
+    Nombre de un envío para un conjunto concreto de mensajes.
+
+    Args:
+        journal_name: Nombre base del envío (p. ej. 'bienvenida_Arte & Cultura')
+        messages: Mensajes con 'key' y 'recipient_email'
+
+    Returns:
+        Nombre base seguido de la huella del conjunto de mensajes
+    """
+    identity = sorted((message['key'], message['recipient_email']) for message in messages)
+    return f"{journal_name}_{config_digest(identity)[:16]}"
+
+
+class DeliveryJournal:
+    """
+    Registro en disco del estado de cada correo de un envío masivo.
+
+    Cada cambio de estado se agrega como una línea JSON; al leer, la última
+    línea de cada clave es su estado vigente. Una línea incompleta (el proceso
+    se detuvo mientras escribía) se ignora.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Lee el estado vigente de cada correo.
+
+        Returns:
+            Diccionario {clave: último registro}
+        """
+        records: Dict[str, Dict[str, Any]] = {}
+        if not os.path.exists(self.file_path):
+            return records
+        with self._lock, open(self.file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                records[record["key"]] = record
+        return records
+
+    def record(self, key: str, status: str, recipient_email: str = "", error: Optional[str] = None) -> None:
+        """
+        Anota el estado de un correo y lo fuerza a disco.
+
+        Args:
+            key: Clave del correo (dispatch_key)
+            status: STATUS_QUEUED, STATUS_SENT o STATUS_FAILED
+            recipient_email: Destinatario
+            error: Mensaje de error si falló
+        """
+        line = json.dumps({
+            "key": key,
+            "status": status,
+            "recipient_email": recipient_email,
+            "error": error,
+            "timestamp": time.time()
+        }, ensure_ascii=False)
+        with self._lock, open(self.file_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def counts(self) -> Dict[str, int]:
+        """Número de correos en cada estado."""
+        counts = {STATUS_QUEUED: 0, STATUS_SENT: 0, STATUS_FAILED: 0}
+        for record in self.load().values():
+            counts[record["status"]] = counts.get(record["status"], 0) + 1
+        return counts
+
+    def clear(self) -> None:
+        """Elimina el registro (el próximo envío volverá a mandar todos los correos)."""
+        with self._lock:
+            if os.path.exists(self.file_path):
+                os.remove(self.file_path)
+
+
+def get_journal(journal_name: str) -> DeliveryJournal:
+    """
+    Obtiene el registro de entregas de un envío masivo.
+
+    Args:
+        journal_name: Nombre del envío (p. ej. 'bienvenida_Arte & Cultura')
+
+    Returns:
+        DeliveryJournal asociado al nombre
+    """
+    safe_name = re.sub(r'[^\w.\-]', '_', journal_name)
+    return DeliveryJournal(os.path.join(EMAIL_JOURNAL_DIR, f"{safe_name}.jsonl"))
+
+
+def pending_messages(messages: List[Dict[str, str]], journal: DeliveryJournal) -> List[Dict[str, str]]:
+    """
+    Filtra los mensajes que aún no constan como enviados en el registro.
+
+    Args:
+        messages: Mensajes con 'key', 'recipient_email', 'subject' y 'html_content'
+        journal: Registro de entregas
+
+    Returns:
+        Mensajes pendientes, en el mismo orden
+    """
+    records = journal.load()
+    return [
+        message for message in messages
+        if records.get(message['key'], {}).get("status") != STATUS_SENT
+    ]
+
+
+async def dispatch_async(
+    messages: List[Dict[str, str]],
+    journal: DeliveryJournal,
+    sender: SMTPSender,
+    concurrency: int = EMAIL_DISPATCH_CONCURRENCY,
+    on_result: Optional[Callable[[str, str], None]] = None
+) -> Dict[str, int]:
+    """
+    Envía los mensajes pendientes con a lo sumo `concurrency` envíos a la vez.
+
+    Args:
+        messages: Mensajes con 'key', 'recipient_email', 'subject' y 'html_content'
+        journal: Registro de entregas (se omiten los mensajes ya enviados)
+        sender: Emisor SMTP con conexiones persistentes
+        concurrency: Envíos simultáneos
+        on_result: Función opcional llamada con (clave, estado) al terminar cada mensaje
+
+    Returns:
+        Diccionario con el número de mensajes 'sent', 'failed' y 'skipped'
+    """
+    pending = pending_messages(messages, journal)
+    summary = {STATUS_SENT: 0, STATUS_FAILED: 0, "skipped": len(messages) - len(pending)}
+    if not pending:
+        return summary
+
+    for message in pending:
+        journal.record(message['key'], STATUS_QUEUED, message['recipient_email'])
+
+    concurrency = max(1, concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+
+        async def _deliver(message: Dict[str, str]) -> None:
+            async with semaphore:
+                if not message['recipient_email']:
+                    result = {'success': False, 'error': "El Yaku no tiene correo registrado"}
+                else:
+                    result = await loop.run_in_executor(
+                        executor, sender.send,
+                        message['recipient_email'], message['subject'], message['html_content']
+                    )
+            status = STATUS_SENT if result['success'] else STATUS_FAILED
+            journal.record(message['key'], status, message['recipient_email'], result['error'])
+            summary[status] += 1
+            if on_result:
+                on_result(message['key'], status)
+
+        await asyncio.gather(*(_deliver(message) for message in pending))
+
+    return summary
+
+
+class DispatchJob:
+    """
+    Envío masivo ejecutándose en un hilo en segundo plano.
+
+    El objeto puede guardarse en st.session_state y consultarse en cada
+    ejecución del script para mostrar el progreso.
+    """
+
+    def __init__(self, journal: DeliveryJournal, messages: List[Dict[str, str]], concurrency: int,
+                 sender_factory: Callable[[], SMTPSender]):
+        self.journal = journal
+        self.total = len(messages)
+        self.message_keys = frozenset(message['key'] for message in messages)
+        self.summary: Optional[Dict[str, int]] = None
+        self.error: Optional[str] = None
+        self.completed = 0
+        self._messages = messages
+        self._concurrency = concurrency
+        self._sender_factory = sender_factory
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _count(self, key: str, status: str) -> None:
+        """Cuenta un mensaje terminado (para mostrar el progreso)."""
+        self.completed += 1
+
+    def _run(self) -> None:
+        """Ejecuta el envío en el bucle asyncio del hilo."""
+        try:
+            with self._sender_factory() as sender:
+                self.summary = asyncio.run(
+                    dispatch_async(self._messages, self.journal, sender, self._concurrency, self._count)
+                )
+        except Exception as e:
+            self.error = str(e)
+
+    def start(self) -> "DispatchJob":
+        """Arranca el hilo de envío."""
+        self._thread.start()
+        return self
+
+    @property
+    def running(self) -> bool:
+        """Indica si el envío sigue en curso."""
+        return self._thread.is_alive()
+
+
+def start_dispatch(
+    journal_name: str,
+    messages: List[Dict[str, str]],
+    concurrency: Optional[int] = None,
+    sender_factory: Optional[Callable[[], SMTPSender]] = None
+) -> DispatchJob:
+    """
+    Inicia (o reanuda) un envío masivo en segundo plano.
+
+    Si ya hay un envío en curso con el mismo registro y los mismos mensajes,
+    se devuelve ese envío en lugar de iniciar otro, para no mandar dos veces
+    los mismos correos.
+
+    Args:
+        journal_name: Nombre del envío (identifica su registro en disco; ver dispatch_name)
+        messages: Mensajes con 'key', 'recipient_email', 'subject' y 'html_content'
+        concurrency: Envíos simultáneos (por defecto EMAIL_DISPATCH_CONCURRENCY)
+        sender_factory: Función que crea el emisor SMTP (por defecto SMTPSender con la configuración del .env)
+
+    Returns:
+        DispatchJob en ejecución
+
+    Raises:
+        RuntimeError: Si con ese registro ya corre un envío de otros mensajes
+    """
+    concurrency = max(1, concurrency or EMAIL_DISPATCH_CONCURRENCY)
+    if sender_factory is None:
+        sender_factory = lambda: SMTPSender(pool_size=concurrency)
+
+    with _jobs_lock:
+        job = _active_jobs.get(journal_name)
+        if job is not None and job.running:
+            if job.message_keys != frozenset(message['key'] for message in messages):
+                raise RuntimeError(f"Ya hay un envío en curso con otros mensajes para el registro '{journal_name}'.")
+            return job
+        job = DispatchJob(get_journal(journal_name), messages, concurrency, sender_factory)
+        _active_jobs[journal_name] = job
+        return job.start()
+
+
+def get_active_dispatch(journal_name: str) -> Optional[DispatchJob]:
+    """
+    Obtiene el último envío iniciado con un registro (en curso o terminado).
+
+    Args:
+        journal_name: Nombre del envío
+
+    Returns:
+        DispatchJob o None si no se inició ninguno en este proceso
+    """
+    with _jobs_lock:
+        return _active_jobs.get(journal_name)
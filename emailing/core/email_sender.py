@@ -1,10 +1,22 @@
 """
 Funciones para enviar correos usando SMTP.
+
+`send_single_email` abre una conexión por mensaje, lo cual basta para envíos
+sueltos. Para notificar a cientos de Yakus se usa `SMTPSender`, que mantiene
+un conjunto de conexiones ya autenticadas (EHLO, STARTTLS y LOGIN se hacen una
+sola vez por conexión), las reabre si el servidor las cierra, respeta un
+límite de mensajes por minuto y reintenta con espera exponencial los errores
+transitorios.
 """
 import smtplib
 import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from typing import Any, Dict, List, Optional
 from dotenv import load_dotenv
 import streamlit as st # Para mensajes
 
@@ -17,6 +29,46 @@ EMAIL_PORT = int(os.getenv("EMAIL_PORT", 587)) # Convertir a int
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
 
+# STARTTLS (desactivable para servidores SMTP locales de prueba)
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "true").strip().lower() not in ("0", "false", "no")
+
+# Envío por lotes
+EMAIL_POOL_SIZE = int(os.getenv("EMAIL_POOL_SIZE", 2))              # Conexiones SMTP simultáneas
+EMAIL_RATE_PER_MINUTE = int(os.getenv("EMAIL_RATE_PER_MINUTE", 60)) # 0 = sin límite
+EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", 3))          # Reintentos por mensaje
+EMAIL_RETRY_BACKOFF = float(os.getenv("EMAIL_RETRY_BACKOFF", 2.0))  # Espera base en segundos
+EMAIL_TIMEOUT = float(os.getenv("EMAIL_TIMEOUT", 30))               # Timeout de socket en segundos
+
+# Una conexión inactiva más de este tiempo se verifica con NOOP antes de usarla
+EMAIL_IDLE_CHECK_SECONDS = 30
+
+SENDER_DISPLAY_NAME = "Yachay Wasi Notificaciones"
+
+
+def build_message(sender_email: str, recipient_email: str, subject: str, html_content: str) -> MIMEMultipart:
+    """
+    Construye el mensaje MIME de un correo HTML.
+
+    Args:
+        sender_email: Email del remitente.
+        recipient_email: Email del destinatario.
+        subject: Asunto del correo.
+        html_content: Contenido HTML del correo.
+
+    Returns:
+        Mensaje listo para enviarse.
+    """
+    message = MIMEMultipart("alternative")
+    message["Subject"] = subject
+    message["From"] = f"{SENDER_DISPLAY_NAME} <{sender_email}>" # Nombre amigable
+    message["To"] = recipient_email
+
+    # Adjuntar parte HTML - Especificar UTF-8
+    part_html = MIMEText(html_content, "html", _charset="utf-8")
+    message.attach(part_html)
+    return message
+
+
 def send_single_email(recipient_email: str, subject: str, html_content: str):
     """
     Envía un único correo electrónico usando la configuración SMTP del .env.
@@ -36,14 +88,7 @@ def send_single_email(recipient_email: str, subject: str, html_content: str):
     sender_email = EMAIL_HOST_USER
 
     # Crear el mensaje
-    message = MIMEMultipart("alternative")
-    message["Subject"] = subject
-    message["From"] = f"Yachay Wasi Notificaciones <{sender_email}>" # Nombre amigable
-    message["To"] = recipient_email
-
-    # Adjuntar parte HTML - Especificar UTF-8
-    part_html = MIMEText(html_content, "html", _charset="utf-8")
-    message.attach(part_html)
+    message = build_message(sender_email, recipient_email, subject, html_content)
 
     # Intentar conexión y envío
     try:
@@ -60,4 +105,242 @@ def send_single_email(recipient_email: str, subject: str, html_content: str):
         raise
     except Exception as e:
         st.error(f"Error al enviar correo a {recipient_email}: {e}")
-        raise # Re-lanzar la excepción para que se capture en el bucle principal 
\ No newline at end of file
+        raise # Re-lanzar la excepción para que se capture en el bucle principal
+
+
+def _is_permanent_error(error: Exception) -> bool:
+    """Indica si un error SMTP no se resolverá reintentando (respuestas 5xx, autenticación rechazada)."""
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        # Códigos por destinatario: un 4xx (p. ej. greylisting 450/451) es transitorio
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+class _RateLimiter:
+    """Reparte los envíos a intervalos regulares para no superar N mensajes por minuto."""
+
+    def __init__(self, per_minute: int):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self) -> None:
+        """Bloquea hasta el siguiente turno de envío disponible."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class SMTPSender:
+    """
+    Envío de correos sobre un conjunto de conexiones SMTP persistentes.
+
+    Uso:
+        with SMTPSender() as sender:
+            results = sender.send_batch([
+                {'recipient_email': ..., 'subject': ..., 'html_content': ...},
+            ])
+
+    Los errores de cada mensaje se devuelven en el resultado en lugar de
+    lanzarse, para que un correo fallido no detenga el resto del lote.
+    """
+
+    def __init__(
+        self,
+        host: str = EMAIL_HOST,
+        port: int = EMAIL_PORT,
+        user: Optional[str] = EMAIL_HOST_USER,
+        password: Optional[str] = EMAIL_HOST_PASSWORD,
+        use_tls: bool = EMAIL_USE_TLS,
+        pool_size: int = EMAIL_POOL_SIZE,
+        rate_per_minute: int = EMAIL_RATE_PER_MINUTE,
+        max_retries: int = EMAIL_MAX_RETRIES,
+        backoff: float = EMAIL_RETRY_BACKOFF,
+        timeout: float = EMAIL_TIMEOUT,
+        sender_email: Optional[str] = None
+    ):
+        """
+        Args:
+            host: Servidor SMTP.
+            port: Puerto del servidor.
+            user: Usuario SMTP (sin usuario no se hace LOGIN).
+            password: Contraseña SMTP.
+            use_tls: Si se negocia STARTTLS tras conectar.
+            pool_size: Máximo de conexiones abiertas a la vez.
+            rate_per_minute: Máximo de mensajes por minuto (0 = sin límite).
+            max_retries: Reintentos de un mensaje ante errores transitorios.
+            backoff: Espera base entre reintentos; se duplica en cada intento.
+            timeout: Timeout de socket de cada conexión.
+            sender_email: Remitente (por defecto, el usuario SMTP).
+        """
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.pool_size = max(1, pool_size)
+        self.max_retries = max(0, max_retries)
+        self.backoff = backoff
+        self.timeout = timeout
+        self.sender_email = sender_email or user or ""
+
+        self._rate_limiter = _RateLimiter(rate_per_minute)
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._closed = False
+
+    def __enter__(self) -> "SMTPSender":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    # --- Conexiones ---
+
+    def _connect(self) -> smtplib.SMTP:
+        """Abre y autentica una nueva conexión."""
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.ehlo()
+            if self.use_tls:
+                server.starttls()
+                server.ehlo()
+            if self.user and self.password:
+                server.login(self.user, self.password)
+        except Exception:
+            self._discard(server)
+            raise
+        return server
+
+    @staticmethod
+    def _discard(server: smtplib.SMTP) -> None:
+        """Cierra una conexión sin propagar errores."""
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _is_alive(server: smtplib.SMTP) -> bool:
+        """Comprueba con NOOP que el servidor no haya cerrado la conexión."""
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _acquire(self) -> smtplib.SMTP:
+        """Toma una conexión libre (reutilizada o nueva). Requiere un turno de _slots."""
+        while True:
+            try:
+                server, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - last_used < EMAIL_IDLE_CHECK_SECONDS or self._is_alive(server):
+                return server
+            self._discard(server)
+
+    def _release(self, server: smtplib.SMTP) -> None:
+        """Devuelve una conexión sana al conjunto de conexiones libres."""
+        if self._closed:
+            self._discard(server)
+        else:
+            self._idle.put((server, time.monotonic()))
+
+    def _recycle(self, server: smtplib.SMTP, error: Exception) -> None:
+        """Tras un error, devuelve la conexión al conjunto si sigue viva o la descarta."""
+        # smtplib.SMTPException hereda de OSError: un error de protocolo deja la
+        # conexión utilizable, un error de socket o una desconexión no
+        if isinstance(error, smtplib.SMTPServerDisconnected) or not isinstance(error, smtplib.SMTPException):
+            self._discard(server)
+            return
+        try:
+            server.rset()
+        except Exception:
+            self._discard(server)
+            return
+        self._release(server)
+
+    def close(self) -> None:
+        """Cierra todas las conexiones libres."""
+        self._closed = True
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(server)
+
+    # --- Envío ---
+
+    def send(self, recipient_email: str, subject: str, html_content: str) -> Dict[str, Any]:
+        """
+        Envía un correo reutilizando las conexiones del conjunto.
+
+        Args:
+            recipient_email: Email del destinatario.
+            subject: Asunto del correo.
+            html_content: Contenido HTML del correo.
+
+        Returns:
+            Diccionario con 'recipient_email', 'success' (bool), 'error'
+            (mensaje o None) y 'attempts'.
+        """
+        message_bytes = build_message(self.sender_email, recipient_email, subject, html_content).as_bytes()
+        error: Optional[Exception] = None
+        attempts = 0
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.backoff * (2 ** (attempt - 1)))
+            attempts += 1
+            self._rate_limiter.wait()
+
+            with self._slots:
+                server = None
+                try:
+                    server = self._acquire()
+                    server.sendmail(self.sender_email, recipient_email, message_bytes)
+                except Exception as e:
+                    error = e
+                    if server is not None:
+                        self._recycle(server, e)
+                    if _is_permanent_error(e):
+                        break
+                    continue
+                self._release(server)
+
+            return {'recipient_email': recipient_email, 'success': True, 'error': None, 'attempts': attempts}
+
+        return {'recipient_email': recipient_email, 'success': False, 'error': str(error), 'attempts': attempts}
+
+    def send_batch(self, messages: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Envía varios correos usando hasta `pool_size` conexiones en paralelo.
+
+        Args:
+            messages: Lista de diccionarios con 'recipient_email', 'subject'
+                y 'html_content'.
+
+        Returns:
+            Lista de resultados (ver `send`) en el mismo orden que `messages`.
+        """
+        if not messages:
+            return []
+
+        def _send(message: Dict[str, str]) -> Dict[str, Any]:
+            return self.send(message['recipient_email'], message['subject'], message['html_content'])
+
+        with ThreadPoolExecutor(max_workers=min(self.pool_size, len(messages))) as executor:
+            return list(executor.map(_send, messages))
@@ -1,6 +1,14 @@
 """
 Gestiona la plantilla de correo y la personalización con datos.
+
+La plantilla se compila una sola vez en segmentos (texto fijo, placeholders
+`[Nombre]` y bloques condicionales `[SI_X]...[/SI_X]`). Renderizar consiste
+en unir esos segmentos; `render_batch` lo hace para todas las filas de un
+DataFrame a la vez, evaluando cada placeholder y cada condición por columna.
 """
+import re
+from typing import Any, Callable, Dict, List, Tuple
+
 import pandas as pd
 
 # Plantilla HTML base para el correo del Yaku
@@ -33,6 +41,152 @@ YAKU_EMAIL_TEMPLATE = """
 El Equipo de Yachay Wasi</p>
 """
 
+# --- Placeholders y condiciones de la plantilla ---
+
+# Placeholders reemplazados con el valor de la columna del mismo nombre
+TEMPLATE_PLACEHOLDERS = [
+    'Nombre Yaku', 'Area', 'Nombre Ruru', 'Grado Original Ruru',
+    'Nombre Apoderado Ruru', 'Celular Apoderado Ruru', 'Quechua Yaku', 'Quechua Ruru',
+    'Asignatura/Taller Asignado', 'Celular Asesoria Ruru'
+]
+
+
+def _has_value(value: Any) -> bool:
+    """Valor no vacío."""
+    return pd.notna(value) and str(value).strip() != ""
+
+
+def _has_subject(value: Any) -> bool:
+    """Asignatura/Taller definido (ni vacío ni 'N/A')."""
+    return pd.notna(value) and str(value).strip() not in ("N/A", "")
+
+
+def _speaks_quechua(value: Any) -> bool:
+    """Nivel de quechua distinto de 'No lo hablo'."""
+    return pd.notna(value) and value != 'No lo hablo'
+
+
+# Condiciones de los bloques [SI_X]...[/SI_X]:
+# {bloque: [(columna, valor_por_defecto, prueba), ...]}; el bloque se muestra si todas se cumplen
+TEMPLATE_CONDITIONS: Dict[str, List[Tuple[str, Any, Callable[[Any], bool]]]] = {
+    'SI_ASIGNATURA_TALLER': [('Asignatura/Taller Asignado', '', _has_subject)],
+    'SI_CELULAR_ASESORIA': [('Celular Asesoria Ruru', '', _has_value)],
+    'SI_QUECHUA': [('Quechua Yaku', 'No lo hablo', _speaks_quechua), ('Quechua Ruru', 'No lo hablo', _speaks_quechua)],
+}
+
+_TAG_PATTERN = re.compile(r"\[(/?)([^\[\]]+)\]")
+
+
+class CompiledTemplate:
+    """
+    Plantilla de correo analizada una sola vez.
+
+    Cada segmento es ('text', texto), ('var', placeholder) o
+    ('if', bloque, segmentos_internos). Los corchetes que no corresponden a un
+    placeholder o bloque conocido se conservan como texto.
+    """
+
+    def __init__(self, template: str, placeholders: List[str], conditions: Dict[str, list]):
+        self.placeholders = set(placeholders)
+        self.conditions = conditions
+        self.segments = self._parse(template)
+
+    def _parse(self, template: str) -> list:
+        """Divide la plantilla en segmentos, anidando los bloques condicionales."""
+        root: list = []
+        stack: List[Tuple[str, list]] = [("", root)]
+        position = 0
+        for match in _TAG_PATTERN.finditer(template):
+            closing, name = match.group(1), match.group(2)
+            if name in self.conditions:
+                segment = None
+            elif not closing and name in self.placeholders:
+                segment = ('var', name)
+            else:
+                continue # Corchetes sin significado: quedan como texto
+
+            current = stack[-1][1]
+            if match.start() > position:
+                current.append(('text', template[position:match.start()]))
+            position = match.end()
+
+            if segment is not None:
+                current.append(segment)
+            elif not closing:
+                block: list = []
+                current.append(('if', name, block))
+                stack.append((name, block))
+            elif stack[-1][0] == name:
+                stack.pop()
+            else:
+                raise ValueError(f"Cierre [/{name}] sin apertura en la plantilla")
+
+        if len(stack) > 1:
+            raise ValueError(f"Bloque [{stack[-1][0]}] sin cierre en la plantilla")
+        if position < len(template):
+            root.append(('text', template[position:]))
+        return root
+
+    def _render_segments(self, segments: list, values: Dict[str, List[str]], masks: Dict[str, List[bool]], n_rows: int) -> List[List[str]]:
+        """Devuelve, por segmento, la lista de textos de cada fila."""
+        columns: List[List[str]] = []
+        for segment in segments:
+            if segment[0] == 'text':
+                columns.append([segment[1]] * n_rows)
+            elif segment[0] == 'var':
+                columns.append(values[segment[1]])
+            else:
+                inner = [''.join(parts) for parts in zip(*self._render_segments(segment[2], values, masks, n_rows))] \
+                    if segment[2] else [''] * n_rows
+                columns.append([text if shown else '' for text, shown in zip(inner, masks[segment[1]])])
+        return columns
+
+    def _render_columns(self, get_column: Callable[[str, Any], List[Any]], n_rows: int) -> List[str]:
+        """Renderiza n_rows correos a partir de una función que da los valores de una columna."""
+        values = {name: [str(value) for value in get_column(name, '')] for name in self.placeholders}
+        masks: Dict[str, List[bool]] = {}
+        for block, tests in self.conditions.items():
+            mask = [True] * n_rows
+            for column, default, test in tests:
+                mask = [shown and test(value) for shown, value in zip(mask, get_column(column, default))]
+            masks[block] = mask
+        return [''.join(parts) for parts in zip(*self._render_segments(self.segments, values, masks, n_rows))]
+
+    def render(self, row: pd.Series) -> str:
+        """
+        Renderiza la plantilla para una fila.
+
+        Args:
+            row: Fila (Serie de Pandas) con los datos de la asignación.
+
+        Returns:
+            HTML del correo.
+        """
+        return self._render_columns(lambda name, default: [row.get(name, default)], 1)[0]
+
+    def render_batch(self, df: pd.DataFrame) -> pd.Series:
+        """
+        Renderiza la plantilla para todas las filas de un DataFrame.
+
+        Args:
+            df: DataFrame con los datos de las asignaciones.
+
+        Returns:
+            Serie con el HTML de cada fila, con el mismo índice que df.
+        """
+        n_rows = len(df)
+
+        def get_column(name: str, default: Any) -> List[Any]:
+            if name in df.columns:
+                return df[name].tolist()
+            return [default] * n_rows
+
+        return pd.Series(self._render_columns(get_column, n_rows), index=df.index, dtype=object)
+
+
+_YAKU_TEMPLATE = CompiledTemplate(YAKU_EMAIL_TEMPLATE, TEMPLATE_PLACEHOLDERS, TEMPLATE_CONDITIONS)
+
+
 def get_yaku_email_body(assignment_data: pd.Series) -> str:
     """
     Genera el cuerpo HTML personalizado para el correo del Yaku.
@@ -43,58 +197,17 @@ def get_yaku_email_body(assignment_data: pd.Series) -> str:
     Returns:
         El string HTML del cuerpo del correo personalizado.
     """
-    html_body = YAKU_EMAIL_TEMPLATE
-
-    # Reemplazar placeholders básicos
-    placeholders = [
-        'Nombre Yaku', 'Area', 'Nombre Ruru', 'Grado Original Ruru',
-        'Nombre Apoderado Ruru', 'Celular Apoderado Ruru', 'Quechua Yaku', 'Quechua Ruru'
-    ]
-    for placeholder in placeholders:
-        value = assignment_data.get(placeholder, '')
-        replacement_value = str(value)
-        html_body = html_body.replace(f"[{placeholder}]", replacement_value)
-
-    # Reemplazos condicionales
-    # Asignatura/Taller
-    asignatura_taller = assignment_data.get('Asignatura/Taller Asignado', '')
-    if pd.notna(asignatura_taller) and str(asignatura_taller).strip() != "N/A" and str(asignatura_taller).strip() != "":
-        html_body = html_body.replace("[SI_ASIGNATURA_TALLER]", "").replace("[/SI_ASIGNATURA_TALLER]", "")
-        html_body = html_body.replace("[Asignatura/Taller Asignado]", str(asignatura_taller))
-    else:
-        # Eliminar el bloque condicional si no aplica
-        start_tag = "[SI_ASIGNATURA_TALLER]"
-        end_tag = "[/SI_ASIGNATURA_TALLER]"
-        start_index = html_body.find(start_tag)
-        end_index = html_body.find(end_tag)
-        if start_index != -1 and end_index != -1:
-            html_body = html_body[:start_index] + html_body[end_index + len(end_tag):]
-
-    # Celular Asesoria
-    celular_asesoria = assignment_data.get('Celular Asesoria Ruru', '')
-    if pd.notna(celular_asesoria) and str(celular_asesoria).strip() != "":
-         html_body = html_body.replace("[SI_CELULAR_ASESORIA]", "").replace("[/SI_CELULAR_ASESORIA]", "")
-         html_body = html_body.replace("[Celular Asesoria Ruru]", str(celular_asesoria))
-    else:
-        start_tag = "[SI_CELULAR_ASESORIA]"
-        end_tag = "[/SI_CELULAR_ASESORIA]"
-        start_index = html_body.find(start_tag)
-        end_index = html_body.find(end_tag)
-        if start_index != -1 and end_index != -1:
-            html_body = html_body[:start_index] + html_body[end_index + len(end_tag):]
-
-    # Quechua
-    q_yaku = assignment_data.get('Quechua Yaku', 'No lo hablo')
-    q_ruru = assignment_data.get('Quechua Ruru', 'No lo hablo')
-    if pd.notna(q_yaku) and q_yaku != 'No lo hablo' and pd.notna(q_ruru) and q_ruru != 'No lo hablo':
-        html_body = html_body.replace("[SI_QUECHUA]", "").replace("[/SI_QUECHUA]", "")
-        # Los placeholders [Quechua Yaku] y [Quechua Ruru] ya fueron reemplazados antes
-    else:
-         start_tag = "[SI_QUECHUA]"
-         end_tag = "[/SI_QUECHUA]"
-         start_index = html_body.find(start_tag)
-         end_index = html_body.find(end_tag)
-         if start_index != -1 and end_index != -1:
-             html_body = html_body[:start_index] + html_body[end_index + len(end_tag):]
-
-    return html_body 
\ No newline at end of file
+    return _YAKU_TEMPLATE.render(assignment_data)
+
+
+def render_batch(assignments_df: pd.DataFrame) -> pd.Series:
+    """
+    Genera el cuerpo HTML del correo de cada Yaku de un DataFrame de asignaciones.
+
+    Args:
+        assignments_df: DataFrame de asignaciones formateado (una fila por asignación).
+
+    Returns:
+        Serie con el HTML de cada asignación, con el mismo índice que assignments_df.
+    """
+    return _YAKU_TEMPLATE.render_batch(assignments_df)
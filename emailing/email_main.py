@@ -7,8 +7,15 @@ y obtener el asunto y cuerpo del correo personalizado para el Yaku, listo para c
 import streamlit as st
 import pandas as pd
 
-# Importar solo el gestor de plantillas
-from .core.template_manager import get_yaku_email_body
+# Gestor de plantillas y envío masivo
+from .core.template_manager import get_yaku_email_body, render_batch
+from .core.email_dispatcher import dispatch_key
+from .utils.bulk_send import render_bulk_send
+from shared.upload_cache import parse_upload
+from shared.digest import dataframe_digest
+
+# Nombre del registro de entregas de esta página
+ASSIGNMENT_JOURNAL_NAME = "asignacion"
 
 # Columnas mínimas requeridas en la hoja 'Asignaciones'
 REQUIRED_ASSIGNMENT_COLS = [
@@ -17,6 +24,87 @@ REQUIRED_ASSIGNMENT_COLS = [
     'Quechua Yaku', 'Quechua Ruru', 'Asignatura/Taller Asignado'
 ]
 
+def _assignment_subject(ruru_name) -> str:
+    """Asunto del correo de asignación para un Ruru."""
+    return f"¡Asignación Yachay Wasi: Conoce a tu Ruru {ruru_name}!"
+
+
+def _build_bulk_messages(assignments_df: pd.DataFrame) -> list:
+    """
+    Construye los mensajes de todas las asignaciones para el envío masivo.
+
+    Args:
+        assignments_df: DataFrame de la hoja 'Asignaciones'
+
+    Returns:
+        Lista de mensajes con 'key', 'recipient_email', 'subject' y 'html_content'
+    """
+    def column(name: str, default='') -> list:
+        if name in assignments_df.columns:
+            return assignments_df[name].tolist()
+        return [default] * len(assignments_df)
+
+    messages = []
+    for yaku_id, ruru_id, area, recipient, ruru_name, html_body in zip(
+        column('ID Yaku'), column('ID Ruru'), column('Area'), column('Correo Yaku'),
+        column('Nombre Ruru', 'N/A'), render_batch(assignments_df)
+    ):
+        messages.append({
+            'key': dispatch_key(yaku_id, ruru_id, area),
+            'recipient_email': str(recipient).strip() if pd.notna(recipient) else '',
+            'subject': _assignment_subject(ruru_name),
+            'html_content': html_body
+        })
+    return messages
+
+
+def _cached_bulk_messages(assignments_df: pd.DataFrame) -> list:
+    """
+    Devuelve los mensajes del envío masivo, renderizados una sola vez por
+    contenido de las asignaciones (no en cada rerun de la página).
+
+    Args:
+        assignments_df: DataFrame de la hoja 'Asignaciones'
+
+    Returns:
+        Lista de mensajes (ver _build_bulk_messages)
+    """
+    digest = dataframe_digest(assignments_df)
+    cached = st.session_state.get('email_prep_bulk_messages')
+    if cached is None or cached[0] != digest:
+        cached = (digest, _build_bulk_messages(assignments_df))
+        st.session_state.email_prep_bulk_messages = cached
+    return cached[1]
+
+
+def load_assignments_for_emails(uploaded_file):
+    """
+    Lee y valida la hoja 'Asignaciones' del archivo de resultados del match.
+
+    Args:
+        uploaded_file: Excel de resultados subido
+
+    Returns:
+        DataFrame con la columna 'display_label' agregada, o None si hubo un error
+    """
+    try:
+        temp_df = pd.read_excel(uploaded_file, sheet_name='Asignaciones')
+        missing = [col for col in REQUIRED_ASSIGNMENT_COLS if col not in temp_df.columns]
+        if missing:
+            st.error(f"❌ El archivo Excel no contiene las columnas requeridas en la hoja 'Asignaciones': {', '.join(missing)}")
+            return None
+        # Crear una columna legible para el selector
+        temp_df['display_label'] = (
+            temp_df['Nombre Yaku'].astype(str) + " - " + temp_df['Nombre Ruru'].astype(str)
+            + " (" + temp_df['ID Yaku'].astype(str) + ")"
+        )
+        st.success(f"✅ Archivo de resultados cargado. Se encontraron {len(temp_df)} asignaciones.")
+        return temp_df
+    except Exception as e:
+        st.error(f"❌ Error al leer la hoja 'Asignaciones' del archivo Excel: {e}")
+        return None
+
+
 def email_page():
     """Renderiza la página de preparación manual de correos."""
     st.title(" Módulo de Preparación Manual de Correos")
@@ -38,23 +126,13 @@ def email_page():
          st.session_state.assignments_prep_df = None
 
     if uploaded_results_file:
-        try:
-            temp_df = pd.read_excel(uploaded_results_file, sheet_name='Asignaciones')
-            missing = [col for col in REQUIRED_ASSIGNMENT_COLS if col not in temp_df.columns]
-            if missing:
-                st.error(f"❌ El archivo Excel no contiene las columnas requeridas en la hoja 'Asignaciones': {', '.join(missing)}")
-                st.session_state.assignments_prep_df = None
-            else:
-                # Crear una columna legible para el selector
-                temp_df['display_label'] = temp_df.apply(lambda row: f"{row['Nombre Yaku']} - {row['Nombre Ruru']} ({row['ID Yaku']})", axis=1)
-                st.session_state.assignments_prep_df = temp_df
-                st.success(f"✅ Archivo de resultados cargado. Se encontraron {len(st.session_state.assignments_prep_df)} asignaciones.")
-                with st.expander("Vista previa de Asignaciones Cargadas"):
-                    st.dataframe(st.session_state.assignments_prep_df[['display_label', 'ID Yaku', 'ID Ruru', 'Correo Yaku']].head())
-
-        except Exception as e:
-            st.error(f"❌ Error al leer la hoja 'Asignaciones' del archivo Excel: {e}")
-            st.session_state.assignments_prep_df = None
+        # Solo se vuelve a leer el Excel si cambia el archivo subido
+        st.session_state.assignments_prep_df = parse_upload(
+            uploaded_results_file, "email_prep_results_upload", load_assignments_for_emails
+        )
+        if st.session_state.assignments_prep_df is not None:
+            with st.expander("Vista previa de Asignaciones Cargadas"):
+                st.dataframe(st.session_state.assignments_prep_df[['display_label', 'ID Yaku', 'ID Ruru', 'Correo Yaku']].head())
 
     # Acceder al DataFrame desde el estado de sesión
     assignments_df = st.session_state.assignments_prep_df
@@ -79,7 +157,7 @@ def email_page():
             # Generar contenido del correo
             email_to = selected_row.get('Correo Yaku', 'Correo no encontrado')
             ruru_name = selected_row.get('Nombre Ruru', 'N/A')
-            subject = f"¡Asignación Yachay Wasi: Conoce a tu Ruru {ruru_name}!"
+            subject = _assignment_subject(ruru_name)
             try:
                 html_body = get_yaku_email_body(selected_row)
 
@@ -136,5 +214,14 @@ def email_page():
             except Exception as e:
                 st.error(f"Error al generar el cuerpo del correo: {e}")
 
+        # --- Envío Masivo ---
+        st.header("3. Envío Automático a Todos los Yakus")
+        st.write("Envía el correo de asignación a todos los Yakus del archivo. Si el envío se interrumpe, "
+                 "al reanudarlo no se reenvían los correos ya enviados.")
+        try:
+            render_bulk_send(ASSIGNMENT_JOURNAL_NAME, _cached_bulk_messages(assignments_df), key_prefix="email_prep")
+        except Exception as e:
+            st.error(f"Error al preparar el envío masivo: {e}")
+
     else:
         st.info("Carga un archivo de resultados válido para preparar los correos.") 
\ No newline at end of file
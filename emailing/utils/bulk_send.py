@@ -0,0 +1,92 @@
+"""
+Sección de Streamlit para el envío masivo de correos.
+
+La comparten el generador de correos del módulo Match y la página de
+preparación de correos: muestra el progreso del envío en segundo plano y
+permite iniciarlo, reanudarlo o reiniciar su registro de entregas.
+"""
+from typing import Dict, List
+
+import pandas as pd
+import streamlit as st
+
+from emailing.core.email_sender import EMAIL_HOST, EMAIL_PORT, EMAIL_HOST_USER
+from emailing.core.email_dispatcher import (
+    dispatch_name, get_journal, start_dispatch, get_active_dispatch,
+    STATUS_SENT, STATUS_FAILED
+)
+
+# Segundos entre actualizaciones del progreso mientras se envía
+PROGRESS_REFRESH_SECONDS = 2
+
+
+def _journal_status(journal_name: str, messages: List[Dict[str, str]]) -> Dict[str, dict]:
+    """Estado registrado de cada uno de los mensajes actuales."""
+    records = get_journal(journal_name).load()
+    return {message['key']: records[message['key']] for message in messages if message['key'] in records}
+
+
+def render_bulk_send(journal_name: str, messages: List[Dict[str, str]], key_prefix: str) -> None:
+    """
+    Muestra los controles y el progreso del envío masivo.
+
+    El envío en curso y el registro de entregas corresponden solo a este
+    conjunto de mensajes (ver dispatch_name): otro coordinador que envíe
+    otros mensajes no ve ni reinicia este envío.
+
+    Args:
+        journal_name: Nombre base del envío
+        messages: Mensajes con 'key', 'recipient_email', 'subject' y 'html_content'
+        key_prefix: Prefijo para las claves de los widgets
+    """
+    st.caption(f"Servidor SMTP: {EMAIL_HOST}:{EMAIL_PORT}")
+    if not EMAIL_HOST_USER:
+        st.warning("No hay credenciales de correo (EMAIL_HOST_USER, EMAIL_HOST_PASSWORD) en el archivo .env; "
+                   "el envío solo funcionará con un servidor SMTP que no pida autenticación.")
+
+    journal_name = dispatch_name(journal_name, messages)
+    job = get_active_dispatch(journal_name)
+    running = job is not None and job.running
+
+    if running:
+        @st.fragment(run_every=PROGRESS_REFRESH_SECONDS)
+        def _progress():
+            current = get_active_dispatch(journal_name)
+            if current is None or not current.running:
+                st.rerun() # Mostrar el resumen final en la página completa
+            total = max(current.total, 1)
+            st.progress(current.completed / total, text=f"Enviando correos... {current.completed} de {current.total}")
+        _progress()
+    else:
+        if job is not None and job.error:
+            st.error(f"El envío se detuvo por un error: {job.error}")
+        elif job is not None and job.summary is not None:
+            summary = job.summary
+            st.success(f"Envío terminado: {summary[STATUS_SENT]} enviados, {summary[STATUS_FAILED]} fallidos, "
+                       f"{summary['skipped']} ya enviados anteriormente.")
+
+    statuses = _journal_status(journal_name, messages)
+    sent_count = sum(1 for record in statuses.values() if record['status'] == STATUS_SENT)
+    failed = [record for record in statuses.values() if record['status'] == STATUS_FAILED]
+    pending_count = len(messages) - sent_count
+
+    st.write(f"**Enviados:** {sent_count} de {len(messages)} · **Pendientes:** {pending_count}")
+    if failed and not running:
+        with st.expander(f"Correos fallidos ({len(failed)})"):
+            st.dataframe(pd.DataFrame(failed)[['recipient_email', 'error']])
+
+    col_send, col_reset = st.columns(2)
+    with col_send:
+        button_label = "Reanudar envío" if sent_count else "📨 Enviar todos los correos"
+        if st.button(button_label, key=f"{key_prefix}_bulk_send", disabled=running or pending_count == 0):
+            try:
+                start_dispatch(journal_name, messages)
+            except RuntimeError as e:
+                st.error(str(e))
+            else:
+                st.rerun()
+    with col_reset:
+        if st.button("Reiniciar registro de envíos", key=f"{key_prefix}_bulk_reset", disabled=running or not statuses,
+                     help="Olvida qué correos ya se enviaron; el próximo envío volverá a mandarlos todos."):
+            get_journal(journal_name).clear()
+            st.rerun()
@@ -2,7 +2,43 @@
 Algoritmo para encontrar la asignación óptima 1-a-1 Yaku-Ruru.
 """
 import pandas as pd
-from typing import List, Dict, Any, Tuple, Set
+from typing import List, Dict, Any, Tuple, Set, Optional
+
+# Valores de 'Score Match' de asignaciones decididas a mano (no se reasignan)
+LOCKED_SCORE_LABELS = ['MANUAL', 'FINAL']
+ASSIGNMENT_COLUMNS = ['yaku_id', 'ruru_id', 'score']
+
+def _greedy_assign(
+    scores_list: List[Dict[str, Any]],
+    assigned_yakus: Set[str],
+    assigned_rurus: Set[str]
+) -> List[Dict[str, Any]]:
+    """
+    Asigna pares de mayor a menor puntaje mientras ambos estén libres.
+
+    Args:
+        scores_list: Pares candidatos con 'yaku_id', 'ruru_id' y 'score'.
+        assigned_yakus: IDs de Yakus ya ocupados (se actualiza).
+        assigned_rurus: IDs de Rurus ya ocupados (se actualiza).
+
+    Returns:
+        Lista de pares asignados.
+    """
+    # Ordenar los scores de mayor a menor (sorted es estable: los empates se resuelven por orden)
+    sorted_scores = sorted(scores_list, key=lambda x: x['score'], reverse=True)
+
+    final_assignments: List[Dict[str, Any]] = []
+    for potential_match in sorted_scores:
+        yaku_id = potential_match['yaku_id']
+        ruru_id = potential_match['ruru_id']
+
+        # Verificar si ambos están disponibles
+        if yaku_id not in assigned_yakus and ruru_id not in assigned_rurus:
+            # Asignar!
+            final_assignments.append(potential_match)
+            assigned_yakus.add(yaku_id)
+            assigned_rurus.add(ruru_id)
+    return final_assignments
 
 def find_best_matches(
     yakus_df: pd.DataFrame,
@@ -28,31 +64,12 @@ def find_best_matches(
         all_ruru_ids = set(rurus_df['ID del estudiante:'].unique())
         return pd.DataFrame(columns=['yaku_id', 'ruru_id', 'score']), all_yaku_ids, all_ruru_ids
 
-    # 1. Ordenar los scores de mayor a menor
-    sorted_scores = sorted(scores_list, key=lambda x: x['score'], reverse=True)
-
-    # 2. Inicializar conjuntos para llevar registro de asignados
+    # 1. Inicializar conjuntos para llevar registro de asignados
     assigned_yakus: Set[str] = set()
     assigned_rurus: Set[str] = set()
-    final_assignments: List[Dict[str, Any]] = []
-
-    # 3. Iterar y asignar (Algoritmo Greedy)
-    for potential_match in sorted_scores:
-        yaku_id = potential_match['yaku_id']
-        ruru_id = potential_match['ruru_id']
-
-        # Verificar si ambos están disponibles
-        if yaku_id not in assigned_yakus and ruru_id not in assigned_rurus:
-            # Asignar!
-            final_assignments.append(potential_match)
-            assigned_yakus.add(yaku_id)
-            assigned_rurus.add(ruru_id)
 
-            # Opcional: Detener si ya hemos asignado a todos los posibles (ej, si Rurus < Yakus)
-            # if len(assigned_rurus) == len(rurus_df):
-            #    break
-            # if len(assigned_yakus) == len(yakus_df):
-            #    break
+    # 2-3. Ordenar e iterar asignando (Algoritmo Greedy)
+    final_assignments = _greedy_assign(scores_list, assigned_yakus, assigned_rurus)
 
     # 4. Convertir a DataFrame
     assigned_df = pd.DataFrame(final_assignments)
@@ -64,4 +81,111 @@ def find_best_matches(
     unassigned_yaku_ids = all_yaku_ids - assigned_yakus
     unassigned_ruru_ids = all_ruru_ids - assigned_rurus
 
-    return assigned_df, unassigned_yaku_ids, unassigned_ruru_ids 
\ No newline at end of file
+    return assigned_df, unassigned_yaku_ids, unassigned_ruru_ids
+
+def split_previous_assignments(asignaciones_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Separa la hoja 'Asignaciones' de un resultado anterior en pares bloqueados y automáticos.
+
+    Args:
+        asignaciones_df: Hoja 'Asignaciones' (con 'ID Yaku', 'ID Ruru' y 'Score Match').
+
+    Returns:
+        - DataFrame de pares bloqueados ('MANUAL' o 'FINAL') con 'yaku_id', 'ruru_id', 'score'.
+        - DataFrame de pares del match automático anterior con las mismas columnas.
+    """
+    if asignaciones_df is None or asignaciones_df.empty:
+        empty = pd.DataFrame(columns=ASSIGNMENT_COLUMNS)
+        return empty, empty.copy()
+
+    pairs = pd.DataFrame({
+        'yaku_id': asignaciones_df['ID Yaku'].to_numpy(),
+        'ruru_id': asignaciones_df['ID Ruru'].to_numpy(),
+        'score': asignaciones_df['Score Match'].to_numpy(),
+    })
+    locked = pairs['score'].astype(str).str.strip().str.upper().isin(LOCKED_SCORE_LABELS)
+    return pairs[locked].reset_index(drop=True), pairs[~locked].reset_index(drop=True)
+
+def find_best_matches_warm_start(
+    yakus_df: pd.DataFrame,
+    rurus_df: pd.DataFrame,
+    scores_list: List[Dict[str, Any]],
+    locked_pairs: pd.DataFrame,
+    previous_pairs: Optional[pd.DataFrame] = None
+) -> Tuple[pd.DataFrame, Set[str], Set[str], Dict[str, int]]:
+    """
+    Reasigna respetando decisiones anteriores y resolviendo solo lo pendiente.
+
+    1. Los pares bloqueados (MANUAL/FINAL) se mantienen siempre, con su etiqueta.
+    2. Los pares del match anterior se mantienen si siguen siendo compatibles
+       (tienen puntaje en scores_list), con el puntaje actual.
+    3. El algoritmo greedy corre solo sobre el subproblema residual: Rurus sin
+       asignar y Yakus libres.
+
+    Los IDs de los resultados anteriores se comparan como texto con los de
+    los DataFrames actuales; los pares cuyo Yaku o Ruru ya no está se descartan.
+
+    Args:
+        yakus_df: DataFrame completo de Yakus para el área.
+        rurus_df: DataFrame filtrado de Rurus para el área.
+        scores_list: Lista de diccionarios con 'yaku_id', 'ruru_id', 'score'.
+        locked_pairs: Pares bloqueados ('yaku_id', 'ruru_id', 'score').
+        previous_pairs: Pares del match anterior a usar como punto de partida (opcional).
+
+    Returns:
+        - DataFrame con las asignaciones finales ('yaku_id', 'ruru_id', 'score').
+        - Set de IDs de Yakus no asignados.
+        - Set de IDs de Rurus no asignados.
+        - Resumen con 'locked', 'kept', 'new' (pares por origen) y 'discarded'
+          (pares anteriores que ya no se pudieron mantener).
+    """
+    yaku_ids = {str(yaku_id).strip(): yaku_id for yaku_id in yakus_df['yaku_id']}
+    ruru_ids = {str(ruru_id).strip(): ruru_id for ruru_id in rurus_df['ID del estudiante:']}
+    assigned_yakus: Set[str] = set()
+    assigned_rurus: Set[str] = set()
+    final_assignments: List[Dict[str, Any]] = []
+    summary = {'locked': 0, 'kept': 0, 'new': 0, 'discarded': 0}
+
+    def _current_pairs(pairs: Optional[pd.DataFrame]):
+        """Pares anteriores con los IDs actuales (None si el Yaku o el Ruru ya no está)."""
+        if pairs is None:
+            return
+        for yaku_id, ruru_id, score in zip(pairs['yaku_id'], pairs['ruru_id'], pairs['score']):
+            yield yaku_ids.get(str(yaku_id).strip()), ruru_ids.get(str(ruru_id).strip()), score
+
+    # 1. Pares bloqueados
+    for yaku_id, ruru_id, label in _current_pairs(locked_pairs):
+        if yaku_id is None or ruru_id is None or yaku_id in assigned_yakus or ruru_id in assigned_rurus:
+            summary['discarded'] += 1
+            continue
+        final_assignments.append({'yaku_id': yaku_id, 'ruru_id': ruru_id, 'score': label})
+        assigned_yakus.add(yaku_id)
+        assigned_rurus.add(ruru_id)
+        summary['locked'] += 1
+
+    # 2. Punto de partida: pares anteriores que siguen siendo compatibles
+    if previous_pairs is not None and not previous_pairs.empty:
+        current_scores = {(pair['yaku_id'], pair['ruru_id']): pair['score'] for pair in scores_list}
+        for yaku_id, ruru_id, _ in _current_pairs(previous_pairs):
+            score = current_scores.get((yaku_id, ruru_id))
+            if score is None or yaku_id in assigned_yakus or ruru_id in assigned_rurus:
+                summary['discarded'] += 1
+                continue
+            final_assignments.append({'yaku_id': yaku_id, 'ruru_id': ruru_id, 'score': score})
+            assigned_yakus.add(yaku_id)
+            assigned_rurus.add(ruru_id)
+            summary['kept'] += 1
+
+    # 3. Subproblema residual: solo pares con ambos libres
+    residual = [
+        pair for pair in scores_list
+        if pair['yaku_id'] not in assigned_yakus and pair['ruru_id'] not in assigned_rurus
+    ]
+    new_assignments = _greedy_assign(residual, assigned_yakus, assigned_rurus)
+    final_assignments.extend(new_assignments)
+    summary['new'] = len(new_assignments)
+
+    assigned_df = pd.DataFrame(final_assignments, columns=ASSIGNMENT_COLUMNS)
+    unassigned_yaku_ids = set(yakus_df['yaku_id'].unique()) - assigned_yakus
+    unassigned_ruru_ids = set(rurus_df['ID del estudiante:'].unique()) - assigned_rurus
+    return assigned_df, unassigned_yaku_ids, unassigned_ruru_ids, summary
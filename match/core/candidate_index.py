@@ -0,0 +1,104 @@
+"""
+Índice de candidatos compatibles para la asignación manual.
+
+Puntúa una sola vez todos los pares entre los Yakus y Rurus no asignados (con
+las mismas reglas que el match) y guarda, para cada Yaku, sus k Rurus más
+compatibles y, para cada Ruru, sus k Yakus más compatibles, junto con el
+desglose del puntaje. Consultar las sugerencias de una persona cuesta O(k).
+"""
+
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+from .scorer import encode_yakus, encode_rurus, score_components, score_block
+
+# Sugerencias guardadas por persona
+DEFAULT_TOP_K = 10
+
+# Columnas de la tabla de sugerencias
+SUGGESTION_COLUMNS = ['ID', 'Puntaje', 'Bloques en común', 'Quechua compatible', 'Prioridad Asignatura/Taller']
+
+
+class CandidateIndex:
+    """
+    Top-k de candidatos compatibles por Yaku y por Ruru.
+
+    Las matrices de cada lado tienen una fila por persona y k columnas
+    (posición del candidato, puntaje y componentes); -1 marca huecos
+    cuando hay menos de k candidatos compatibles.
+    """
+
+    def __init__(self, yakus_df: pd.DataFrame, rurus_df: pd.DataFrame, area: str, top_k: int = DEFAULT_TOP_K):
+        yaku_features = encode_yakus(yakus_df.drop_duplicates(subset=['yaku_id']), area)
+        ruru_features = encode_rurus(rurus_df.drop_duplicates(subset=['ID del estudiante:']), area)
+        self.yaku_ids = yaku_features.index.to_numpy()
+        self.ruru_ids = ruru_features.index.to_numpy()
+        self._yaku_positions: Dict[str, int] = {str(yaku_id): pos for pos, yaku_id in enumerate(self.yaku_ids)}
+        self._ruru_positions: Dict[str, int] = {str(ruru_id): pos for pos, ruru_id in enumerate(self.ruru_ids)}
+
+        components = score_components(yaku_features, ruru_features, area)
+        scores = score_block(yaku_features, ruru_features, area, components)
+        self._by_yaku = self._top_k(scores, components, top_k)
+        self._by_ruru = self._top_k(scores.T, {name: values.T for name, values in components.items()}, top_k)
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, components: Dict[str, np.ndarray], top_k: int) -> Dict[str, np.ndarray]:
+        """Los k mejores candidatos de cada fila (empates por orden de aparición)."""
+        k = min(top_k, scores.shape[1])
+        if k == 0:
+            empty = np.empty((scores.shape[0], 0), dtype=np.int64)
+            return {'positions': empty, 'score': empty.astype(float),
+                    **{name: empty.astype(values.dtype) for name, values in components.items()}}
+        order = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+        top_scores = np.take_along_axis(scores, order, axis=1)
+        return {
+            'positions': np.where(top_scores > 0, order, -1),
+            'score': top_scores,
+            **{name: np.take_along_axis(values, order, axis=1) for name, values in components.items()},
+        }
+
+    @staticmethod
+    def _suggestions(table: Dict[str, np.ndarray], row: int, candidate_ids: np.ndarray) -> pd.DataFrame:
+        """Tabla de sugerencias de una fila del índice."""
+        valid = table['positions'][row] >= 0
+        return pd.DataFrame({
+            'ID': candidate_ids[table['positions'][row][valid]],
+            'Puntaje': table['score'][row][valid],
+            'Bloques en común': table['schedule_blocks'][row][valid],
+            'Quechua compatible': np.where(table['quechua'][row][valid], 'Sí', 'No'),
+            'Prioridad Asignatura/Taller': table['subject_priority'][row][valid],
+        }, columns=SUGGESTION_COLUMNS)
+
+    def rurus_for_yaku(self, yaku_id: Any) -> pd.DataFrame:
+        """
+        Rurus más compatibles con un Yaku.
+
+        Args:
+            yaku_id: ID del Yaku (se compara como texto)
+
+        Returns:
+            DataFrame con SUGGESTION_COLUMNS, de mayor a menor puntaje
+            (vacío si el Yaku no está en el índice)
+        """
+        row = self._yaku_positions.get(str(yaku_id))
+        if row is None:
+            return pd.DataFrame(columns=SUGGESTION_COLUMNS)
+        return self._suggestions(self._by_yaku, row, self.ruru_ids)
+
+    def yakus_for_ruru(self, ruru_id: Any) -> pd.DataFrame:
+        """
+        Yakus más compatibles con un Ruru.
+
+        Args:
+            ruru_id: ID del Ruru (se compara como texto)
+
+        Returns:
+            DataFrame con SUGGESTION_COLUMNS, de mayor a menor puntaje
+            (vacío si el Ruru no está en el índice)
+        """
+        row = self._ruru_positions.get(str(ruru_id))
+        if row is None:
+            return pd.DataFrame(columns=SUGGESTION_COLUMNS)
+        return self._suggestions(self._by_ruru, row, self.yaku_ids)
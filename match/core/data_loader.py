@@ -130,6 +130,31 @@ def load_ruru_data(uploaded_file) -> Optional[pd.DataFrame]:
         st.error(f"❌ Error al leer el archivo Excel de Rurus: {e}")
         return None
 
+# Columnas de 'Asignaciones' necesarias para reutilizar un resultado anterior
+PREVIOUS_ASSIGNMENT_COLS = ['ID Yaku', 'ID Ruru', 'Score Match']
+
+def load_previous_assignments(uploaded_file) -> Optional[pd.DataFrame]:
+    """Carga la hoja 'Asignaciones' de un archivo de resultados anterior (para reasignar sin perder decisiones)."""
+    if not uploaded_file:
+        return None
+    try:
+        df = pd.read_excel(uploaded_file, sheet_name="Asignaciones")
+        df.columns = df.columns.astype(str).str.strip()
+
+        # Hoja sin asignaciones (el Excel de resultados deja solo un mensaje)
+        if list(df.columns) == ["Resultado"]:
+            return pd.DataFrame(columns=PREVIOUS_ASSIGNMENT_COLS)
+
+        if not _validate_columns(df, PREVIOUS_ASSIGNMENT_COLS, "Resultados anteriores"):
+            return None
+
+        st.success(f"✅ Resultados anteriores cargados: {len(df)} asignaciones.")
+        return df
+
+    except Exception as e:
+        st.error(f"❌ Error al leer la hoja 'Asignaciones' de los resultados anteriores: {e}")
+        return None
+
 def filter_rurus_by_area(ruru_df: pd.DataFrame, area: str) -> pd.DataFrame:
     """Filtra el DataFrame de Rurus por el área seleccionada."""
     if ruru_df is None or 'area' not in ruru_df.columns:
@@ -0,0 +1,101 @@
+"""
+Diagnóstico de los Rurus que quedaron sin asignar.
+
+Para cada Ruru no asignado se cuentan, en una sola pasada vectorizada con los
+componentes de score_components, cuántos Yakus descarta cada criterio
+(horario, quechua, asignatura/taller) y si los Yakus compatibles ya estaban
+ocupados por otras asignaciones.
+"""
+
+from typing import Any, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from .scorer import SUBJECT_OPTION_COLS, SCORE_CHUNK_SIZE, encode_yakus, encode_rurus, score_components
+
+# Motivos del reporte
+REASON_NO_YAKUS = "No hay Yakus en el área"
+REASON_NO_SCHEDULE = "Sin horario en común con ningún Yaku"
+REASON_ALL_TAKEN = "Todos los Yakus compatibles ya fueron asignados"
+REASON_FREE_COMPATIBLE = "Hay Yakus compatibles libres (revisar asignaciones bloqueadas)"
+
+# Columnas del reporte ('Sin asignatura/taller en común' solo en áreas con opciones)
+DIAGNOSTIC_COLUMNS = [
+    'ID Ruru', 'Nombre Ruru', 'Yakus evaluados', 'Descartados por horario',
+    'Sin quechua compatible', 'Sin asignatura/taller en común',
+    'Yakus compatibles', 'Compatibles ya asignados', 'Motivo'
+]
+SUBJECT_DIAGNOSTIC_COLUMN = 'Sin asignatura/taller en común'
+
+
+def diagnose_unassigned_rurus(
+    yakus_df: pd.DataFrame,
+    rurus_df: pd.DataFrame,
+    unassigned_ruru_ids: Iterable[Any],
+    assigned_yaku_ids: Iterable[Any],
+    area: str,
+    chunk_size: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Explica por qué cada Ruru no asignado quedó sin Yaku.
+
+    Un Yaku es compatible con un Ruru si comparten al menos un bloque horario
+    (el único requisito del puntaje); quechua y asignatura/taller solo suman
+    puntos, así que se cuentan aparte como Yakus que no los cumplen.
+
+    Args:
+        yakus_df: Yakus del área (con 'yaku_id')
+        rurus_df: Rurus del área (con 'ID del estudiante:')
+        unassigned_ruru_ids: IDs de los Rurus no asignados
+        assigned_yaku_ids: IDs de los Yakus que quedaron asignados
+        area: Área del match
+        chunk_size: Rurus por bloque (por defecto SCORE_CHUNK_SIZE)
+
+    Returns:
+        DataFrame con DIAGNOSTIC_COLUMNS (sin la de asignatura/taller si el
+        área no la usa), una fila por Ruru no asignado
+    """
+    columns = [col for col in DIAGNOSTIC_COLUMNS if area in SUBJECT_OPTION_COLS or col != SUBJECT_DIAGNOSTIC_COLUMN]
+    rurus = rurus_df.drop_duplicates(subset=['ID del estudiante:'])
+    rurus = rurus[rurus['ID del estudiante:'].isin(set(unassigned_ruru_ids))]
+    if rurus.empty:
+        return pd.DataFrame(columns=columns)
+
+    yaku_features = encode_yakus(yakus_df.drop_duplicates(subset=['yaku_id']), area)
+    ruru_features = encode_rurus(rurus, area)
+    taken = yaku_features.index.isin(set(assigned_yaku_ids))[:, None]
+
+    counts = {name: [] for name in ['schedule', 'quechua', 'subject', 'compatible', 'taken']}
+    chunk_size = chunk_size or SCORE_CHUNK_SIZE
+    for start in range(0, len(ruru_features), chunk_size):
+        components = score_components(yaku_features, ruru_features.iloc[start:start + chunk_size], area)
+        compatible = components['schedule_blocks'] > 0
+        counts['schedule'].append((~compatible).sum(axis=0))
+        counts['quechua'].append((~components['quechua']).sum(axis=0))
+        counts['subject'].append((components['subject_priority'] == 0).sum(axis=0))
+        counts['compatible'].append(compatible.sum(axis=0))
+        counts['taken'].append((compatible & taken).sum(axis=0))
+    counts = {name: np.concatenate(values).astype(np.int64) for name, values in counts.items()}
+
+    reasons = np.select(
+        [np.full(len(rurus), len(yaku_features) == 0), counts['compatible'] == 0, counts['taken'] == counts['compatible']],
+        [REASON_NO_YAKUS, REASON_NO_SCHEDULE, REASON_ALL_TAKEN],
+        default=REASON_FREE_COMPATIBLE
+    )
+    names = [
+        rurus[col].fillna('').astype(str).str.strip() if col in rurus.columns else pd.Series('', index=rurus.index)
+        for col in ['nombre', 'apellido']
+    ]
+    report = pd.DataFrame({
+        'ID Ruru': rurus['ID del estudiante:'].to_numpy(),
+        'Nombre Ruru': (names[0] + ' ' + names[1]).str.strip().to_numpy(),
+        'Yakus evaluados': len(yaku_features),
+        'Descartados por horario': counts['schedule'],
+        'Sin quechua compatible': counts['quechua'],
+        SUBJECT_DIAGNOSTIC_COLUMN: counts['subject'],
+        'Yakus compatibles': counts['compatible'],
+        'Compatibles ya asignados': counts['taken'],
+        'Motivo': reasons,
+    })
+    return report[columns]
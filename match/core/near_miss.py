@@ -0,0 +1,157 @@
+"""
+Recomendaciones de Yakus "casi compatibles" para los Rurus sin asignar.
+
+Cuando un Ruru no tiene ningún Yaku libre con horario en común, la
+coordinación llama a Yakus para pedirles que amplíen su disponibilidad. Este
+módulo busca, para todos los Rurus no asignados a la vez, los Yakus a los que
+les faltan menos bloques del horario del Ruru (popcount de ruru & ~yaku sobre
+las máscaras de 21 bits de schedule_masks), entre los que cumplen quechua y
+asignatura/taller. La disponibilidad extra del Yaku no cuenta en su contra:
+a igual número de bloques faltantes se prefiere al que más bloques comparte
+con el Ruru, y luego el orden de los Yakus. Los Yakus sin ningún bloque
+disponible no se recomiendan.
+
+Los Yakus se agrupan por número de bloques disponibles (popcount): a un Yaku
+con p bloques le faltan al menos popcount(ruru) - p bloques del Ruru, así que
+los grupos se recorren de esa cota menor a la mayor y la búsqueda se corta en
+cuanto ningún grupo restante puede mejorar el top-k.
+"""
+
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+from shared.normalization import clean_number_series
+from .scorer import HORARIO_COLS, SCHEDULE_BLOCKS, SUBJECT_OPTION_COLS, encode_yakus, encode_rurus, score_components
+
+# Yakus recomendados por Ruru
+NEAR_MISS_TOP_K = 5
+
+# Columnas del reporte (una fila por recomendación)
+NEAR_MISS_COLUMNS = ['ID Ruru', 'Rango', 'ID Yaku', 'Nombre Yaku', 'Celular Yaku', 'Bloques faltantes', 'Bloques a agregar']
+
+# Bloques faltantes para candidatos no elegibles o huecos (mayor que cualquier valor real de 21 bits)
+_NO_CANDIDATE = 64
+
+
+def describe_blocks(mask: int) -> str:
+    """Lista legible de los bloques de una máscara de horarios (p. ej. 'Lunes Mañana, Jueves Noche')."""
+    labels = []
+    for day, col in enumerate(HORARIO_COLS):
+        for position, block in enumerate(SCHEDULE_BLOCKS):
+            if mask >> (day * len(SCHEDULE_BLOCKS) + position) & 1:
+                labels.append(f"{col.replace('horario_', '').capitalize()} {block}")
+    return ', '.join(labels)
+
+
+def build_popcount_buckets(masks: np.ndarray) -> Dict[int, np.ndarray]:
+    """
+    Agrupa posiciones por número de bloques disponibles.
+
+    Args:
+        masks: Máscaras de horarios (schedule_masks)
+
+    Returns:
+        Diccionario {popcount: posiciones en orden ascendente}
+    """
+    popcounts = np.bitwise_count(masks)
+    return {int(count): np.flatnonzero(popcounts == count) for count in np.unique(popcounts)}
+
+
+def recommend_near_miss_yakus(
+    yakus_df: pd.DataFrame,
+    rurus_df: pd.DataFrame,
+    unassigned_ruru_ids: Iterable[Any],
+    candidate_yaku_ids: Iterable[Any],
+    area: str,
+    top_k: int = NEAR_MISS_TOP_K
+) -> pd.DataFrame:
+    """
+    Encuentra, para cada Ruru no asignado, los Yakus a los que les faltan
+    menos bloques de su horario.
+
+    Solo se consideran Yakus con algún bloque disponible, quechua compatible
+    y, en las áreas con asignatura/taller, que ofrezcan alguna de las
+    opciones del Ruru (el área ya coincide porque ambos DataFrames son del
+    área del match). A igual número de bloques faltantes se prefiere al Yaku
+    que comparte más bloques con el Ruru y luego el orden de los Yakus.
+
+    Args:
+        yakus_df: Yakus del área (con 'yaku_id')
+        rurus_df: Rurus del área (con 'ID del estudiante:')
+        unassigned_ruru_ids: IDs de los Rurus no asignados
+        candidate_yaku_ids: IDs de los Yakus que se pueden recomendar (normalmente los libres)
+        area: Área del match
+        top_k: Yakus recomendados por Ruru
+
+    Returns:
+        DataFrame con NEAR_MISS_COLUMNS, ordenado por Ruru y rango; 'Bloques
+        faltantes' cuenta los bloques del Ruru que el Yaku no tiene
+        disponibles y 'Bloques a agregar' los lista
+    """
+    rurus = rurus_df.drop_duplicates(subset=['ID del estudiante:'])
+    rurus = rurus[rurus['ID del estudiante:'].isin(set(unassigned_ruru_ids))]
+    yakus = yakus_df.drop_duplicates(subset=['yaku_id'])
+    yakus = yakus[yakus['yaku_id'].isin(set(candidate_yaku_ids))]
+    if rurus.empty or yakus.empty or top_k <= 0:
+        return pd.DataFrame(columns=NEAR_MISS_COLUMNS)
+
+    yaku_features = encode_yakus(yakus, area)
+    ruru_features = encode_rurus(rurus, area)
+    yaku_masks = yaku_features['mask'].to_numpy(dtype=np.int64)
+    ruru_masks = ruru_features['mask'].to_numpy(dtype=np.int64)
+    # Un Yaku sin bloques disponibles no es una recomendación útil
+    buckets = {count: positions for count, positions in build_popcount_buckets(yaku_masks).items() if count > 0}
+
+    # Orden de los candidatos en una sola clave entera: bloques faltantes,
+    # luego bloques no compartidos y luego posición del Yaku
+    overlap_span = len(HORARIO_COLS) * len(SCHEDULE_BLOCKS) + 1
+    position_span = len(yaku_masks) + 1
+    missing_span = overlap_span * position_span
+    best_key = np.full((len(rurus), top_k), _NO_CANDIDATE * missing_span, dtype=np.int64)
+    best_position = np.full((len(rurus), top_k), -1, dtype=np.int64)
+    ruru_popcounts = np.bitwise_count(ruru_masks)
+    for popcount in np.unique(ruru_popcounts):
+        group = np.flatnonzero(ruru_popcounts == popcount)
+        for bound, bucket in sorted((max(0, int(popcount) - count), count) for count in buckets):
+            # A todo Yaku del grupo le faltan >= bound bloques: si ya no mejora a ningún k-ésimo, parar
+            if (best_key[group, -1] < bound * missing_span).all():
+                break
+            positions = buckets[bucket]
+            components = score_components(yaku_features.iloc[positions], ruru_features.iloc[group], area)
+            eligible = components['quechua']
+            if area in SUBJECT_OPTION_COLS:
+                eligible = eligible & (components['subject_priority'] > 0)
+            pair_yakus = yaku_masks[positions][:, None]
+            pair_rurus = ruru_masks[group][None, :]
+            missing = np.bitwise_count(pair_rurus & ~pair_yakus).astype(np.int64)
+            overlap = np.bitwise_count(pair_rurus & pair_yakus).astype(np.int64)
+            key = missing * missing_span + (overlap_span - 1 - overlap) * position_span + positions[:, None] + 1
+            key = np.where(eligible, key, _NO_CANDIDATE * missing_span).T
+
+            # Fusionar con el top-k actual
+            merged_key = np.concatenate([best_key[group], key], axis=1)
+            merged_position = np.concatenate([best_position[group], np.broadcast_to(positions, key.shape)], axis=1)
+            order = np.argsort(merged_key, axis=1, kind='stable')[:, :top_k]
+            best_key[group] = np.take_along_axis(merged_key, order, axis=1)
+            best_position[group] = np.take_along_axis(merged_position, order, axis=1)
+
+    best_missing = best_key // missing_span
+    rows, ranks = np.nonzero(best_missing < _NO_CANDIDATE)
+    positions = best_position[rows, ranks]
+    missing = ruru_masks[rows] & ~yaku_masks[positions]
+    yaku_info = yakus.set_index('yaku_id')
+    report_columns: List[Any] = [
+        yaku_info[col].to_numpy()[positions] if col in yaku_info.columns else np.full(len(positions), np.nan, dtype=object)
+        for col in ['nombre', 'celular']
+    ]
+    return pd.DataFrame({
+        'ID Ruru': ruru_features.index.to_numpy()[rows],
+        'Rango': ranks + 1,
+        'ID Yaku': yaku_features.index.to_numpy()[positions],
+        'Nombre Yaku': report_columns[0],
+        'Celular Yaku': clean_number_series(pd.Series(report_columns[1])).to_numpy(),
+        'Bloques faltantes': best_missing[rows, ranks],
+        'Bloques a agregar': [describe_blocks(mask) for mask in missing.tolist()],
+    }, columns=NEAR_MISS_COLUMNS)
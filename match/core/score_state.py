@@ -0,0 +1,222 @@
+"""
+Puntuaciones del match que se actualizan de forma incremental.
+
+Cuando llegan inscripciones tardías no hace falta volver a puntuar todos los
+pares: `ScoreState` guarda los Yakus y Rurus codificados y la matriz dispersa
+de puntajes (solo los pares con puntaje > 0), y al recibir Yakus o Rurus
+nuevos, editados o eliminados calcula únicamente sus filas y columnas.
+El costo de una actualización es proporcional al cambio, no a la cohorte.
+"""
+
+from typing import Any, Dict, Iterable, List, Set
+
+import numpy as np
+import pandas as pd
+
+from shared.digest import row_fingerprints
+from .scorer import (
+    HORARIO_COLS, SUBJECT_OPTION_COLS, SCORE_CHUNK_SIZE,
+    encode_yakus, encode_rurus, score_block
+)
+
+YAKU_ID_COL = 'yaku_id'
+RURU_ID_COL = 'ID del estudiante:'
+
+
+def _scoring_columns(df: pd.DataFrame, area: str, side: str) -> List[str]:
+    """Columnas de df que influyen en la puntuación del lado 'yaku' o 'ruru' (para detectar ediciones)."""
+    columns = HORARIO_COLS + ['quechua']
+    if area in SUBJECT_OPTION_COLS:
+        yaku_col, ruru_cols = SUBJECT_OPTION_COLS[area]
+        columns = columns + ([yaku_col] if side == 'yaku' else ruru_cols)
+    return [col for col in columns if col in df.columns]
+
+
+def _fingerprints(df: pd.DataFrame, id_col: str, columns: List[str]) -> Dict[Any, int]:
+    """Huella de los datos de puntuación de cada fila, por ID."""
+    return dict(zip(df[id_col].tolist(), row_fingerprints(df, columns).tolist()))
+
+
+class ScoreState:
+    """
+    Matriz dispersa de puntajes Yaku-Ruru de un área, con actualización por deltas.
+
+    Los puntajes se guardan por Ruru ({ruru_id: {yaku_id: puntaje}}) junto con
+    el índice inverso por Yaku, de modo que eliminar o editar a alguien solo
+    toca sus propios pares.
+    """
+
+    def __init__(self, area: str):
+        self.area = area
+        self.yaku_features = encode_yakus(pd.DataFrame({YAKU_ID_COL: []}), area)
+        self.ruru_features = encode_rurus(pd.DataFrame({RURU_ID_COL: []}), area)
+        self._yaku_fingerprints: Dict[Any, int] = {}
+        self._ruru_fingerprints: Dict[Any, int] = {}
+        self._by_ruru: Dict[Any, Dict[Any, float]] = {}
+        self._by_yaku: Dict[Any, Set[Any]] = {}
+
+    @property
+    def n_pairs(self) -> int:
+        """Número de pares compatibles (puntaje > 0)."""
+        return sum(len(scores) for scores in self._by_ruru.values())
+
+    def _store(self, yaku_ids: np.ndarray, ruru_ids: np.ndarray, scores: np.ndarray) -> None:
+        """Guarda los pares con puntaje > 0 de un bloque."""
+        rows, cols = np.nonzero(scores)
+        for yaku_id, ruru_id, score in zip(yaku_ids[rows].tolist(), ruru_ids[cols].tolist(), scores[rows, cols].tolist()):
+            self._by_ruru.setdefault(ruru_id, {})[yaku_id] = score
+            self._by_yaku.setdefault(yaku_id, set()).add(ruru_id)
+
+    def _drop_yaku_pairs(self, yaku_ids: Iterable[Any]) -> None:
+        """Invalida los pares de los Yakus indicados."""
+        for yaku_id in yaku_ids:
+            for ruru_id in self._by_yaku.pop(yaku_id, ()):
+                self._by_ruru[ruru_id].pop(yaku_id, None)
+
+    def _drop_ruru_pairs(self, ruru_ids: Iterable[Any]) -> None:
+        """Invalida los pares de los Rurus indicados."""
+        for ruru_id in ruru_ids:
+            for yaku_id in self._by_ruru.pop(ruru_id, {}):
+                self._by_yaku[yaku_id].discard(ruru_id)
+
+    @staticmethod
+    def _merge_features(current: pd.DataFrame, incoming: pd.DataFrame) -> pd.DataFrame:
+        """Reemplaza las filas existentes en su lugar y agrega las nuevas al final."""
+        order = current.index.append(incoming.index[~incoming.index.isin(current.index)])
+        kept = current[~current.index.isin(incoming.index)]
+        return pd.concat([kept, incoming]).reindex(order)
+
+    def upsert_yakus(self, yakus_df: pd.DataFrame) -> None:
+        """
+        Agrega Yakus nuevos o reemplaza Yakus editados y puntúa solo sus filas.
+
+        Args:
+            yakus_df: Yakus a agregar o actualizar (con 'yaku_id')
+        """
+        yakus_df = yakus_df.drop_duplicates(subset=[YAKU_ID_COL], keep='first')
+        if yakus_df.empty:
+            return
+        incoming = encode_yakus(yakus_df, self.area)
+        self._drop_yaku_pairs(incoming.index)
+        self.yaku_features = self._merge_features(self.yaku_features, incoming)
+        self._yaku_fingerprints.update(_fingerprints(
+            yakus_df, YAKU_ID_COL, _scoring_columns(yakus_df, self.area, 'yaku')
+        ))
+
+        yaku_ids = incoming.index.to_numpy()
+        ruru_ids = self.ruru_features.index.to_numpy()
+        for start in range(0, len(ruru_ids), SCORE_CHUNK_SIZE):
+            chunk = self.ruru_features.iloc[start:start + SCORE_CHUNK_SIZE]
+            self._store(yaku_ids, ruru_ids[start:start + SCORE_CHUNK_SIZE], score_block(incoming, chunk, self.area))
+
+    def upsert_rurus(self, rurus_df: pd.DataFrame) -> None:
+        """
+        Agrega Rurus nuevos o reemplaza Rurus editados y puntúa solo sus columnas.
+
+        Args:
+            rurus_df: Rurus a agregar o actualizar (con 'ID del estudiante:')
+        """
+        rurus_df = rurus_df.drop_duplicates(subset=[RURU_ID_COL], keep='first')
+        if rurus_df.empty:
+            return
+        incoming = encode_rurus(rurus_df, self.area)
+        self._drop_ruru_pairs(incoming.index)
+        self.ruru_features = self._merge_features(self.ruru_features, incoming)
+        self._ruru_fingerprints.update(_fingerprints(
+            rurus_df, RURU_ID_COL, _scoring_columns(rurus_df, self.area, 'ruru')
+        ))
+
+        yaku_ids = self.yaku_features.index.to_numpy()
+        ruru_ids = incoming.index.to_numpy()
+        for start in range(0, len(ruru_ids), SCORE_CHUNK_SIZE):
+            chunk = incoming.iloc[start:start + SCORE_CHUNK_SIZE]
+            self._store(yaku_ids, ruru_ids[start:start + SCORE_CHUNK_SIZE], score_block(self.yaku_features, chunk, self.area))
+
+    def remove_yakus(self, yaku_ids: Iterable[Any]) -> None:
+        """
+        Elimina Yakus y todos sus pares.
+
+        Args:
+            yaku_ids: IDs de los Yakus a eliminar
+        """
+        yaku_ids = [yaku_id for yaku_id in yaku_ids if yaku_id in self._yaku_fingerprints]
+        self._drop_yaku_pairs(yaku_ids)
+        self.yaku_features = self.yaku_features.drop(index=yaku_ids)
+        for yaku_id in yaku_ids:
+            del self._yaku_fingerprints[yaku_id]
+
+    def remove_rurus(self, ruru_ids: Iterable[Any]) -> None:
+        """
+        Elimina Rurus y todos sus pares.
+
+        Args:
+            ruru_ids: IDs de los Rurus a eliminar
+        """
+        ruru_ids = [ruru_id for ruru_id in ruru_ids if ruru_id in self._ruru_fingerprints]
+        self._drop_ruru_pairs(ruru_ids)
+        self.ruru_features = self.ruru_features.drop(index=ruru_ids)
+        for ruru_id in ruru_ids:
+            del self._ruru_fingerprints[ruru_id]
+
+    @staticmethod
+    def _diff(df: pd.DataFrame, id_col: str, columns: List[str], known: Dict[Any, int]):
+        """Clasifica las filas de df en nuevas y editadas, y los IDs conocidos que ya no están."""
+        df = df.drop_duplicates(subset=[id_col], keep='first')
+        fingerprints = _fingerprints(df, id_col, columns)
+        added = [key for key in fingerprints if key not in known]
+        edited = [key for key, value in fingerprints.items() if key in known and known[key] != value]
+        removed = [key for key in known if key not in fingerprints]
+        changed = df[df[id_col].isin(added + edited)]
+        return changed, added, edited, removed, list(fingerprints)
+
+    def sync(self, yakus_df: pd.DataFrame, rurus_df: pd.DataFrame) -> Dict[str, int]:
+        """
+        Lleva el estado a las versiones actuales de Yakus y Rurus, puntuando solo lo que cambió.
+
+        Desde un estado vacío equivale a puntuar todos los pares.
+
+        Args:
+            yakus_df: Yakus actuales del área (con 'yaku_id')
+            rurus_df: Rurus actuales del área (con 'ID del estudiante:')
+
+        Returns:
+            Conteos del cambio aplicado: 'yakus_added', 'yakus_edited',
+            'yakus_removed', 'rurus_added', 'rurus_edited' y 'rurus_removed'
+        """
+        yakus_changed, yakus_added, yakus_edited, yakus_removed, yaku_order = self._diff(
+            yakus_df, YAKU_ID_COL, _scoring_columns(yakus_df, self.area, 'yaku'), self._yaku_fingerprints
+        )
+        rurus_changed, rurus_added, rurus_edited, rurus_removed, ruru_order = self._diff(
+            rurus_df, RURU_ID_COL, _scoring_columns(rurus_df, self.area, 'ruru'), self._ruru_fingerprints
+        )
+
+        self.remove_yakus(yakus_removed)
+        self.remove_rurus(rurus_removed)
+        self.upsert_yakus(yakus_changed)
+        self.upsert_rurus(rurus_changed)
+
+        # Mismo orden que los DataFrames actuales (find_best_matches desempata por orden)
+        self.yaku_features = self.yaku_features.reindex(pd.Index(yaku_order, name=YAKU_ID_COL, dtype=object))
+        self.ruru_features = self.ruru_features.reindex(pd.Index(ruru_order, name=RURU_ID_COL, dtype=object))
+
+        return {
+            'yakus_added': len(yakus_added), 'yakus_edited': len(yakus_edited), 'yakus_removed': len(yakus_removed),
+            'rurus_added': len(rurus_added), 'rurus_edited': len(rurus_edited), 'rurus_removed': len(rurus_removed),
+        }
+
+    def to_scores_list(self) -> List[Dict[str, Any]]:
+        """
+        Devuelve los pares compatibles en el formato de create_scores_list.
+
+        Returns:
+            Lista de diccionarios con 'yaku_id', 'ruru_id' y 'score', en el
+            orden en que los generaría create_scores_list
+        """
+        yaku_positions = {yaku_id: position for position, yaku_id in enumerate(self.yaku_features.index)}
+        ruru_positions = {ruru_id: position for position, ruru_id in enumerate(self.ruru_features.index)}
+        pairs = sorted(
+            (yaku_positions[yaku_id], ruru_positions[ruru_id], yaku_id, ruru_id, score)
+            for ruru_id, scores in self._by_ruru.items()
+            for yaku_id, score in scores.items()
+        )
+        return [{'yaku_id': yaku_id, 'ruru_id': ruru_id, 'score': score} for _, _, yaku_id, ruru_id, score in pairs]
@@ -170,44 +170,222 @@ def calculate_match_score(yaku_row: pd.Series, ruru_row: pd.Series, area: str) -
 
     return round(score, 2) # Redondear para evitar problemas de precisión flotante
 
+# --- Puntuación Vectorizada ---
+# Cada Yaku y cada Ruru se codifica una sola vez (máscara de horarios,
+# quechua y opciones de asignatura/taller) y los puntajes de todos los pares
+# de un bloque se calculan con operaciones de numpy.
+
+# Bloques de cada día, en el orden de sus bits dentro de la máscara semanal (7 x 3 = 21 bits)
+SCHEDULE_BLOCKS = ["Mañana", "Tarde", "Noche"]
+SCHEDULE_BLOCK_PATTERNS = {block: rf"{block}\s*\(.*?\)" for block in SCHEDULE_BLOCKS}
+
+# Opciones por área: (columna del Yaku, columnas del Ruru en orden de prioridad)
+SUBJECT_OPTION_COLS = {
+    "Asesoría a Colegios Nacionales": ('asignatura', ['asignatura_opcion1', 'asignatura_opcion2']),
+    "Arte & Cultura": ('taller', ['taller_opcion1', 'taller_opcion2', 'taller_opcion3']),
+}
+SUBJECT_PRIORITY_SCORES = [SCORE_SUBJECT_PRIO_1, SCORE_SUBJECT_PRIO_2, SCORE_SUBJECT_PRIO_3]
+
+# Rurus por bloque al calcular puntajes (acota la memoria de las matrices Yaku x Ruru)
+SCORE_CHUNK_SIZE = 2000
+
+def schedule_masks(df: pd.DataFrame) -> np.ndarray:
+    """
+    Codifica los horarios de cada fila como una máscara de 21 bits.
+
+    El bit (día * 3 + bloque) indica disponibilidad en ese bloque, con los
+    días en el orden de HORARIO_COLS y los bloques en el de SCHEDULE_BLOCKS.
+
+    Args:
+        df: DataFrame con las columnas de HORARIO_COLS (las que falten cuentan como vacías)
+
+    Returns:
+        Array int64 con una máscara por fila
+    """
+    masks = np.zeros(len(df), dtype=np.int64)
+    for day, col in enumerate(HORARIO_COLS):
+        if col not in df.columns:
+            continue
+        values = df[col].fillna('').astype(str)
+        for position, block in enumerate(SCHEDULE_BLOCKS):
+            available = values.str.contains(SCHEDULE_BLOCK_PATTERNS[block], regex=True).to_numpy()
+            masks |= available.astype(np.int64) << (day * len(SCHEDULE_BLOCKS) + position)
+    return masks
+
+def _quechua_levels(df: pd.DataFrame) -> pd.Series:
+    """Nivel de quechua de cada fila ('No lo hablo' si está vacío)."""
+    if 'quechua' not in df.columns:
+        return pd.Series("No lo hablo", index=df.index)
+    levels = df['quechua']
+    empty = levels.isna() | (levels.astype(str).str.strip() == '')
+    return levels.where(~empty, "No lo hablo")
+
+def _yaku_options(df: pd.DataFrame, area: str) -> List[frozenset]:
+    """Asignaturas (o taller) que ofrece cada Yaku, normalizadas como en check_subject_taller_compatibility."""
+    if area not in SUBJECT_OPTION_COLS or SUBJECT_OPTION_COLS[area][0] not in df.columns:
+        return [frozenset()] * len(df)
+    values = df[SUBJECT_OPTION_COLS[area][0]].tolist()
+    if area == "Arte & Cultura":
+        return [frozenset([taller]) if taller else frozenset() for taller in map(_clean_taller_name, values)]
+    return [
+        frozenset(subj.strip() for subj in str(value).lower().split(',') if subj.strip()) if pd.notna(value) else frozenset()
+        for value in values
+    ]
+
+def _ruru_options(df: pd.DataFrame, area: str) -> List[Tuple[str, ...]]:
+    """Opciones de cada Ruru en orden de prioridad ('' si no eligió)."""
+    if area not in SUBJECT_OPTION_COLS:
+        return [()] * len(df)
+    columns = []
+    for col in SUBJECT_OPTION_COLS[area][1]:
+        values = df[col].tolist() if col in df.columns else [np.nan] * len(df)
+        if area == "Arte & Cultura":
+            columns.append([_clean_taller_name(value) for value in values])
+        else:
+            columns.append([str(value).strip().lower() if pd.notna(value) else '' for value in values])
+    return list(zip(*columns)) if columns else [()] * len(df)
+
+def encode_yakus(yakus_df: pd.DataFrame, area: str) -> pd.DataFrame:
+    """
+    Codifica los datos de los Yakus que intervienen en la puntuación.
+
+    Args:
+        yakus_df: DataFrame de Yakus (con 'yaku_id')
+        area: Área del match
+
+    Returns:
+        DataFrame indexado por 'yaku_id' con 'mask', 'quechua_ok' y 'options'
+    """
+    return pd.DataFrame({
+        'mask': schedule_masks(yakus_df),
+        'quechua_ok': _quechua_levels(yakus_df).isin(QUECHUA_INTERMEDIO_AVANZADO).to_numpy(),
+        'options': _yaku_options(yakus_df, area),
+    }, index=pd.Index(yakus_df['yaku_id'].tolist(), name='yaku_id', dtype=object))
+
+def encode_rurus(rurus_df: pd.DataFrame, area: str) -> pd.DataFrame:
+    """
+    Codifica los datos de los Rurus que intervienen en la puntuación.
+
+    Args:
+        rurus_df: DataFrame de Rurus (con 'ID del estudiante:')
+        area: Área del match
+
+    Returns:
+        DataFrame indexado por ID con 'mask', 'quechua_req' y 'options'
+    """
+    return pd.DataFrame({
+        'mask': schedule_masks(rurus_df),
+        'quechua_req': _quechua_levels(rurus_df).isin(QUECHUA_BASICO + QUECHUA_INTERMEDIO_AVANZADO).to_numpy(),
+        'options': _ruru_options(rurus_df, area),
+    }, index=pd.Index(rurus_df['ID del estudiante:'].tolist(), name='ID del estudiante:', dtype=object))
+
+def score_components(yaku_features: pd.DataFrame, ruru_features: pd.DataFrame, area: str) -> Dict[str, np.ndarray]:
+    """
+    Calcula los componentes de compatibilidad de todos los pares de un bloque.
+
+    Args:
+        yaku_features: Yakus codificados con encode_yakus
+        ruru_features: Rurus codificados con encode_rurus
+        area: Área del match
+
+    Returns:
+        Diccionario de matrices (Yakus x Rurus): 'schedule_blocks' (bloques
+        en común), 'quechua' (compatibilidad) y 'subject_priority' (1, 2, 3 o 0)
+    """
+    yaku_masks = yaku_features['mask'].to_numpy(dtype=np.int64)
+    ruru_masks = ruru_features['mask'].to_numpy(dtype=np.int64)
+    shape = (len(yaku_features), len(ruru_features))
+
+    schedule_blocks = np.bitwise_count(yaku_masks[:, None] & ruru_masks[None, :])
+    quechua = yaku_features['quechua_ok'].to_numpy(dtype=bool)[:, None] | ~ruru_features['quechua_req'].to_numpy(dtype=bool)[None, :]
+
+    subject_priority = np.zeros(shape, dtype=np.int8)
+    if area in SUBJECT_OPTION_COLS and all(shape):
+        # Códigos de las opciones de los Rurus; -1 (sin opción) apunta a la última columna, siempre False
+        vocabulary: Dict[str, int] = {}
+        codes = np.array([
+            [vocabulary.setdefault(option, len(vocabulary)) if option else -1 for option in options]
+            for options in ruru_features['options']
+        ], dtype=np.int64).reshape(shape[1], -1)
+        offers = np.zeros((shape[0], len(vocabulary) + 1), dtype=bool)
+        for row, options in enumerate(yaku_features['options']):
+            for option in options:
+                code = vocabulary.get(option)
+                if code is not None:
+                    offers[row, code] = True
+        for priority in range(codes.shape[1]):
+            hit = offers[:, codes[:, priority]] & (subject_priority == 0)
+            subject_priority[hit] = priority + 1
+
+    return {'schedule_blocks': schedule_blocks, 'quechua': quechua, 'subject_priority': subject_priority}
+
+def score_block(
+    yaku_features: pd.DataFrame,
+    ruru_features: pd.DataFrame,
+    area: str,
+    components: Optional[Dict[str, np.ndarray]] = None
+) -> np.ndarray:
+    """
+    Calcula el puntaje de todos los pares de un bloque (mismas reglas que calculate_match_score).
+
+    Args:
+        yaku_features: Yakus codificados con encode_yakus
+        ruru_features: Rurus codificados con encode_rurus
+        area: Área del match
+        components: Resultado de score_components para el mismo bloque, si ya se calculó
+
+    Returns:
+        Matriz (Yakus x Rurus) de puntajes; 0 si no hay horario en común
+    """
+    if components is None:
+        components = score_components(yaku_features, ruru_features, area)
+    blocks = components['schedule_blocks']
+    scores = np.where(blocks >= 1, SCORE_SCHEDULE_BASE, 0.0)
+    scores += np.where(blocks >= 2, SCORE_SCHEDULE_BONUS_2PLUS, 0.0)
+    scores += np.where(components['quechua'], SCORE_QUECHUA_COMPATIBLE, 0.0)
+    priority_scores = np.array([0.0] + SUBJECT_PRIORITY_SCORES)
+    scores += priority_scores[components['subject_priority']]
+    scores[blocks == 0] = 0.0
+    return np.round(scores, 2)
+
 # --- Función para Crear Lista de Scores ---
 
 def create_scores_list(yakus_df: pd.DataFrame, rurus_df: pd.DataFrame, area: str) -> List[Dict[str, Any]]:
     """Calcula la puntuación para todos los pares Yaku-Ruru posibles y devuelve una lista."""
-    scores_list = []
     total_pairs = len(yakus_df) * len(rurus_df)
     progress_bar = st.progress(0)
-    processed_pairs = 0
 
     st.info(f"Calculando puntuaciones para {total_pairs} pares posibles...")
 
     # IDs para referencia
-    yaku_id_col = 'yaku_id' # Asumiendo que esta columna fue creada por data_loader
-    ruru_id_col = 'ID del estudiante:'
-
-    for idx_y, yaku_row in yakus_df.iterrows():
-        for idx_r, ruru_row in rurus_df.iterrows():
-            # Calcular puntaje
-            score = calculate_match_score(yaku_row, ruru_row, area)
-
-            # Guardar solo si el puntaje es > 0 (cumple el mínimo de horario)
-            if score > 0:
-                scores_list.append({
-                    'yaku_id': yaku_row[yaku_id_col],
-                    'ruru_id': ruru_row[ruru_id_col],
-                    'score': score,
-                    # Opcional: añadir detalles del match para referencia futura
-                    # 'schedule_matches': schedule_matches,
-                    # 'quechua_match': quechua_compatible,
-                    # 'subject_prio': subject_prio if area in [...] else 0
-                })
-
-            processed_pairs += 1
-            # Actualizar barra de progreso (con menos frecuencia para rendimiento)
-            if processed_pairs % 100 == 0 or processed_pairs == total_pairs:
-                 progress = min(1.0, processed_pairs / total_pairs)
-                 progress_bar.progress(progress)
+    yaku_ids = yakus_df['yaku_id'].tolist() # Asumiendo que esta columna fue creada por data_loader
+    ruru_ids = rurus_df['ID del estudiante:'].tolist()
+
+    yaku_features = encode_yakus(yakus_df, area)
+    ruru_features = encode_rurus(rurus_df, area)
+
+    # Pares con puntaje > 0 (cumplen el mínimo de horario), por bloques de Rurus
+    yaku_positions, ruru_positions, pair_scores = [], [], []
+    for start in range(0, len(rurus_df), SCORE_CHUNK_SIZE):
+        scores = score_block(yaku_features, ruru_features.iloc[start:start + SCORE_CHUNK_SIZE], area)
+        rows, cols = np.nonzero(scores)
+        yaku_positions.append(rows)
+        ruru_positions.append(cols + start)
+        pair_scores.append(scores[rows, cols])
+        progress_bar.progress(min(1.0, (start + SCORE_CHUNK_SIZE) / max(len(rurus_df), 1)))
+
+    scores_list = []
+    if pair_scores:
+        yaku_positions = np.concatenate(yaku_positions)
+        ruru_positions = np.concatenate(ruru_positions)
+        pair_scores = np.concatenate(pair_scores)
+        # Mismo orden que recorrer Yakus y luego Rurus (find_best_matches desempata por orden)
+        order = np.lexsort((ruru_positions, yaku_positions))
+        scores_list = [
+            {'yaku_id': yaku_ids[y], 'ruru_id': ruru_ids[r], 'score': score}
+            for y, r, score in zip(yaku_positions[order].tolist(), ruru_positions[order].tolist(), pair_scores[order].tolist())
+        ]
 
     progress_bar.empty() # Limpiar barra de progreso
     st.success(f"Cálculo de puntuaciones finalizado. Se encontraron {len(scores_list)} pares compatibles.")
-    return scores_list 
\ No newline at end of file
+    return scores_list
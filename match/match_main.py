@@ -8,9 +8,12 @@ import streamlit as st
 import pandas as pd
 
 # Importar funciones de los submódulos (se añadirán después)
-from .core.data_loader import load_yaku_data, load_ruru_data, filter_rurus_by_area
-from .core.scorer import create_scores_list
-from .core.assignment import find_best_matches
+from .core.data_loader import load_yaku_data, load_ruru_data, filter_rurus_by_area, load_previous_assignments
+from .core.score_state import ScoreState
+from .core.diagnostics import diagnose_unassigned_rurus
+from .core.near_miss import recommend_near_miss_yakus
+from .core.assignment import find_best_matches, find_best_matches_warm_start, split_previous_assignments
+from shared.upload_cache import parse_upload
 # from .ui.match_display import display_match_results
 # from .utils.output_generator import generate_output_files
 
@@ -19,10 +22,11 @@ from .ui.match_display import display_match_results # Ahora lo usaremos
 from .utils.output_generator import (
     format_assigned_output,
     format_unassigned_output,
-    generate_excel_output,
+    generate_excel_output_file,
     UNASSIGNED_YAKU_COLS,
     UNASSIGNED_RURU_COLS
 )
+from preprocessing.ui.download import lazy_file_download_button
 
 # --- Inicializar variables en estado de sesión ---
 if 'yakus_loaded' not in st.session_state:
@@ -35,6 +39,8 @@ if 'current_match_area' not in st.session_state:
     st.session_state.current_match_area = None
 if 'scores_list' not in st.session_state:
     st.session_state.scores_list = None
+if 'score_state' not in st.session_state:
+    st.session_state.score_state = None # Puntuaciones reutilizables entre ejecuciones del match
 if 'assigned_df' not in st.session_state:
     st.session_state.assigned_df = None
 if 'unassigned_yakus' not in st.session_state:
@@ -49,6 +55,10 @@ if 'unassigned_yakus_formatted_df' not in st.session_state:
     st.session_state.unassigned_yakus_formatted_df = None
 if 'unassigned_rurus_formatted_df' not in st.session_state:
     st.session_state.unassigned_rurus_formatted_df = None
+if 'unassigned_diagnostics_df' not in st.session_state:
+    st.session_state.unassigned_diagnostics_df = None
+if 'near_miss_df' not in st.session_state:
+    st.session_state.near_miss_df = None
 if 'excel_output' not in st.session_state:
     st.session_state.excel_output = None
 
@@ -77,23 +87,31 @@ def match_page():
     uploaded_ruru_file = st.file_uploader("Cargar archivo Excel de Rurus (Preprocesado)", type=["xlsx", "xls"], key="ruru_upload")
 
     # Procesar archivos cargados
-    if uploaded_yaku_file and st.session_state.yakus_loaded is None:
-        st.session_state.yakus_loaded = load_yaku_data(uploaded_yaku_file, selected_area)
-        if st.session_state.yakus_loaded is not None:
-            st.info(f"{len(st.session_state.yakus_loaded)} Yakus cargados para {selected_area}.")
-            # Mostrar vista previa opcional
-            with st.expander("Vista previa Yakus"):
-                 st.dataframe(st.session_state.yakus_loaded.head())
-
-
-    # Cargar Rurus solo una vez, ya que son los mismos para todas las áreas
-    if uploaded_ruru_file and st.session_state.rurus_loaded is None:
-        st.session_state.rurus_loaded = load_ruru_data(uploaded_ruru_file)
-        if st.session_state.rurus_loaded is not None:
-            st.info(f"{len(st.session_state.rurus_loaded)} Rurus totales cargados.")
-            # Mostrar vista previa opcional
-            with st.expander("Vista previa Rurus (Todos)"):
-                 st.dataframe(st.session_state.rurus_loaded.head())
+    # (parse_upload solo vuelve a leer un archivo cuando cambia; si se sube una
+    # versión nueva, se reemplazan los datos y el próximo match solo puntúa lo que cambió)
+    if uploaded_yaku_file:
+        yakus = parse_upload(uploaded_yaku_file, f"yaku_upload_{selected_area}", load_yaku_data, selected_area)
+        if yakus is not st.session_state.yakus_loaded:
+            st.session_state.yakus_loaded = yakus
+            st.session_state.rurus_filtered = None
+            if yakus is not None:
+                st.info(f"{len(st.session_state.yakus_loaded)} Yakus cargados para {selected_area}.")
+                # Mostrar vista previa opcional
+                with st.expander("Vista previa Yakus"):
+                     st.dataframe(st.session_state.yakus_loaded.head())
+
+
+    # Los Rurus son los mismos para todas las áreas (se leen una vez por archivo)
+    if uploaded_ruru_file:
+        rurus = parse_upload(uploaded_ruru_file, "ruru_upload", load_ruru_data)
+        if rurus is not st.session_state.rurus_loaded:
+            st.session_state.rurus_loaded = rurus
+            st.session_state.rurus_filtered = None
+            if rurus is not None:
+                st.info(f"{len(st.session_state.rurus_loaded)} Rurus totales cargados.")
+                # Mostrar vista previa opcional
+                with st.expander("Vista previa Rurus (Todos)"):
+                     st.dataframe(st.session_state.rurus_loaded.head())
 
     # Filtrar Rurus si ambos DFs están cargados y el filtro no se ha hecho para el área actual
     if st.session_state.yakus_loaded is not None and st.session_state.rurus_loaded is not None and st.session_state.rurus_filtered is None:
@@ -106,6 +124,14 @@ def match_page():
     # --- Sección de Ejecución del Match ---
     st.header("2. Ejecutar Match")
 
+    # Resultados anteriores (opcional): se conservan las asignaciones MANUAL/FINAL
+    # y las del match anterior que sigan siendo compatibles; solo se reasigna lo pendiente
+    uploaded_previous_file = st.file_uploader(
+        f"Opcional: Cargar Resultados anteriores del Match ({selected_area}) para reasignar solo lo pendiente",
+        type=["xlsx", "xls"], key=f"previous_results_upload_{selected_area}"
+    )
+    previous_assignments = parse_upload(uploaded_previous_file, f"previous_results_upload_{selected_area}", load_previous_assignments)
+
     # Habilitar botón solo si los datos están listos para el área seleccionada
     match_ready = st.session_state.yakus_loaded is not None and st.session_state.rurus_filtered is not None
 
@@ -119,25 +145,54 @@ def match_page():
             st.session_state.assigned_formatted_df = None # Limpiar formateados también
             st.session_state.unassigned_yakus_formatted_df = None
             st.session_state.unassigned_rurus_formatted_df = None
+            st.session_state.unassigned_diagnostics_df = None
+            st.session_state.near_miss_df = None
             st.session_state.excel_output = None
 
             with st.spinner(f"Procesando match completo para {selected_area}..."):
                 yakus_to_match = st.session_state.yakus_loaded
                 rurus_to_match = st.session_state.rurus_filtered
 
-                # -- Puntuación --
+                # -- Puntuación (incremental si ya se hizo un match de esta área) --
                 st.write("Calculando compatibilidad...")
-                scores = create_scores_list(yakus_to_match, rurus_to_match, selected_area)
+                score_state = st.session_state.score_state
+                if score_state is None or score_state.area != selected_area:
+                    score_state = ScoreState(selected_area)
+                    st.info(f"Calculando puntuaciones para {len(yakus_to_match) * len(rurus_to_match)} pares posibles...")
+                    score_state.sync(yakus_to_match, rurus_to_match)
+                else:
+                    delta = score_state.sync(yakus_to_match, rurus_to_match)
+                    st.info(
+                        "Puntuaciones actualizadas solo para los cambios: "
+                        f"Yakus {delta['yakus_added']} nuevos, {delta['yakus_edited']} editados, {delta['yakus_removed']} retirados; "
+                        f"Rurus {delta['rurus_added']} nuevos, {delta['rurus_edited']} editados, {delta['rurus_removed']} retirados."
+                    )
+                st.session_state.score_state = score_state
+                scores = score_state.to_scores_list()
                 st.session_state.scores_list = scores
-                if not scores:
+                st.success(f"Cálculo de puntuaciones finalizado. Se encontraron {len(scores)} pares compatibles.")
+                if not scores and previous_assignments is None:
                      st.warning("No se encontraron pares compatibles.")
                      st.stop()
 
                 # -- Asignación --
                 st.write("Realizando asignación final...")
-                assigned_df, unassigned_yakus_ids, unassigned_rurus_ids = find_best_matches(
-                    yakus_to_match, rurus_to_match, scores
-                )
+                if previous_assignments is not None:
+                    locked_pairs, previous_pairs = split_previous_assignments(previous_assignments)
+                    assigned_df, unassigned_yakus_ids, unassigned_rurus_ids, reassign_summary = find_best_matches_warm_start(
+                        yakus_to_match, rurus_to_match, scores, locked_pairs, previous_pairs
+                    )
+                    st.info(
+                        f"Reasignación: {reassign_summary['locked']} asignaciones MANUAL/FINAL conservadas, "
+                        f"{reassign_summary['kept']} del match anterior conservadas y {reassign_summary['new']} nuevas."
+                    )
+                    if reassign_summary['discarded']:
+                        st.warning(f"{reassign_summary['discarded']} asignaciones anteriores no se conservaron "
+                                   "(el Yaku o el Ruru ya no está, ya no son compatibles o estaban repetidos).")
+                else:
+                    assigned_df, unassigned_yakus_ids, unassigned_rurus_ids = find_best_matches(
+                        yakus_to_match, rurus_to_match, scores
+                    )
                 st.session_state.assigned_df = assigned_df
                 st.session_state.unassigned_yakus = unassigned_yakus_ids
                 st.session_state.unassigned_rurus = unassigned_rurus_ids
@@ -162,12 +217,32 @@ def match_page():
                     UNASSIGNED_RURU_COLS
                 )
 
-                # --- Generar Excel en Memoria ---
+                # --- Diagnóstico de Rurus no asignados ---
+                st.session_state.unassigned_diagnostics_df = diagnose_unassigned_rurus(
+                    yakus_to_match,
+                    rurus_to_match,
+                    unassigned_rurus_ids,
+                    assigned_df['yaku_id'] if not assigned_df.empty else [],
+                    selected_area
+                )
+                # Yakus libres con el horario más cercano a cada Ruru no asignado
+                st.session_state.near_miss_df = recommend_near_miss_yakus(
+                    yakus_to_match,
+                    rurus_to_match,
+                    unassigned_rurus_ids,
+                    unassigned_yakus_ids,
+                    selected_area
+                )
+
+                # --- Generar Excel en disco (en sesión solo se guarda la ruta) ---
                 st.write("Generando archivo Excel...")
-                st.session_state.excel_output = generate_excel_output(
+                st.session_state.excel_output = generate_excel_output_file(
                     st.session_state.assigned_formatted_df,
                     st.session_state.unassigned_yakus_formatted_df,
-                    st.session_state.unassigned_rurus_formatted_df
+                    st.session_state.unassigned_rurus_formatted_df,
+                    file_name="resultados_match.xlsx",
+                    diagnostics_df=st.session_state.unassigned_diagnostics_df,
+                    near_miss_df=st.session_state.near_miss_df
                 )
 
                 st.success(f"¡Proceso de Match para {selected_area} completado!")
@@ -183,7 +258,9 @@ def match_page():
         display_match_results(
             assigned_df=st.session_state.assigned_formatted_df,
             unassigned_yakus_df=st.session_state.unassigned_yakus_formatted_df,
-            unassigned_rurus_df=st.session_state.unassigned_rurus_formatted_df
+            unassigned_rurus_df=st.session_state.unassigned_rurus_formatted_df,
+            diagnostics_df=st.session_state.unassigned_diagnostics_df,
+            near_miss_df=st.session_state.near_miss_df
         )
         # --- FIN LLAMADA ---
     else:
@@ -193,13 +270,14 @@ def match_page():
     # --- Sección de Descarga ---
     st.header("4. Descargar Resultados")
     if st.session_state.excel_output:
-        excel_bytes = st.session_state.excel_output.getvalue()
-        st.download_button(
-            label="Descargar Resultados en Excel",
-            data=excel_bytes,
+        # El Excel se lee del disco solo cuando se pide la descarga
+        lazy_file_download_button(
+            st.session_state.excel_output,
             file_name=f"Resultados_Match_{st.session_state.current_match_area.replace(' ', '_')}.xlsx", # Usar área del estado
+            label="Descargar Resultados en Excel",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            key="download_button"
+            key="match_results",
+            expired_message="El archivo de resultados expiró del almacenamiento temporal. Vuelve a ejecutar el match para generarlo."
         )
     else:
         st.info("Ejecuta el match para generar el archivo de descarga.")
@@ -5,12 +5,8 @@ Permite generar archivos DOCX o PDF (usando LibreOffice via subprocess).
 """
 import streamlit as st
 import pandas as pd
-from docxtpl import DocxTemplate
-import zipfile
-from io import BytesIO
 import os
 import tempfile
-import subprocess
 import shutil
 
 # --- NUEVO: Intentar importar docx2pdf ---
@@ -21,21 +17,24 @@ except ImportError:
     PDF_ENABLED = False
     # No mostrar error aquí, lo haremos en la UI si el usuario elige PDF
 
-# --- Importar clean_str_number ---
-try:
-    # Asumiendo que output_generator está un nivel arriba
-    from ..utils.output_generator import clean_str_number
-except ImportError:
-    # Fallback si la importación principal aún falla por alguna razón
-    print("ADVERTENCIA: No se pudo importar clean_str_number desde utils. Usando fallback.")
-    def clean_str_number(val):
-        if pd.isna(val) or val == '': return ''
-        try:
-            cleaned_val = str(int(float(str(val))))
-        except (ValueError, TypeError):
-            cleaned_val = str(val).strip()
-        if cleaned_val.endswith('.0'): cleaned_val = cleaned_val[:-2]
-        return cleaned_val
+# --- Limpieza de números compartida ---
+from shared.normalization import clean_number_series
+
+# --- Renderizado de tarjetas (plantilla compilada una vez, en paralelo) ---
+from ..utils.card_renderer import render_cards
+
+# --- Caché de tarjetas por contenido (plantilla + contexto) ---
+from shared.digest import bytes_digest
+from shared.upload_cache import parse_upload
+from ..utils.card_cache import card_cache_key, get_cached_card, store_card, enforce_card_cache_limits
+
+# --- ZIP escrito en disco dentro del almacén temporal de la sesión ---
+from shared.artifact_writer import ZipArtifactWriter
+from preprocessing.utils.temp_storage import get_temp_path, atomic_path
+from preprocessing.ui.download import lazy_file_download_button
+
+# --- Conversión a PDF por lotes (procesos de LibreOffice en paralelo) ---
+from ..utils.card_converter import convert_docx_batch, SOFFICE_WORKERS
 
 # Mapeos específicos para BP según las reglas dadas
 MAPEO_COLEGIO = {
@@ -76,20 +75,109 @@ def find_libreoffice_path():
         return soffice_path
     return None
 
-# Función auxiliar para obtener prefijo (asumiendo IDs como 'CC123')
-def get_prefix(ruru_id):
-    if isinstance(ruru_id, str) and len(ruru_id) >= 2:
-        prefix = ruru_id[:2].upper()
-        return prefix
-    return None
+# Columnas de horario del Excel -> etiquetas de la plantilla
+HORARIO_TAGS = {
+    f'Horario {dia} Ruru': f'Horario_{dia}_Ruru'
+    for dia in ['Lunes', 'Martes', 'Miercoles', 'Jueves', 'Viernes', 'Sabado', 'Domingo']
+}
+
+# Texto mostrado según el nivel de quechua del Ruru (otros valores se muestran tal cual)
+QUECHUA_DISPLAY = {
+    "No lo hablo": "Español",
+    "Nivel básico": "Español y Quechua",
+}
 
-# Función auxiliar para limpiar valores de horario
-def format_schedule(value):
-    if pd.isna(value) or str(value).strip() == '':
-        return "No disponible"
-    return str(value).strip()
+
+def _text_column(df, column, default):
+    """Columna como texto sin espacios extremos (default si la columna no existe)."""
+    if column not in df.columns:
+        return pd.Series(str(default).strip(), index=df.index)
+    return df[column].astype(str).str.strip()
+
+
+def build_card_contexts(df, area_actual):
+    """
+    Construye los contextos de la plantilla para todas las filas de asignaciones.
+
+    Cada campo se calcula para la columna completa de una vez, en lugar de
+    recorrer las filas.
+
+    Args:
+        df: Hoja 'Asignaciones' filtrada por área.
+        area_actual: Área seleccionada.
+
+    Returns:
+        Lista de diccionarios (uno por fila) con los valores de las etiquetas de la plantilla.
+    """
+    ruru_ids = _text_column(df, 'ID Ruru', '')
+    prefixes = ruru_ids.str[:2].str.upper().where(ruru_ids.str.len() >= 2)
+    quechua = _text_column(df, 'Quechua Ruru', 'N/A')
+    nombre_apod = _text_column(df, 'Nombre Apoderado Ruru', '')
+    celular_apod = clean_number_series(df['Celular Apoderado Ruru']) if 'Celular Apoderado Ruru' in df.columns else pd.Series('', index=df.index)
+    tiene_celular_apod = celular_apod != ''
+
+    context_columns = {
+        'ID_Ruru': ruru_ids,
+        'Colegio': prefixes.map(MAPEO_COLEGIO).fillna('N/A'),
+        'Ciudad': prefixes.map(MAPEO_CIUDAD).fillna('N/A'),
+        'Grado_Original_Ruru': _text_column(df, 'Grado Original Ruru', 'N/A'),
+        'Quechua_Ruru': quechua.map(QUECHUA_DISPLAY).fillna(quechua),
+        'Nombre_Ruru': _text_column(df, 'Nombre Ruru', ''),
+        'Area': pd.Series(area_actual, index=df.index), # Usar el área seleccionada
+        'Nombre_Apoderado_Ruru': nombre_apod.where(nombre_apod.str.lower() != 'nan', ''),
+        'Celular_Asesoria_Ruru': clean_number_series(df['Celular Asesoria Ruru']) if 'Celular Asesoria Ruru' in df.columns else pd.Series('', index=df.index),
+        'Celular_del_Apoderado': tiene_celular_apod.map({True: "Celular del Apoderado:", False: ""}),
+        'Celular_Apoderado_Ruru': celular_apod,
+    }
+
+    # Horarios: vacío o ausente -> "No disponible"
+    for col_excel, tag_plantilla in HORARIO_TAGS.items():
+        if col_excel in df.columns:
+            horario = df[col_excel].astype(str).str.strip()
+            context_columns[tag_plantilla] = horario.where(df[col_excel].notna() & (horario != ''), "No disponible")
+        else:
+            context_columns[tag_plantilla] = pd.Series("No disponible", index=df.index)
+
+    # --- LÓGICA POR ÁREA ---
+    col_asignatura_taller = 'Asignatura/Taller Asignado' # Nombre de columna en Excel
+    if area_actual == "Arte & Cultura":
+        context_columns['Taller_asignado'] = _text_column(df, col_asignatura_taller, 'N/A') # {{ Taller_asignado }}
+    elif area_actual == "Asesoría a Colegios Nacionales":
+        context_columns['Asignatura'] = _text_column(df, col_asignatura_taller, 'N/A') # {{ Asignatura }}
+    # --- FIN LÓGICA POR ÁREA ---
+
+    return pd.DataFrame(context_columns, index=df.index).to_dict('records')
 
 # --- Pestaña Streamlit ---
+def load_card_assignments(uploaded_file, selected_area):
+    """
+    Lee la hoja 'Asignaciones' del Excel final y la filtra por área.
+
+    Args:
+        uploaded_file: Excel final del match
+        selected_area: Área de las tarjetas
+
+    Returns:
+        DataFrame con las asignaciones del área, o None si no hay o hubo un error
+    """
+    try:
+        # Leer solo la hoja de asignaciones
+        df_asignaciones = pd.read_excel(uploaded_file, sheet_name="Asignaciones")
+        # Filtrar por el área seleccionada (¡Asegúrate que la columna 'Area' exista!)
+        if 'Area' not in df_asignaciones.columns:
+            st.error("Error: La hoja 'Asignaciones' no contiene la columna 'Area'. No se puede filtrar.")
+            return None
+        df_filtrado = df_asignaciones[df_asignaciones['Area'] == selected_area].copy()
+        if df_filtrado.empty:
+            st.warning(f"No se encontraron asignaciones para el área '{selected_area}' en la hoja 'Asignaciones'.")
+            return None
+        st.success(f"Se cargaron {len(df_filtrado)} asignaciones para '{selected_area}'.")
+        return df_filtrado
+    except Exception as e:
+        st.error(f"Error al leer el archivo Excel: {e}")
+        return None
+
+
 def card_generator_tab():
     st.header("Generador de Tarjetas de Presentación (Yaku-Ruru)")
     st.write("Sube el template de Word y el archivo Excel final del match para generar las tarjetas.")
@@ -97,7 +185,7 @@ def card_generator_tab():
     # Estado de sesión específico
     if 'cardgen_template' not in st.session_state: st.session_state.cardgen_template = None
     if 'cardgen_excel_data' not in st.session_state: st.session_state.cardgen_excel_data = None
-    if 'cardgen_zip_buffer' not in st.session_state: st.session_state.cardgen_zip_buffer = None
+    if 'cardgen_zip_path' not in st.session_state: st.session_state.cardgen_zip_path = None
     if 'cardgen_area' not in st.session_state: st.session_state.cardgen_area = "Bienestar Psicológico" # Empezar con BP
     if 'cardgen_output_format' not in st.session_state: st.session_state.cardgen_output_format = "DOCX" # Nuevo estado
 
@@ -115,7 +203,7 @@ def card_generator_tab():
         st.session_state.cardgen_area = selected_area
         st.session_state.cardgen_template = None
         st.session_state.cardgen_excel_data = None
-        st.session_state.cardgen_zip_buffer = None
+        st.session_state.cardgen_zip_path = None
         st.rerun()
 
     st.subheader(f"Paso 1: Cargar Archivos para '{selected_area}'")
@@ -128,25 +216,8 @@ def card_generator_tab():
     if uploaded_template:
         st.session_state.cardgen_template = uploaded_template
     if uploaded_excel:
-        try:
-            # Leer solo la hoja de asignaciones
-            df_asignaciones = pd.read_excel(uploaded_excel, sheet_name="Asignaciones")
-            # Filtrar por el área seleccionada (¡Asegúrate que la columna 'Area' exista!)
-            if 'Area' in df_asignaciones.columns:
-                 df_filtrado = df_asignaciones[df_asignaciones['Area'] == selected_area].copy()
-                 if df_filtrado.empty:
-                     st.warning(f"No se encontraron asignaciones para el área '{selected_area}' en la hoja 'Asignaciones'.")
-                     st.session_state.cardgen_excel_data = None
-                 else:
-                     st.success(f"Se cargaron {len(df_filtrado)} asignaciones para '{selected_area}'.")
-                     st.session_state.cardgen_excel_data = df_filtrado
-            else:
-                 st.error("Error: La hoja 'Asignaciones' no contiene la columna 'Area'. No se puede filtrar.")
-                 st.session_state.cardgen_excel_data = None
-
-        except Exception as e:
-            st.error(f"Error al leer el archivo Excel: {e}")
-            st.session_state.cardgen_excel_data = None
+        # Solo se vuelve a leer el Excel si cambia el archivo o el área
+        st.session_state.cardgen_excel_data = parse_upload(uploaded_excel, "cardgen_excel_upload", load_card_assignments, selected_area)
 
     # Botón para generar
     if st.session_state.cardgen_template is not None and st.session_state.cardgen_excel_data is not None:
@@ -162,6 +233,7 @@ def card_generator_tab():
 
         # --- ACTUALIZADO: Advertencia PDF ahora verifica si encontramos LibreOffice ---
         libreoffice_path = None
+        soffice_workers = SOFFICE_WORKERS
         if output_format == "PDF":
             libreoffice_path = find_libreoffice_path()
             if not libreoffice_path:
@@ -171,6 +243,14 @@ def card_generator_tab():
             else:
                 st.success(f"Usando LibreOffice encontrado en: {libreoffice_path}")
                 generate_disabled = False
+            soffice_workers = st.number_input(
+                "Procesos de LibreOffice en paralelo:",
+                min_value=1,
+                max_value=max(SOFFICE_WORKERS, os.cpu_count() or 1),
+                value=SOFFICE_WORKERS,
+                key="cardgen_soffice_workers",
+                help="Cada proceso convierte un lote de tarjetas con su propio perfil de LibreOffice."
+            )
         else: # DOCX
              generate_disabled = False
 
@@ -184,135 +264,92 @@ def card_generator_tab():
                     # Usar la ruta encontrada o None si no se encontró y el formato es DOCX
                     lo_path = libreoffice_path if chosen_format == "PDF" else None
 
-                    zip_buffer = BytesIO()
-                    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                        processed_count = 0
-                        errors_count = 0
-                        for index, row in df_data.iterrows():
-                            ruru_id = str(row.get('ID Ruru', '')).strip()
-                            try:
-                                with tempfile.TemporaryDirectory() as temp_dir:
-                                    doc = DocxTemplate(template_file)
-                                    context = {}
-                                    # Llenar context (campos comunes)
-                                    context['ID_Ruru'] = ruru_id
-                                    prefix = get_prefix(ruru_id)
-                                    context['Colegio'] = MAPEO_COLEGIO.get(prefix, 'N/A')
-                                    context['Ciudad'] = MAPEO_CIUDAD.get(prefix, 'N/A')
-                                    context['Grado_Original_Ruru'] = str(row.get('Grado Original Ruru', 'N/A')).strip()
-                                    # Lógica Quechua (igual)
-                                    quechua_raw = str(row.get('Quechua Ruru', 'N/A')).strip()
-                                    if quechua_raw == "No lo hablo": context['Quechua_Ruru'] = "Español"
-                                    elif quechua_raw == "Nivel básico": context['Quechua_Ruru'] = "Español y Quechua"
-                                    else: context['Quechua_Ruru'] = quechua_raw
-                                    context['Nombre_Ruru'] = str(row.get('Nombre Ruru', '')).strip()
-                                    context['Area'] = area_actual # Usar el área seleccionada
-                                    # Lógica Apoderado y Celulares (igual)
-                                    nombre_apod_raw = str(row.get('Nombre Apoderado Ruru', '')).strip()
-                                    if nombre_apod_raw.lower() == 'nan': context['Nombre_Apoderado_Ruru'] = ""
-                                    else: context['Nombre_Apoderado_Ruru'] = nombre_apod_raw
-                                    context['Celular_Asesoria_Ruru'] = clean_str_number(row.get('Celular Asesoria Ruru'))
-                                    celular_apod_raw = row.get('Celular Apoderado Ruru')
-                                    celular_apod_clean = clean_str_number(celular_apod_raw)
-                                    if celular_apod_clean:
-                                        context['Celular_del_Apoderado'] = "Celular del Apoderado:"
-                                        context['Celular_Apoderado_Ruru'] = celular_apod_clean
-                                    else:
-                                        context['Celular_del_Apoderado'] = ""
-                                        context['Celular_Apoderado_Ruru'] = ""
-                                    # Lógica Horarios (igual)
-                                    for dia in ['Lunes', 'Martes', 'Miercoles', 'Jueves', 'Viernes', 'Sabado', 'Domingo']:
-                                        col_excel = f'Horario {dia} Ruru'
-                                        tag_plantilla = f'Horario_{dia}_Ruru'
-                                        context[tag_plantilla] = format_schedule(row.get(col_excel))
-
-                                    # --- LÓGICA POR ÁREA ---
-                                    col_asignatura_taller = 'Asignatura/Taller Asignado' # Nombre de columna en Excel
-
-                                    if area_actual == "Arte & Cultura":
-                                        taller_asignado_val = str(row.get(col_asignatura_taller, 'N/A')).strip()
-                                        context['Taller_asignado'] = taller_asignado_val # {{ Taller_asignado }}
-                                    elif area_actual == "Asesoría a Colegios Nacionales":
-                                        asignatura_val = str(row.get(col_asignatura_taller, 'N/A')).strip()
-                                        context['Asignatura'] = asignatura_val # {{ Asignatura }}
-                                    # else: # Podrías añadir lógica para Bienestar Psicológico si tuviera campos específicos
-                                    #     pass
-                                    # --- FIN LÓGICA POR ÁREA ---
-
-                                    # Renderizar DOCX
-                                    doc.render(context)
-                                    temp_docx_path = os.path.join(temp_dir, f"{ruru_id}.docx")
-                                    doc.save(temp_docx_path)
-
-                                    # --- REEMPLAZO: Usar subprocess para PDF ---
-                                    if chosen_format == "PDF":
-                                        pdf_path = os.path.join(temp_dir, f"{ruru_id}.pdf")
-                                        cmd = [
-                                            lo_path, # Usar la ruta encontrada
-                                            '--headless',         # No mostrar UI
-                                            '--convert-to', 'pdf', # Formato de salida
-                                            '--outdir', temp_dir, # Directorio de salida
-                                            temp_docx_path        # Archivo de entrada
-                                        ]
-                                        try:
-                                            # Ejecutar el comando
-                                            process = subprocess.run(cmd, capture_output=True, text=True, check=False, timeout=30) # Timeout de 30s
-
-                                            # Verificar si LibreOffice reportó un error (código de retorno no cero)
-                                            if process.returncode != 0:
-                                                raise RuntimeError(f"LibreOffice falló (código {process.returncode}). Error: {process.stderr}")
-
-                                            # Verificar si el PDF fue creado
-                                            if not os.path.exists(pdf_path):
-                                                raise RuntimeError(f"LibreOffice terminó correctamente (código {process.returncode}) pero no se encontró el archivo PDF. Output: {process.stdout} Stderr: {process.stderr}")
-
-                                            # Leer el PDF si todo fue bien
-                                            with open(pdf_path, "rb") as f_pdf:
-                                                file_content = f_pdf.read()
-                                            file_extension = ".pdf"
-
-                                        except subprocess.TimeoutExpired:
-                                             errors_count += 1
-                                             st.warning(f"Timeout al convertir a PDF para Ruru ID '{ruru_id}'. LibreOffice tardó demasiado. Se omitirá.")
-                                             continue
-                                        except Exception as e_pdf:
-                                            errors_count += 1
-                                            st.warning(f"Error al convertir a PDF con LibreOffice para Ruru ID '{ruru_id}': {e_pdf}. Se omitirá.")
-                                            continue # Saltar al siguiente Ruru
-                                    else: # Formato DOCX
-                                        with open(temp_docx_path, "rb") as f_docx:
-                                            file_content = f_docx.read()
-                                        file_extension = ".docx"
-                                    # --- FIN REEMPLAZO ---
-
-                                    filename_in_zip = f"{ruru_id}{file_extension}"
-                                    zipf.writestr(filename_in_zip, file_content)
-                                    processed_count += 1
-
-                            except Exception as e_row:
+                    area_filename = area_actual.replace(" ", "_").replace("&", "y")
+                    zip_path = get_temp_path(f"Tarjetas_{area_filename}_{chosen_format}.zip")
+                    processed_count = 0
+                    errors_count = 0
+                    reused_count = 0
+                    extension = ".pdf" if chosen_format == "PDF" else ".docx"
+                    template_bytes = template_file.getvalue()
+                    template_digest = bytes_digest(template_bytes)
+                    # El ZIP se escribe directamente en disco; en la sesión solo queda su ruta
+                    with tempfile.TemporaryDirectory() as temp_dir, \
+                            atomic_path(zip_path) as partial_zip_path, \
+                            ZipArtifactWriter(partial_zip_path) as zipf:
+                        # 1. Contextos de todas las filas (un Ruru repetido conserva su última fila)
+                        jobs = {context['ID_Ruru']: context for context in build_card_contexts(df_data, area_actual)}
+                        cache_keys = {ruru_id: card_cache_key(template_digest, context) for ruru_id, context in jobs.items()}
+
+                        # 2. Reutilizar las tarjetas cuyo contexto no cambió
+                        to_render = []
+                        docx_sources = {} # ruru_id -> DOCX a convertir a PDF
+                        batch_cards = [] # Tarjetas de la caché usadas en este lote (no se evictan)
+                        for ruru_id, context in jobs.items():
+                            cached_path = get_cached_card(cache_keys[ruru_id], extension)
+                            if cached_path:
+                                batch_cards.append(cached_path)
+                                zipf.add_file(cached_path, f"{ruru_id}{extension}")
+                                processed_count += 1
+                                reused_count += 1
+                                continue
+                            cached_docx = get_cached_card(cache_keys[ruru_id], ".docx") if chosen_format == "PDF" else None
+                            if cached_docx:
+                                batch_cards.append(cached_docx)
+                                docx_sources[ruru_id] = shutil.copy(cached_docx, os.path.join(temp_dir, f"{ruru_id}.docx"))
+                            else:
+                                to_render.append((ruru_id, context))
+
+                        # 3. Renderizar en paralelo; en DOCX cada tarjeta va al ZIP en cuanto está lista
+                        for ruru_id, docx_path, error in render_cards(template_bytes, to_render, temp_dir):
+                            if error:
                                 errors_count += 1
-                                st.warning(f"Error general al procesar Ruru ID '{ruru_id}': {e_row}")
+                                st.warning(f"Error general al procesar Ruru ID '{ruru_id}': {error}")
+                                continue
+                            batch_cards.append(store_card(cache_keys[ruru_id], ".docx", docx_path))
+                            if chosen_format == "PDF":
+                                docx_sources[ruru_id] = docx_path
+                            else: # Formato DOCX
+                                zipf.add_file(docx_path, f"{ruru_id}.docx")
+                                processed_count += 1
+
+                        # 4. Convertir a PDF por lotes (pocas invocaciones de LibreOffice)
+                        if chosen_format == "PDF" and docx_sources:
+                            converted, failed = convert_docx_batch(
+                                lo_path, list(docx_sources.values()), os.path.join(temp_dir, "pdf"),
+                                workers=int(soffice_workers)
+                            )
+                            for ruru_id, docx_path in docx_sources.items():
+                                if docx_path in converted:
+                                    batch_cards.append(store_card(cache_keys[ruru_id], ".pdf", converted[docx_path]))
+                                    zipf.add_file(converted[docx_path], f"{ruru_id}.pdf")
+                                    processed_count += 1
+                                else:
+                                    errors_count += 1
+                                    st.warning(f"Error al convertir a PDF con LibreOffice para Ruru ID '{ruru_id}': {failed.get(docx_path)}. Se omitirá.")
 
-                    zip_buffer.seek(0)
-                    st.session_state.cardgen_zip_buffer = zip_buffer
+                    # Evicción de la caché de tarjetas una sola vez por lote
+                    enforce_card_cache_limits(keep=batch_cards)
+                    st.session_state.cardgen_zip_path = zip_path
 
                     if processed_count > 0: st.success(f"Se generaron {processed_count} tarjetas en formato {chosen_format} correctamente.")
+                    if reused_count > 0: st.info(f"{reused_count} tarjetas no cambiaron y se reutilizaron sin volver a generarlas.")
                     if errors_count > 0: st.error(f"Hubo errores al generar/convertir {errors_count} tarjetas.")
                     if processed_count == 0 and errors_count == 0: st.info("No se procesó ninguna tarjeta.")
 
                 except Exception as e:
                     st.error(f"Ocurrió un error general durante la generación: {e}")
-                    st.session_state.cardgen_zip_buffer = None
+                    st.session_state.cardgen_zip_path = None
 
-    # Botón de descarga
-    if st.session_state.get('cardgen_zip_buffer'):
+    # Botón de descarga (el ZIP se lee del disco solo cuando se pide)
+    if st.session_state.get('cardgen_zip_path'):
         st.subheader("Paso 3: Descargar Tarjetas")
         area_filename = st.session_state.cardgen_area.replace(" ", "_").replace("&", "y")
         output_format_dl = st.session_state.cardgen_output_format # Usar el formato elegido
-        st.download_button(
-            label=f"Descargar Tarjetas_{area_filename}_{output_format_dl}.zip", # Nombre archivo incluye formato
-            data=st.session_state.cardgen_zip_buffer,
+        lazy_file_download_button(
+            st.session_state.cardgen_zip_path,
             file_name=f"Tarjetas_{area_filename}_{output_format_dl}.zip",
+            label=f"Descargar Tarjetas_{area_filename}_{output_format_dl}.zip", # Nombre archivo incluye formato
             mime="application/zip",
-            key="cardgen_download_button"
+            key="cardgen_zip",
+            expired_message="El archivo de tarjetas expiró del almacenamiento temporal. Vuelve a generarlas."
         ) 
\ No newline at end of file
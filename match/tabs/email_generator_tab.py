@@ -7,17 +7,12 @@ import pandas as pd
 from io import BytesIO
 import html  # Para escapar caracteres especiales si es necesario en el futuro
 
-# --- Importar clean_str_number (Reutilizar) ---
-try:
-    from ..utils.output_generator import clean_str_number
-except ImportError:
-    print("ADVERTENCIA: No se pudo importar clean_str_number desde utils. Usando fallback.")
-    def clean_str_number(val):
-        if pd.isna(val) or val == '': return ''
-        try: cleaned_val = str(int(float(str(val))))
-        except (ValueError, TypeError): cleaned_val = str(val).strip()
-        if cleaned_val.endswith('.0'): cleaned_val = cleaned_val[:-2]
-        return cleaned_val
+# --- Limpieza de números compartida ---
+from shared.normalization import clean_str_number
+
+# --- Envío masivo en segundo plano ---
+from emailing.core.email_dispatcher import dispatch_key
+from emailing.utils.bulk_send import render_bulk_send
 
 # --- Constantes de Texto ---
 # (Mover textos largos aquí hace el código más limpio)
@@ -205,6 +200,7 @@ def email_generator_tab():
                                 "yaku_nombre": yaku_nombre,
                                 "yaku_id": yaku_id,
                                 "yaku_correo": yaku_correo, # <-- Guardar correo
+                                "ruru_id": ruru_id,
                                 "subject": subject,
                                 "html_body": html_body
                             })
@@ -276,6 +272,19 @@ def email_generator_tab():
              st.warning("Índice de correo inválido.")
              st.session_state.emailgen_current_index = 0 # Resetear
 
+        # Envío automático de todos los correos (reanuda sin reenviar los ya enviados)
+        st.subheader("Paso 4: Enviar Correos Automáticamente")
+        bulk_messages = [
+            {
+                "key": dispatch_key(content['yaku_id'], content.get('ruru_id', ''), st.session_state.emailgen_area),
+                "recipient_email": "" if content.get('yaku_correo', '') in ("", "nan") else content['yaku_correo'],
+                "subject": content['subject'],
+                "html_content": content['html_body']
+            }
+            for content in content_list
+        ]
+        render_bulk_send(f"bienvenida_{st.session_state.emailgen_area}", bulk_messages, key_prefix="emailgen")
+
     elif st.session_state.emailgen_excel_data is not None and st.session_state.emailgen_excel_data.empty:
         st.info(f"No hay asignaciones para el área '{st.session_state.emailgen_area}' en el archivo cargado.")
     else:
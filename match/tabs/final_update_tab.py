@@ -7,22 +7,19 @@ import streamlit as st
 import pandas as pd
 from io import BytesIO
 
+from shared.normalization import clean_number_series
+from preprocessing.ui.download import lazy_file_download_button
+
 # Reutilizar funciones (asegúrate de que las rutas sean correctas)
 try:
-    from ..utils.output_generator import generate_excel_output, clean_str_number
+    from ..utils.output_generator import generate_excel_output_file
 except ImportError:
     # Simplemente define fallbacks o lanza el error para depurar
     # st.error("Error al importar utilidades. Verifica la estructura de archivos.") <-- ELIMINAR ESTA LÍNEA
     print("ADVERTENCIA: No se pudieron importar las utilidades desde ..utils.output_generator. Usando fallbacks.") # Opcional: print para consola
     # Fallbacks temporales (si quieres que la app intente funcionar sin las utils)
-    def clean_str_number(val):
-        if pd.isna(val) or val == '': return ''
-        try: cleaned_val = str(int(float(str(val))))
-        except (ValueError, TypeError): cleaned_val = str(val).strip()
-        if cleaned_val.endswith('.0'): cleaned_val = cleaned_val[:-2]
-        return cleaned_val
-    def generate_excel_output(df1, df2, df3):
-        print("Error: La función generate_excel_output no está disponible.")
+    def generate_excel_output_file(df1, df2, df3, file_name=None):
+        print("Error: La función generate_excel_output_file no está disponible.")
         return None # O retorna un error/None
 
 
@@ -65,7 +62,7 @@ def load_transformed_rurus(uploaded_file):
         if not ruru_id_col:
             st.error(f"Error: No se encontró una columna de ID de Ruru ({', '.join(RURU_ID_COLS)}) en Rurus Transformados.")
             return None, None
-        df[ruru_id_col] = df[ruru_id_col].apply(clean_str_number)
+        df[ruru_id_col] = clean_number_series(df[ruru_id_col])
         df = df.astype(str) # Convertir todo a string por si acaso
         # Validar columnas mínimas útiles (puedes añadir más)
         required = [ruru_id_col, 'nombre', 'apellido', 'area', 'grado_original']
@@ -86,8 +83,8 @@ def load_final_assignments(uploaded_file):
             st.error(f"Error: El archivo de asignaciones finales debe contener las columnas '{FINAL_ASSIGN_RURU_COL}' y '{FINAL_ASSIGN_YAKU_COL}'.")
             return None
         # Limpiar IDs
-        df[FINAL_ASSIGN_RURU_COL] = df[FINAL_ASSIGN_RURU_COL].apply(clean_str_number)
-        df[FINAL_ASSIGN_YAKU_COL] = df[FINAL_ASSIGN_YAKU_COL].apply(clean_str_number)
+        df[FINAL_ASSIGN_RURU_COL] = clean_number_series(df[FINAL_ASSIGN_RURU_COL])
+        df[FINAL_ASSIGN_YAKU_COL] = clean_number_series(df[FINAL_ASSIGN_YAKU_COL])
         # Eliminar filas donde falte algún ID
         df = df.dropna(subset=[FINAL_ASSIGN_RURU_COL, FINAL_ASSIGN_YAKU_COL])
         # Eliminar filas con IDs vacíos después de limpiar
@@ -99,79 +96,174 @@ def load_final_assignments(uploaded_file):
         st.error(f"Error al leer el archivo de asignaciones finales: {e}")
         return None
 
+DIAS_SEMANA = ['Lunes', 'Martes', 'Miercoles', 'Jueves', 'Viernes', 'Sabado', 'Domingo']
+
+# Datos del Yaku tomados de una fila de 'Asignaciones': {campo consolidado: columna de la hoja}
+ASSIGNED_YAKU_FIELDS = {
+    'nombre': 'Nombre Yaku',
+    'area': 'Area',
+    'asignatura': 'Asignatura/Taller Asignado',
+    'dni': 'DNI Yaku',
+    'correo': 'Correo Yaku',
+    'celular': 'Celular Yaku',
+    'quechua': 'Quechua Yaku',
+}
+
+
+def _find_column(df, candidates):
+    """Primera columna de candidates presente en df (None si ninguna)."""
+    return next((col for col in candidates if col in df.columns), None)
+
+
+def _column_values(df, column, default=None):
+    """Valores de una columna como lista, o default repetido si la columna no existe."""
+    if column in df.columns:
+        return df[column].tolist()
+    return [default] * len(df)
+
+
 def get_consolidated_yakus(current_results_data):
-    """Crea un DataFrame consolidado de todos los Yakus del área."""
+    """
+    Crea un DataFrame consolidado de todos los Yakus del área.
+
+    Toma primero los Yakus No Asignados (todas sus columnas) y luego los Yakus
+    de Asignaciones que no aparecen en esa hoja (solo sus datos de Yaku). Si
+    un ID se repite se conserva su primera aparición.
+    """
     df_assigned = current_results_data.get("Asignaciones", pd.DataFrame())
     df_na = current_results_data.get("Yakus No Asignados", pd.DataFrame())
 
-    yakus_all = {} # Usar dict para evitar duplicados por ID
-
-    # Identificar columna ID Yaku en No Asignados
-    yaku_na_id_col = None
-    for col in YAKU_ID_COLS:
-        if col in df_na.columns:
-            yaku_na_id_col = col
-            break
+    yaku_na_id_col = _find_column(df_na, YAKU_ID_COLS)
+    yaku_as_id_col = _find_column(df_assigned, YAKU_ID_COLS)
 
-    # Identificar columna ID Yaku en Asignados
-    yaku_as_id_col = None
-    for col in YAKU_ID_COLS:
-        if col in df_assigned.columns:
-            yaku_as_id_col = col
-            break
+    parts = []
+    na_ids = pd.Series([], dtype=object)
 
-    # Procesar Yakus No Asignados
+    # Yakus No Asignados: fila completa, primera aparición de cada ID
     if yaku_na_id_col and not df_na.empty:
-        df_na[yaku_na_id_col] = df_na[yaku_na_id_col].apply(clean_str_number)
-        for _, row in df_na.iterrows():
-            yaku_id = row[yaku_na_id_col]
-            if yaku_id and yaku_id not in yakus_all:
-                yakus_all[yaku_id] = row.to_dict()
-                yakus_all[yaku_id]['origen'] = 'Yakus No Asignados' # Marcar origen por si acaso
-                yakus_all[yaku_id]['ID'] = yaku_id # Asegurar un campo ID estándar
-
-    # Procesar Yakus Asignados (obtener detalles del Yaku, no del Ruru)
+        df_na[yaku_na_id_col] = clean_number_series(df_na[yaku_na_id_col])
+        ids = df_na[yaku_na_id_col]
+        na_part = df_na[(ids != '') & ~ids.duplicated()].astype(object)
+        na_part['origen'] = 'Yakus No Asignados' # Marcar origen por si acaso
+        na_part['ID'] = na_part[yaku_na_id_col] # Asegurar un campo ID estándar
+        na_ids = na_part['ID']
+        if not na_part.empty:
+            parts.append(na_part.set_axis(na_part['ID'].tolist()))
+
+    # Yakus Asignados no presentes en No Asignados (datos del Yaku, no del Ruru)
     if yaku_as_id_col and not df_assigned.empty:
-         df_assigned[yaku_as_id_col] = df_assigned[yaku_as_id_col].apply(clean_str_number)
-         for _, row in df_assigned.iterrows():
-            yaku_id = row[yaku_as_id_col]
-            if yaku_id and yaku_id not in yakus_all:
-                # Extraer columnas relevantes del Yaku de la fila de asignación
-                yaku_data = { 'ID': yaku_id }
-                # Intentar obtener datos relevantes del Yaku (ajusta nombres si es necesario)
-                yaku_data['nombre'] = row.get('Nombre Yaku')
-                yaku_data['area'] = row.get('Area')
-                yaku_data['asignatura'] = row.get('Asignatura/Taller Asignado') # O como se llame
-                yaku_data['dni'] = row.get('DNI Yaku')
-                yaku_data['correo'] = row.get('Correo Yaku')
-                yaku_data['celular'] = row.get('Celular Yaku')
-                yaku_data['quechua'] = row.get('Quechua Yaku')
-                for dia in ['Lunes', 'Martes', 'Miercoles', 'Jueves', 'Viernes', 'Sabado', 'Domingo']:
-                    col_name = f'Horario {dia} Yaku'
-                    if col_name in row:
-                        yaku_data[f'horario_{dia.lower()}'] = row[col_name]
-                yaku_data['origen'] = 'Asignaciones'
-                yakus_all[yaku_id] = yaku_data
-
-    if not yakus_all:
+        df_assigned[yaku_as_id_col] = clean_number_series(df_assigned[yaku_as_id_col])
+        ids = df_assigned[yaku_as_id_col]
+        as_rows = df_assigned[(ids != '') & ~ids.duplicated() & ~ids.isin(na_ids)]
+        if not as_rows.empty:
+            as_part = {'ID': as_rows[yaku_as_id_col].tolist()}
+            for field, column in ASSIGNED_YAKU_FIELDS.items():
+                as_part[field] = _column_values(as_rows, column)
+            for dia in DIAS_SEMANA:
+                col_name = f'Horario {dia} Yaku'
+                if col_name in as_rows.columns:
+                    as_part[f'horario_{dia.lower()}'] = as_rows[col_name].tolist()
+            as_part['origen'] = ['Asignaciones'] * len(as_rows)
+            parts.append(pd.DataFrame(as_part, index=as_part['ID'], dtype=object))
+
+    if not parts:
         st.warning("No se encontraron Yakus en las hojas 'Asignaciones' o 'Yakus No Asignados' del archivo de resultados actual.")
         return pd.DataFrame(), None
 
-    # Convertir a DataFrame
-    consolidated_df = pd.DataFrame.from_dict(yakus_all, orient='index')
-    # Identificar la columna ID final (debería ser 'ID')
-    final_yaku_id_col = 'ID'
-    if final_yaku_id_col not in consolidated_df.columns:
-         # Fallback si 'ID' no se creó
-         if yaku_na_id_col in consolidated_df.columns: final_yaku_id_col = yaku_na_id_col
-         elif yaku_as_id_col in consolidated_df.columns: final_yaku_id_col = yaku_as_id_col
-         else:
-             st.error("No se pudo determinar una columna ID única para los Yakus consolidados.")
-             return pd.DataFrame(), None
-
-    consolidated_df[final_yaku_id_col] = consolidated_df[final_yaku_id_col].astype(str) # Asegurar string
+    # Unir y volver a inferir el tipo de cada columna como lo haría DataFrame.from_dict
+    combined = pd.concat(parts)
+    consolidated_df = pd.DataFrame(
+        {col: pd.Series(combined[col].tolist(), index=combined.index) for col in combined.columns}
+    )
     consolidated_df = consolidated_df.astype(str) # Convertir todo a string
-    return consolidated_df, final_yaku_id_col
+    return consolidated_df, 'ID'
+
+
+def build_final_results(final_assignments, rurus_df, rurus_id_col, yakus_df, yakus_id_col):
+    """
+    Construye las tres hojas finales a partir de las asignaciones deseadas.
+
+    Los IDs se validan con máscaras isin, los datos de Rurus y Yakus se
+    traen con un reindex por ID y los No Asignados son los Rurus y Yakus que
+    no aparecen en ninguna asignación válida. Si un ID se repite en
+    rurus_df o yakus_df se usa su primera aparición.
+
+    Args:
+        final_assignments: DataFrame con FINAL_ASSIGN_RURU_COL y FINAL_ASSIGN_YAKU_COL
+        rurus_df: Rurus Transformados filtrados por área (todo string)
+        rurus_id_col: Columna de ID en rurus_df
+        yakus_df: Yakus consolidados (get_consolidated_yakus)
+        yakus_id_col: Columna de ID en yakus_df
+
+    Returns:
+        Tupla (asignaciones, yakus_no_asignados, rurus_no_asignados, errores)
+    """
+    rurus_db = rurus_df.drop_duplicates(subset=[rurus_id_col], keep='first').set_index(rurus_id_col)
+    yakus_db = yakus_df.drop_duplicates(subset=[yakus_id_col], keep='first').set_index(yakus_id_col)
+
+    ruru_ids = final_assignments[FINAL_ASSIGN_RURU_COL]
+    yaku_ids = final_assignments[FINAL_ASSIGN_YAKU_COL]
+    ruru_found = ruru_ids.isin(rurus_db.index)
+    yaku_found = yaku_ids.isin(yakus_db.index)
+    valid = ruru_found & yaku_found
+
+    # Reporte de errores completo, en el orden del archivo final
+    errors = []
+    invalid = final_assignments[~valid]
+    for idx, ruru_id, yaku_id, ruru_ok in zip(
+        invalid.index, invalid[FINAL_ASSIGN_RURU_COL], invalid[FINAL_ASSIGN_YAKU_COL], ruru_found[~valid]
+    ):
+        if not ruru_ok:
+            errors.append(f"ID Ruru '{ruru_id}' (Fila {idx+2} archivo final) no encontrado en Rurus Transformados para 'Arte y Cultura'.")
+        else:
+            errors.append(f"ID Yaku '{yaku_id}' (Fila {idx+2} archivo final) no encontrado en Yakus consolidados.")
+
+    # Datos de cada asignación válida, alineados por ID
+    valid_ruru_ids = ruru_ids[valid]
+    valid_yaku_ids = yaku_ids[valid]
+    rurus = rurus_db.reindex(valid_ruru_ids.tolist())
+    yakus = yakus_db.reindex(valid_yaku_ids.tolist())
+
+    def ruru(column, default=None):
+        return _column_values(rurus, column, default)
+
+    def yaku(column, default=None):
+        return _column_values(yakus, column, default)
+
+    def clean(values):
+        return clean_number_series(pd.Series(values, dtype=object)).tolist()
+
+    assigned = {}
+    if valid.any():
+        assigned = {
+            'ID Ruru': valid_ruru_ids.tolist(),
+            'ID Yaku': valid_yaku_ids.tolist(),
+            'Nombre Ruru': [f"{nombre} {apellido}".strip() for nombre, apellido in zip(ruru('nombre', ''), ruru('apellido', ''))],
+            'Nombre Yaku': yaku('nombre', ''),
+            'Area': yaku('area', 'Arte y Cultura'), # Forzar o tomar del Yaku
+            'Asignatura/Taller Asignado': [
+                asignatura or taller for asignatura, taller in zip(yaku('asignatura'), yaku('taller', 'N/A'))
+            ],
+            'Grado Original Ruru': ruru('grado_original', ''),
+            'Score Match': ['FINAL'] * int(valid.sum()),
+            'Celular Apoderado Ruru': clean(ruru('celular')),
+            'Celular Asesoria Ruru': clean(ruru('celular_asesoria')),
+            'DNI Ruru': clean(ruru('DNI')),
+            'DNI Yaku': clean(yaku('dni')),
+            'Correo Yaku': yaku('correo', ''),
+            'Celular Yaku': clean(yaku('celular')),
+            'Quechua Yaku': yaku('quechua', ''),
+            'Quechua Ruru': ruru('quechua', ''),
+        }
+        for dia in DIAS_SEMANA:
+            assigned[f'Horario {dia} Yaku'] = yaku(f'horario_{dia.lower()}', '')
+            assigned[f'Horario {dia} Ruru'] = ruru(f'horario_{dia.lower()}', '')
+
+    # No asignados: anti-join contra los IDs con asignación válida
+    rurus_na_df = rurus_df[~rurus_df[rurus_id_col].isin(valid_ruru_ids)].copy()
+    yakus_na_df = yakus_df[~yakus_df[yakus_id_col].isin(valid_yaku_ids)].copy()
+
+    return pd.DataFrame(assigned), yakus_na_df, rurus_na_df, errors
 
 
 # --- Pestaña Streamlit ---
@@ -250,129 +342,34 @@ def final_update_tab():
                 # Ahora, un duplicado significaría que el mismo Ruru está listado dos veces PARA ARTE Y CULTURA, lo cual sí sería un problema de datos.
                 if rurus_transformed_df_filtered[rurus_id_col].duplicated().any():
                      st.warning(f"Advertencia: Se encontraron IDs duplicados en la columna '{rurus_id_col}' del archivo Rurus Transformados *DENTRO DEL ÁREA 'Arte y Cultura'*. Esto puede indicar un problema en los datos fuente. Se usará la primera ocurrencia de cada ID.")
-                     # Aplicar drop_duplicates aquí es más seguro ahora que estamos dentro del área
-                     rurus_db = rurus_transformed_df_filtered.drop_duplicates(subset=[rurus_id_col], keep='first').set_index(rurus_id_col)
-                else:
-                     # Si no hay duplicados dentro del área, simplemente settear el índice
-                     rurus_db = rurus_transformed_df_filtered.set_index(rurus_id_col)
-
 
                 yakus_consolidated_df = st.session_state.finalup_yakus_consolidated
                 yakus_id_col = st.session_state.finalup_yakus_id_col
-                # (La lógica para duplicados de Yakus se mantiene por si acaso)
                 if yakus_consolidated_df[yakus_id_col].duplicated().any():
                      st.warning(f"Advertencia: Se encontraron IDs duplicados para Yakus ('{yakus_id_col}'). Se usará la primera ocurrencia.")
-                     yakus_db = yakus_consolidated_df.drop_duplicates(subset=[yakus_id_col], keep='first').set_index(yakus_id_col)
-                else:
-                     yakus_db = yakus_consolidated_df.set_index(yakus_id_col)
-
-
-                current_results = st.session_state.finalup_current_results
-                new_assignments_list = []
-                processed_ruru_ids = set()
-                processed_yaku_ids = set()
-                errors = []
-                # Ya no necesitamos la lista 'warnings' para duplicados esperados entre áreas
-
-                # 1. Construir la nueva hoja de Asignaciones
-                for idx, row in final_assignments.iterrows():
-                    ruru_id = row[FINAL_ASSIGN_RURU_COL]
-                    yaku_id = row[FINAL_ASSIGN_YAKU_COL]
-
-                    # Validar existencia en los índices (que ahora son filtrados por área para Rurus)
-                    if ruru_id not in rurus_db.index:
-                        errors.append(f"ID Ruru '{ruru_id}' (Fila {idx+2} archivo final) no encontrado en Rurus Transformados para 'Arte y Cultura'.")
-                        continue
-                    if yaku_id not in yakus_db.index:
-                        errors.append(f"ID Yaku '{yaku_id}' (Fila {idx+2} archivo final) no encontrado en Yakus consolidados.")
-                        continue
-
-                    # --- OBTENER DATOS (YA NO DEBERÍA HABER AMBIGÜEDAD POR ÁREA) ---
-                    try:
-                        # .loc ahora debería devolver una Serie única porque filtramos por área y manejamos duplicados *dentro* del área.
-                        ruru_data = rurus_db.loc[ruru_id]
-                        yaku_data = yakus_db.loc[yaku_id] # Asume ID Yaku único
-                        # Si aún hubiera duplicados en Yakus, necesitaríamos .iloc[0]
-                        if isinstance(yaku_data, pd.DataFrame):
-                             yaku_data = yaku_data.iloc[0]
-
-                    except Exception as e:
-                         errors.append(f"Error inesperado al buscar Ruru '{ruru_id}' o Yaku '{yaku_id}' (después de filtrar por área): {e}")
-                         continue
-                    # --- FIN OBTENER DATOS ---
-
-                    # Construir fila (el código aquí es el mismo que antes)
-                    assignment_row = {
-                        'ID Ruru': ruru_id,
-                        'ID Yaku': yaku_id,
-                        'Nombre Ruru': f"{ruru_data.get('nombre', '')} {ruru_data.get('apellido', '')}".strip(),
-                        'Nombre Yaku': yaku_data.get('nombre', ''),
-                        'Area': yaku_data.get('area', 'Arte y Cultura'), # Forzar o tomar del Yaku
-                        'Asignatura/Taller Asignado': yaku_data.get('asignatura') or yaku_data.get('taller', 'N/A'),
-                        'Grado Original Ruru': ruru_data.get('grado_original', ''),
-                        'Score Match': 'FINAL',
-                        'Celular Apoderado Ruru': clean_str_number(ruru_data.get('celular')),
-                        'Celular Asesoria Ruru': clean_str_number(ruru_data.get('celular_asesoria')),
-                        'DNI Ruru': clean_str_number(ruru_data.get('DNI')),
-                        'DNI Yaku': clean_str_number(yaku_data.get('dni')),
-                        'Correo Yaku': yaku_data.get('correo', ''),
-                        'Celular Yaku': clean_str_number(yaku_data.get('celular')),
-                        'Quechua Yaku': yaku_data.get('quechua', ''),
-                        'Quechua Ruru': ruru_data.get('quechua', ''),
-                    }
-                    for dia in ['Lunes', 'Martes', 'Miercoles', 'Jueves', 'Viernes', 'Sabado', 'Domingo']:
-                         yaku_col = f'horario_{dia.lower()}'
-                         ruru_col = f'horario_{dia.lower()}'
-                         assignment_row[f'Horario {dia} Yaku'] = yaku_data.get(yaku_col, '')
-                         assignment_row[f'Horario {dia} Ruru'] = ruru_data.get(ruru_col, '')
-
-                    new_assignments_list.append(assignment_row)
-                    processed_ruru_ids.add(ruru_id)
-                    processed_yaku_ids.add(yaku_id)
-
-                # Mostrar errores (ya no mostramos warnings de duplicados entre áreas)
+
+                # 1-3. Asignaciones con datos de Ruru y Yaku, y No Asignados restantes
+                new_assignments_df, yakus_na_final_df, rurus_na_final_df, errors = build_final_results(
+                    final_assignments, rurus_transformed_df_filtered, rurus_id_col,
+                    yakus_consolidated_df, yakus_id_col
+                )
+
                 if errors:
                     st.error("Se encontraron errores al procesar el archivo final:")
                     for error in errors:
                         st.error(f"- {error}")
                     st.warning("Las filas con errores fueron omitidas.")
 
-                # 2. Determinar No Asignados Finales
-                #    all_ruru_ids ahora se basa en el índice de rurus_db, que ya está filtrado por área.
-                all_ruru_ids_area = set(rurus_db.index)
-                all_yaku_ids = set(yakus_db.index) # Yakus son consolidados, asumimos que pertenecen a esta área o son generales.
-
-                final_rurus_na_ids = all_ruru_ids_area - processed_ruru_ids
-                final_yakus_na_ids = all_yaku_ids - processed_yaku_ids
-
-                # 3. Construir Hojas No Asignados Finales
-                # Usar Rurus Transformados *filtrados* para datos de Rurus NA
-                # Usamos el DataFrame filtrado original (antes del set_index)
-                rurus_na_final_df = st.session_state.finalup_rurus_transformed[
-                    st.session_state.finalup_rurus_transformed[st.session_state.finalup_rurus_id_col].isin(final_rurus_na_ids)
-                ].copy()
-                # Renombrar columnas si es necesario para coincidir con hoja "Rurus No Asignados" original
-                # Ejemplo: renombrar 'ID del estudiante:' a 'ID Ruru' si es necesario
-                # rurus_na_final_df.rename(columns={'ID del estudiante:': 'ID Ruru'}, inplace=True)
-                # Asegúrate de que tenga las columnas esperadas por generate_excel_output
-
-                # Usar Yakus Consolidados para datos de Yakus NA
-                yakus_na_final_df = st.session_state.finalup_yakus_consolidated[
-                    st.session_state.finalup_yakus_consolidated[st.session_state.finalup_yakus_id_col].isin(final_yakus_na_ids)
-                ].copy()
-                # Renombrar columnas si es necesario (ej. 'ID' a 'yaku_id')
-                # yakus_na_final_df.rename(columns={'ID': 'yaku_id'}, inplace=True)
-
-
                 # 4. Generar Excel Final
-                st.session_state.finalup_processed_output = generate_excel_output(
-                    pd.DataFrame(new_assignments_list),
+                st.session_state.finalup_processed_output = generate_excel_output_file(
+                    new_assignments_df,
                     yakus_na_final_df,
-                    rurus_na_final_df
+                    rurus_na_final_df,
+                    file_name="resultados_match_final.xlsx"
                 )
 
                 if st.session_state.finalup_processed_output:
-                    st.success(f"Procesamiento completado. Se generaron {len(new_assignments_list)} asignaciones finales.")
+                    st.success(f"Procesamiento completado. Se generaron {len(new_assignments_df)} asignaciones finales.")
                     st.info(f"{len(yakus_na_final_df)} Yakus y {len(rurus_na_final_df)} Rurus quedaron como No Asignados.")
                 else:
                     st.error("Error al generar el archivo Excel de salida.")
@@ -380,12 +377,13 @@ def final_update_tab():
     # Botón de descarga
     if st.session_state.get('finalup_processed_output'):
         st.markdown("---")
-        st.download_button(
-            label="Descargar Resultados Finales Actualizados",
-            data=st.session_state.finalup_processed_output.getvalue(),
+        lazy_file_download_button(
+            st.session_state.finalup_processed_output,
             file_name="Resultados_Match_ArteCultura_FinalUpdate.xlsx",
+            label="Descargar Resultados Finales Actualizados",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            key="download_final_update"
+            key="final_update",
+            expired_message="El archivo de resultados expiró del almacenamiento temporal. Vuelve a procesarlo."
         )
 
     # Limpiar estado si cambian los archivos cargados (opcional, pero bueno para evitar confusiones)
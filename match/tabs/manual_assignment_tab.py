@@ -7,32 +7,28 @@ y un Ruru de las listas de no asignados, y moverlos a la lista de asignados.
 import streamlit as st
 import pandas as pd
 from io import BytesIO
+from typing import Dict
 
-# Reutilizar función de generación de Excel y limpieza de números
-# Asumimos que están en match.utils o las copiamos/importamos
-# from ..utils.output_generator import generate_excel_output, clean_str_number
-# Temporalmente, copiamos clean_str_number aquí por simplicidad
-def clean_str_number(val):
-    """Limpia números leídos de Excel, convirtiéndolos a string limpio."""
-    if pd.isna(val) or val == '': return ''
-    try: cleaned_val = str(int(float(str(val))))
-    except (ValueError, TypeError): cleaned_val = str(val).strip()
-    if cleaned_val.endswith('.0'): cleaned_val = cleaned_val[:-2]
-    return cleaned_val
-
-# Importar generate_excel_output (asegúrate que la ruta relativa sea correcta)
+# Limpieza de números compartida por todos los módulos
+from shared.normalization import clean_str_number
+from shared.digest import config_digest, dataframe_digest
+from ..core.candidate_index import CandidateIndex
+from preprocessing.ui.download import lazy_file_download_button
+
+# Importar generate_excel_output_file (asegúrate que la ruta relativa sea correcta)
 try:
-     from ..utils.output_generator import generate_excel_output
+     from ..utils.output_generator import generate_excel_output_file
 except ImportError:
-     st.error("Error al importar 'generate_excel_output'. Asegúrate que la estructura de archivos es correcta.")
+     st.error("Error al importar 'generate_excel_output_file'. Asegúrate que la estructura de archivos es correcta.")
      # Fallback por si la importación falla
-     def generate_excel_output(df1, df2, df3): return None
+     def generate_excel_output_file(df1, df2, df3, file_name=None): return None
 
 
 # Columnas esperadas/necesarias
 ASSIGNED_COLS_EXPECTED = ['ID Ruru', 'ID Yaku', 'Nombre Ruru', 'Nombre Yaku', 'Area', 'Asignatura/Taller Asignado', 'Grado Original Ruru', 'Score Match'] # Mínimo
 YAKU_NA_ID_COL = 'yaku_id' # ID Yaku en hoja Yakus No Asignados
 RURU_NA_ID_COL = 'ID del estudiante:' # ID Ruru en hoja Rurus No Asignados
+MANUAL_SUGGESTIONS_TOP_K = 10 # Candidatos sugeridos por persona
 
 
 def load_results_for_manual(uploaded_file):
@@ -75,6 +71,48 @@ def load_rurus_source(uploaded_file):
         return None
 
 
+def build_yaku_labels(df_yakus_na: pd.DataFrame) -> Dict[str, str]:
+    """Etiqueta 'nombre (ID)' de cada Yaku no asignado, por ID."""
+    ids = df_yakus_na[YAKU_NA_ID_COL].astype(str)
+    names = df_yakus_na['nombre'].astype(str) if 'nombre' in df_yakus_na.columns else 'N/A'
+    return dict(zip(ids, names + " (" + ids + ")"))
+
+def build_ruru_labels(df_rurus_na: pd.DataFrame) -> Dict[str, str]:
+    """Etiqueta 'nombre apellido (ID)' de cada Ruru no asignado, por ID."""
+    ids = df_rurus_na[RURU_NA_ID_COL].astype(str)
+    first = df_rurus_na['nombre'].astype(str) if 'nombre' in df_rurus_na.columns else ''
+    last = df_rurus_na['apellido'].astype(str) if 'apellido' in df_rurus_na.columns else ''
+    return dict(zip(ids, (first + " " + last + " (" + ids + ")").str.strip()))
+
+def get_candidate_index(df_yakus_na: pd.DataFrame, df_rurus_na: pd.DataFrame, rurus_source_df: pd.DataFrame, area: str) -> CandidateIndex:
+    """
+    Índice de candidatos de los no asignados, reconstruido solo cuando cambian.
+
+    Los datos de puntuación de cada Ruru se toman de Rurus Transformados
+    (más completos); si un Ruru no está ahí, se usa su fila de No Asignados.
+    """
+    in_source = rurus_source_df[RURU_NA_ID_COL].isin(df_rurus_na[RURU_NA_ID_COL])
+    scoring_rurus = pd.concat([
+        rurus_source_df[in_source],
+        df_rurus_na[~df_rurus_na[RURU_NA_ID_COL].isin(rurus_source_df[RURU_NA_ID_COL])]
+    ], ignore_index=True)
+    key = config_digest([area, dataframe_digest(df_yakus_na), dataframe_digest(scoring_rurus)])
+
+    cached = st.session_state.get('manual_candidate_index')
+    if cached is None or cached[0] != key:
+        cached = (key, CandidateIndex(df_yakus_na, scoring_rurus, area, MANUAL_SUGGESTIONS_TOP_K))
+        st.session_state.manual_candidate_index = cached
+    return cached[1]
+
+def show_suggestions(suggestions: pd.DataFrame, labels: Dict[str, str]) -> None:
+    """Muestra la tabla de sugerencias con el nombre de cada candidato."""
+    if suggestions.empty:
+        st.caption("No hay candidatos compatibles (sin horarios en común) entre los no asignados.")
+        return
+    suggestions.insert(1, 'Nombre', [labels.get(str(candidate_id), '') for candidate_id in suggestions['ID']])
+    st.dataframe(suggestions, hide_index=True)
+
+
 # --- Pestaña Streamlit ---
 def manual_assignment_tab():
     st.header("Asignación Manual Yaku-Ruru")
@@ -140,36 +178,38 @@ def manual_assignment_tab():
         selected_yaku_id = None
         selected_ruru_id = None
 
-        # Crear copias para evitar SettingWithCopyWarning al añadir 'display_label'
-        df_yakus_na_display = df_yakus_na.copy()
-        df_rurus_na_display = df_rurus_na.copy()
+        # Etiquetas legibles por ID: el selector guarda el ID y la etiqueta se busca en un dict
+        yaku_labels = build_yaku_labels(df_yakus_na) if yakus_na_valid else {}
+        ruru_labels = build_ruru_labels(df_rurus_na) if rurus_na_valid else {}
 
         if yakus_na_valid:
-             # Crear etiquetas legibles para el selector de Yakus en la copia
-             df_yakus_na_display['display_label'] = df_yakus_na_display.apply(
-                 lambda row: f"{row.get('nombre', 'N/A')} ({row[YAKU_NA_ID_COL]})", axis=1
+             selected_yaku_id = st.selectbox(
+                 "Yaku No Asignado:", [None] + list(yaku_labels),
+                 format_func=lambda yaku_id: "Seleccionar..." if yaku_id is None else yaku_labels[yaku_id],
+                 key="manual_yaku_select"
              )
-             yaku_options = df_yakus_na_display['display_label'].tolist()
-             selected_yaku_label = st.selectbox("Yaku No Asignado:", ["Seleccionar..."] + yaku_options, key="manual_yaku_select")
-             if selected_yaku_label != "Seleccionar...":
-                 # Extraer ID del label usando la copia
-                 selected_yaku_id = df_yakus_na_display[df_yakus_na_display['display_label'] == selected_yaku_label][YAKU_NA_ID_COL].iloc[0]
         else:
              st.warning("No hay Yakus en la lista de 'No Asignados' o falta la columna ID.")
 
         if rurus_na_valid:
-             # Crear etiquetas legibles para el selector de Rurus en la copia
-             df_rurus_na_display['display_label'] = df_rurus_na_display.apply(
-                 lambda row: f"{row.get('nombre', '')} {row.get('apellido', '')} ({row[RURU_NA_ID_COL]})".strip(), axis=1
+             selected_ruru_id = st.selectbox(
+                 "Ruru No Asignado:", [None] + list(ruru_labels),
+                 format_func=lambda ruru_id: "Seleccionar..." if ruru_id is None else ruru_labels[ruru_id],
+                 key="manual_ruru_select"
              )
-             ruru_options = df_rurus_na_display['display_label'].tolist()
-             selected_ruru_label = st.selectbox("Ruru No Asignado:", ["Seleccionar..."] + ruru_options, key="manual_ruru_select")
-             if selected_ruru_label != "Seleccionar...":
-                  # Extraer ID del label usando la copia
-                  selected_ruru_id = df_rurus_na_display[df_rurus_na_display['display_label'] == selected_ruru_label][RURU_NA_ID_COL].iloc[0]
         else:
              st.warning("No hay Rurus en la lista de 'No Asignados' o falta la columna ID.")
 
+        # Sugerencias compatibles para la persona seleccionada
+        if yakus_na_valid and rurus_na_valid and (selected_yaku_id or selected_ruru_id):
+            candidate_index = get_candidate_index(df_yakus_na, df_rurus_na, rurus_source_df, selected_area)
+            if selected_yaku_id:
+                st.markdown(f"**Rurus más compatibles con {yaku_labels[selected_yaku_id]}:**")
+                show_suggestions(candidate_index.rurus_for_yaku(selected_yaku_id), ruru_labels)
+            if selected_ruru_id:
+                st.markdown(f"**Yakus más compatibles con {ruru_labels[selected_ruru_id]}:**")
+                show_suggestions(candidate_index.yakus_for_ruru(selected_ruru_id), yaku_labels)
+
 
         # Botón para realizar la asignación
         if selected_yaku_id and selected_ruru_id:
@@ -260,15 +300,16 @@ def manual_assignment_tab():
                     st.session_state.manual_results_data["Rurus No Asignados"] = updated_rurus_na
 
                     # 4. Generar nuevo Excel DESDE EL ESTADO ACTUALIZADO
-                    excel_buffer = generate_excel_output(
+                    excel_path = generate_excel_output_file(
                         updated_asignaciones,
                         updated_yakus_na,
-                        updated_rurus_na
+                        updated_rurus_na,
+                        file_name="resultados_match_manual.xlsx"
                     )
 
-                    if excel_buffer:
-                        # Guardar el buffer del excel generado en el estado para la descarga
-                        st.session_state.manual_updated_excel = excel_buffer
+                    if excel_path:
+                        # Guardar la ruta del excel generado en el estado para la descarga
+                        st.session_state.manual_updated_excel = excel_path
                         st.success(f"¡Asignación manual completada! Yaku {selected_yaku_id} asignado a Ruru {selected_ruru_id}.")
                         # Forzar recarga de la UI para refrescar los selectores
                         st.rerun()
@@ -277,15 +318,16 @@ def manual_assignment_tab():
 
 
         # Botón de descarga (si se generó el archivo)
-        # Leer el buffer guardado en el estado de sesión
+        # Leer el archivo cuya ruta está guardada en el estado de sesión
         if st.session_state.get('manual_updated_excel'):
             st.markdown("---")
-            st.download_button(
-                label=f"Descargar Resultados Actualizados ({selected_area})",
-                data=st.session_state.manual_updated_excel.getvalue(),
+            lazy_file_download_button(
+                st.session_state.manual_updated_excel,
                 file_name=f"Resultados_Match_{selected_area.replace(' ', '_')}_ManualUpdate.xlsx",
+                label=f"Descargar Resultados Actualizados ({selected_area})",
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                key="download_manual_update"
+                key="manual_update",
+                expired_message="El archivo actualizado expiró del almacenamiento temporal. Vuelve a realizar la asignación."
             )
     else:
         st.info("Carga ambos archivos (Resultados del área y Rurus Transformados) para habilitar la asignación manual.") 
\ No newline at end of file
@@ -3,11 +3,14 @@ Funciones para mostrar los resultados del match en la interfaz de Streamlit.
 """
 import streamlit as st
 import pandas as pd
+from typing import Optional
 
 def display_match_results(
     assigned_df: pd.DataFrame,
     unassigned_yakus_df: pd.DataFrame,
-    unassigned_rurus_df: pd.DataFrame
+    unassigned_rurus_df: pd.DataFrame,
+    diagnostics_df: Optional[pd.DataFrame] = None,
+    near_miss_df: Optional[pd.DataFrame] = None
 ):
     """
     Muestra tablas y resúmenes de los resultados del match de forma organizada.
@@ -16,6 +19,8 @@ def display_match_results(
         assigned_df: DataFrame formateado de asignaciones.
         unassigned_yakus_df: DataFrame formateado de Yakus no asignados.
         unassigned_rurus_df: DataFrame formateado de Rurus no asignados.
+        diagnostics_df: Diagnóstico de por qué quedó sin asignar cada Ruru (opcional).
+        near_miss_df: Yakus libres de horario cercano para cada Ruru no asignado (opcional).
     """
 
     # 1. Mostrar Métricas Resumen
@@ -58,4 +63,19 @@ def display_match_results(
         if unassigned_rurus_df is not None and not unassigned_rurus_df.empty:
             st.dataframe(unassigned_rurus_df)
         else:
-            st.write("No hay Rurus no asignados para mostrar.") 
\ No newline at end of file
+            st.write("No hay Rurus no asignados para mostrar.") 
+
+    # 4. Diagnóstico de Rurus No Asignados (motivo por Ruru)
+    if diagnostics_df is not None and not diagnostics_df.empty:
+        with st.expander(f"¿Por qué quedaron Rurus sin asignar? ({len(diagnostics_df)})"):
+            reason_counts = diagnostics_df['Motivo'].value_counts()
+            for reason, count in reason_counts.items():
+                st.write(f"- {reason}: {count}")
+            st.dataframe(diagnostics_df)
+
+    # 5. Yakus libres con horario cercano (a quiénes pedir que amplíen su disponibilidad)
+    if near_miss_df is not None and not near_miss_df.empty:
+        with st.expander(f"Yakus libres con horario cercano ({near_miss_df['ID Ruru'].nunique()} Rurus)"):
+            st.caption("Para cada Ruru no asignado: Yakus libres compatibles en quechua y asignatura/taller, "
+                       "ordenados por cuántos bloques horarios difieren. Basta con que el Yaku agregue uno de los bloques indicados.")
+            st.dataframe(near_miss_df)
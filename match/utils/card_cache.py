@@ -0,0 +1,94 @@
+"""
+Caché de tarjetas generadas, direccionada por contenido.
+
+Cada tarjeta (DOCX o PDF) se guarda en una caché compartida por todas las
+sesiones con una clave derivada de la huella de la plantilla y del contexto
+de su fila. Al regenerar tras actualizar el match (o tras recargar el
+navegador), solo se renderizan y convierten las filas cuyo contexto cambió;
+el resto se reutiliza de la caché.
+
+La caché tiene su propio límite de tamaño (CARD_CACHE_MAX_BYTES), separado
+del almacén de sesiones, y la evicción se aplica una vez por lote con
+enforce_card_cache_limits en lugar de después de cada tarjeta.
+"""
+
+import os
+import shutil
+from typing import Any, Dict, Iterable, Optional
+
+from shared.digest import config_digest
+from preprocessing.utils.temp_storage import get_shared_dir, write_atomic, touch, enforce_shared_limits
+
+# Caché compartida de tarjetas (ajustable por variable de entorno)
+CARD_CACHE_NAMESPACE = "cards"
+CARD_CACHE_MAX_BYTES = int(os.getenv("CARD_CACHE_MAX_MB", 256)) * 1024 * 1024
+
+
+def card_cache_key(template_digest: str, context: Dict[str, Any]) -> str:
+    """
+    Calcula la clave de caché de una tarjeta.
+
+    Args:
+        template_digest: Huella de los bytes de la plantilla (shared.digest.bytes_digest)
+        context: Contexto de la tarjeta
+
+    Returns:
+        Clave hexadecimal
+    """
+    return config_digest({'template': template_digest, 'context': context})
+
+
+def _card_path(key: str, extension: str) -> str:
+    """Ruta de una tarjeta dentro de la caché compartida."""
+    return os.path.join(get_shared_dir(CARD_CACHE_NAMESPACE), f"{key[:40]}{extension}")
+
+
+def get_cached_card(key: str, extension: str) -> Optional[str]:
+    """
+    Busca una tarjeta ya generada.
+
+    Args:
+        key: Clave de la tarjeta (card_cache_key)
+        extension: '.docx' o '.pdf'
+
+    Returns:
+        Ruta del archivo en caché, o None si no existe
+    """
+    file_path = _card_path(key, extension)
+    if not os.path.exists(file_path):
+        return None
+    touch(file_path)
+    return file_path
+
+
+def store_card(key: str, extension: str, source_path: str) -> str:
+    """
+    Guarda una copia de una tarjeta generada en la caché.
+
+    No aplica la evicción: al terminar el lote hay que llamar a
+    enforce_card_cache_limits.
+
+    Args:
+        key: Clave de la tarjeta (card_cache_key)
+        extension: '.docx' o '.pdf'
+        source_path: Archivo generado a guardar
+
+    Returns:
+        Ruta del archivo en caché
+    """
+    file_path = _card_path(key, extension)
+    write_atomic(file_path, lambda partial_path: shutil.copyfile(source_path, partial_path), enforce=False)
+    return file_path
+
+
+def enforce_card_cache_limits(keep: Iterable[str] = ()) -> int:
+    """
+    Acota el tamaño de la caché de tarjetas (una vez por lote).
+
+    Args:
+        keep: Rutas de tarjetas usadas en el lote actual (no se eliminan)
+
+    Returns:
+        Número de tarjetas eliminadas
+    """
+    return enforce_shared_limits(CARD_CACHE_NAMESPACE, CARD_CACHE_MAX_BYTES, keep)
@@ -0,0 +1,204 @@
+"""
+Conversión de tarjetas DOCX a PDF con LibreOffice (soffice).
+
+Arrancar LibreOffice es lo más costoso de la conversión, así que los
+documentos se convierten por lotes: una sola invocación de `soffice` recibe
+muchos archivos de entrada. Los lotes se reparten entre varios procesos de
+LibreOffice en paralelo; cada proceso usa su propio perfil de usuario
+(`-env:UserInstallation`), ya que dos instancias con el mismo perfil se
+bloquean entre sí. Al terminar se comprueba qué PDFs se generaron y los
+documentos que faltan se reintentan uno por uno, para poder reportar los
+fallos archivo por archivo.
+"""
+
+import math
+import os
+import signal
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Archivos por invocación de soffice (limita la línea de comandos y el impacto de un fallo)
+SOFFICE_BATCH_SIZE = 50
+
+# Timeout de una invocación: base de arranque + tiempo por documento (segundos)
+SOFFICE_BASE_TIMEOUT = 60
+SOFFICE_TIMEOUT_PER_FILE = 10
+
+# Procesos de LibreOffice simultáneos (ajustable por variable de entorno)
+SOFFICE_WORKERS = int(os.getenv("SOFFICE_WORKERS", min(os.cpu_count() or 1, 8)))
+
+# Reintentos individuales para los documentos que fallan dentro de un lote
+SOFFICE_MAX_RETRIES = 1
+
+# Perfiles de usuario de LibreOffice (fuera del almacén temporal: no deben evictarse)
+SOFFICE_PROFILE_ROOT = os.path.join(tempfile.gettempdir(), "match_yaku_ruru_soffice")
+
+_profile_lock = threading.Lock()
+_free_profiles: List[str] = []
+_profile_count = 0
+
+
+def _acquire_profile() -> str:
+    """
+    Reserva un perfil de LibreOffice que ningún otro proceso esté usando.
+
+    Los perfiles se reutilizan entre conversiones (crear uno nuevo cuesta un
+    arranque más lento) y llevan el PID para no compartirse entre procesos.
+    """
+    global _profile_count
+    with _profile_lock:
+        if _free_profiles:
+            return _free_profiles.pop()
+        _profile_count += 1
+        profile_dir = os.path.join(SOFFICE_PROFILE_ROOT, f"{os.getpid()}_{_profile_count}")
+    os.makedirs(profile_dir, exist_ok=True)
+    return profile_dir
+
+
+def _release_profile(profile_dir: str) -> None:
+    """Devuelve un perfil al conjunto de perfiles libres."""
+    with _profile_lock:
+        _free_profiles.append(profile_dir)
+
+
+def _expected_pdf_path(docx_path: str, output_dir: str) -> str:
+    """Ruta del PDF que LibreOffice genera para un DOCX en output_dir."""
+    stem = os.path.splitext(os.path.basename(docx_path))[0]
+    return os.path.join(output_dir, f"{stem}.pdf")
+
+
+def _run_soffice(
+    soffice_path: str,
+    docx_paths: List[str],
+    output_dir: str,
+    timeout: float,
+    profile_dir: Optional[str] = None
+) -> str:
+    """
+    Ejecuta una invocación de soffice sobre varios archivos.
+
+    Returns:
+        Mensaje de error de la invocación ('' si terminó correctamente)
+    """
+    cmd = [soffice_path]
+    if profile_dir:
+        cmd.append(f"-env:UserInstallation={Path(profile_dir).as_uri()}") # Perfil propio
+    cmd += [
+        '--headless',          # No mostrar UI
+        '--convert-to', 'pdf', # Formato de salida
+        '--outdir', output_dir # Directorio de salida
+    ] + list(docx_paths)       # Archivos de entrada
+    # Sesión propia: el lanzador `soffice` arranca `soffice.bin` como hijo, y
+    # ante un timeout hay que terminar a los dos para liberar el perfil
+    process = subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+        start_new_session=hasattr(os, "killpg")
+    )
+    try:
+        _, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _kill_process_group(process)
+        process.communicate()
+        return f"LibreOffice tardó más de {int(timeout)}s"
+    if process.returncode != 0:
+        return f"LibreOffice falló (código {process.returncode}). Error: {stderr}"
+    return ""
+
+
+def _kill_process_group(process: subprocess.Popen) -> None:
+    """Termina un proceso y todos sus hijos (su grupo de procesos, donde exista)."""
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+            return
+        except ProcessLookupError:
+            return
+    process.kill()
+
+
+def _collect(docx_paths: List[str], output_dir: str, error: str, converted: Dict[str, str], failed: Dict[str, str]) -> None:
+    """Clasifica cada documento según exista o no su PDF."""
+    for docx_path in docx_paths:
+        pdf_path = _expected_pdf_path(docx_path, output_dir)
+        if os.path.exists(pdf_path):
+            converted[docx_path] = pdf_path
+            failed.pop(docx_path, None)
+        else:
+            failed[docx_path] = error or "LibreOffice no generó el archivo PDF"
+
+
+def _convert_chunk(
+    soffice_path: str,
+    chunk: List[str],
+    output_dir: str,
+    max_retries: int
+) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Convierte un lote con un perfil propio y reintenta uno a uno los fallidos."""
+    converted: Dict[str, str] = {}
+    failed: Dict[str, str] = {}
+    profile_dir = _acquire_profile()
+    try:
+        timeout = SOFFICE_BASE_TIMEOUT + SOFFICE_TIMEOUT_PER_FILE * len(chunk)
+        error = _run_soffice(soffice_path, chunk, output_dir, timeout, profile_dir)
+        _collect(chunk, output_dir, error, converted, failed)
+
+        for _ in range(max_retries):
+            pending = list(failed)
+            for docx_path in pending:
+                error = _run_soffice(
+                    soffice_path, [docx_path], output_dir,
+                    SOFFICE_BASE_TIMEOUT + SOFFICE_TIMEOUT_PER_FILE, profile_dir
+                )
+                _collect([docx_path], output_dir, error, converted, failed)
+    finally:
+        _release_profile(profile_dir)
+    return converted, failed
+
+
+def convert_docx_batch(
+    soffice_path: str,
+    docx_paths: List[str],
+    output_dir: str,
+    batch_size: int = SOFFICE_BATCH_SIZE,
+    workers: Optional[int] = None,
+    max_retries: int = SOFFICE_MAX_RETRIES
+) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    Convierte muchos DOCX a PDF con varios procesos de LibreOffice en paralelo.
+
+    Los documentos se dividen en lotes (a lo sumo batch_size, y al menos uno
+    por proceso) que se reparten entre `workers` procesos, cada uno con su
+    propio perfil de usuario.
+
+    Args:
+        soffice_path: Ruta al ejecutable de LibreOffice
+        docx_paths: Rutas de los DOCX a convertir (nombres de archivo únicos)
+        output_dir: Directorio donde se escriben los PDF
+        batch_size: Número máximo de archivos por invocación
+        workers: Procesos de LibreOffice simultáneos (por defecto SOFFICE_WORKERS)
+        max_retries: Reintentos individuales de cada documento fallido
+
+    Returns:
+        Tupla con (convertidos {ruta_docx: ruta_pdf}, fallidos {ruta_docx: mensaje_error})
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    converted: Dict[str, str] = {}
+    failed: Dict[str, str] = {}
+    if not docx_paths:
+        return converted, failed
+
+    workers = max(1, workers or SOFFICE_WORKERS)
+    chunk_size = max(1, min(batch_size, math.ceil(len(docx_paths) / workers)))
+    chunks = [docx_paths[start:start + chunk_size] for start in range(0, len(docx_paths), chunk_size)]
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+        results = executor.map(lambda chunk: _convert_chunk(soffice_path, chunk, output_dir, max_retries), chunks)
+        for chunk_converted, chunk_failed in results:
+            converted.update(chunk_converted)
+            failed.update(chunk_failed)
+
+    return converted, failed
@@ -0,0 +1,208 @@
+"""
+Motor de renderizado de tarjetas DOCX.
+
+`DocxTemplate` vuelve a abrir el .docx, limpiar su XML y compilar la
+plantilla Jinja en cada renderizado. `CompiledDocxTemplate` hace ese trabajo
+una sola vez a partir de los bytes de la plantilla y luego, por cada
+contexto, solo renderiza las partes con etiquetas y las reemplaza dentro del
+ZIP, copiando el resto de entradas tal cual. El resultado es el mismo que
+produce docxtpl.
+
+`render_cards` reparte los contextos entre varios procesos, cada uno con su
+propia plantilla compilada, y va devolviendo cada tarjeta en cuanto está
+lista para que pueda escribirse en el ZIP de salida sin esperar al resto.
+"""
+
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from docxtpl import DocxTemplate
+from jinja2 import Template
+from lxml import etree
+
+# Procesos de renderizado simultáneos (ajustable por variable de entorno)
+CARD_RENDER_WORKERS = int(os.getenv("CARD_RENDER_WORKERS", min(os.cpu_count() or 1, 8)))
+
+# Tarjetas mínimas por proceso para que arrancarlo compense. Medido con una
+# plantilla de una página: cada proceso 'spawn' tarda ~0,35 s en arrancar
+# (intérprete, docxtpl/lxml y compilar la plantilla) y una tarjeta se
+# renderiza en ~10 ms, así que un proceso recupera su arranque a partir de
+# unas 35-40 tarjetas; se deja margen porque el arranque crece con la carga
+# del servidor. Se usan solo los procesos que reciben al menos este número
+# de tarjetas y, si sale uno solo, se renderiza en el propio proceso.
+CARD_RENDER_MIN_CARDS_PER_WORKER = 100
+
+_FOOTNOTES_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.footnotes+xml"
+_CORE_PROPERTIES = ["author", "comments", "identifier", "language", "subject", "title"]
+_BODY_PATTERN = re.compile(r"<w:body\b.*</w:body>", re.DOTALL)
+_JINJA_MARKERS = ("{{", "{%", "{#")
+
+
+def _has_tags(text: Optional[str]) -> bool:
+    """Indica si un texto contiene etiquetas Jinja."""
+    return bool(text) and any(marker in text for marker in _JINJA_MARKERS)
+
+
+class CompiledDocxTemplate:
+    """
+    Plantilla DOCX preparada una sola vez para renderizar muchos contextos.
+
+    Si la plantilla usa algo que este motor no reproduce (etiquetas en las
+    propiedades del documento o un cuerpo con formato inesperado), cada
+    renderizado recurre a DocxTemplate.
+    """
+
+    def __init__(self, template_bytes: bytes):
+        self.template_bytes = template_bytes
+        self._helper = DocxTemplate(BytesIO(template_bytes))
+        self._helper.init_docx()
+
+        with zipfile.ZipFile(BytesIO(template_bytes)) as zin:
+            self._entries = [(info, zin.read(info.filename)) for info in zin.infolist()]
+        entries = {info.filename: data for info, data in self._entries}
+
+        core = self._helper.docx.core_properties
+        document_xml = entries.get("word/document.xml", b"").decode("utf-8")
+        body_match = _BODY_PATTERN.search(document_xml)
+        self.full_render = body_match is None or any(_has_tags(getattr(core, prop)) for prop in _CORE_PROPERTIES)
+        if self.full_render:
+            return
+
+        # Cuerpo: prefijo y sufijo fijos alrededor de <w:body>
+        self._document_prefix = document_xml[:body_match.start()]
+        self._document_suffix = document_xml[body_match.end():]
+        self._body_template = self._compile(self._helper.patch_xml(self._helper.get_xml()))
+
+        # Encabezados, pies de página y notas al pie: {nombre_en_zip: (plantilla, codificación)}
+        self._part_templates: Dict[str, Tuple[Template, str]] = {}
+        for uri in (self._helper.HEADER_URI, self._helper.FOOTER_URI):
+            for _, part in self._helper.get_headers_footers(uri):
+                xml = self._helper.get_part_xml(part)
+                encoding = self._helper.get_headers_footers_encoding(xml)
+                self._part_templates[part.partname.lstrip("/")] = (self._compile(self._helper.patch_xml(xml)), encoding)
+        for part in self._helper.docx.part.package.parts:
+            if part.content_type == _FOOTNOTES_CONTENT_TYPE:
+                blob = part.blob.decode("utf-8") if isinstance(part.blob, bytes) else part.blob
+                self._part_templates[part.partname.lstrip("/")] = (self._compile(self._helper.patch_xml(blob)), "utf-8")
+
+    @staticmethod
+    def _compile(src_xml: str) -> Template:
+        """Compila una parte XML igual que DocxTemplate.render_xml_part."""
+        return Template(re.sub(r"<w:p([ >])", r"\n<w:p\1", src_xml))
+
+    def _render_part(self, template: Template, context: Dict[str, Any]) -> str:
+        """Renderiza una parte compilada y aplica los mismos ajustes que docxtpl."""
+        dst_xml = template.render(context)
+        dst_xml = re.sub(r"\n<w:p([ >])", r"<w:p\1", dst_xml)
+        dst_xml = (
+            dst_xml.replace("{_{", "{{")
+            .replace("}_}", "}}")
+            .replace("{_%", "{%")
+            .replace("%_}", "%}")
+        )
+        return self._helper.resolve_listing(dst_xml)
+
+    def render(self, context: Dict[str, Any]) -> bytes:
+        """
+        Renderiza la plantilla con un contexto.
+
+        Args:
+            context: Valores de las etiquetas de la plantilla
+
+        Returns:
+            Bytes del documento DOCX resultante
+        """
+        if self.full_render:
+            doc = DocxTemplate(BytesIO(self.template_bytes))
+            doc.render(context)
+            output = BytesIO()
+            doc.save(output)
+            return output.getvalue()
+
+        # Cuerpo: mismas correcciones de tablas e IDs de imágenes que docxtpl
+        self._helper.docx_ids_index = 1000
+        tree = self._helper.fix_tables(self._render_part(self._body_template, context))
+        self._helper.fix_docpr_ids(tree)
+        body_xml = etree.tostring(tree, encoding="unicode")
+
+        replacements = {
+            "word/document.xml": (self._document_prefix + body_xml + self._document_suffix).encode("utf-8")
+        }
+        for name, (template, encoding) in self._part_templates.items():
+            replacements[name] = self._render_part(template, context).encode(encoding)
+
+        output = BytesIO()
+        with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as zout:
+            for info, data in self._entries:
+                zout.writestr(info, replacements.get(info.filename, data))
+        return output.getvalue()
+
+
+# --- Renderizado en paralelo ---
+
+_worker_template: Optional[CompiledDocxTemplate] = None
+
+
+def _init_worker(template_bytes: bytes) -> None:
+    """Compila la plantilla una vez por proceso."""
+    global _worker_template
+    _worker_template = CompiledDocxTemplate(template_bytes)
+
+
+def _render_to_file(job: Tuple[str, Dict[str, Any], str]) -> Tuple[str, Optional[str], Optional[str]]:
+    """Renderiza un contexto en un archivo. Devuelve (clave, ruta, error)."""
+    key, context, output_path = job
+    try:
+        with open(output_path, "wb") as f:
+            f.write(_worker_template.render(context))
+        return key, output_path, None
+    except Exception as e:
+        return key, None, str(e)
+
+
+def render_cards(
+    template_bytes: bytes,
+    jobs: List[Tuple[str, Dict[str, Any]]],
+    output_dir: str,
+    workers: Optional[int] = None
+) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Renderiza muchas tarjetas DOCX, en paralelo cuando hay suficientes.
+
+    Se usan a lo sumo len(jobs) // CARD_RENDER_MIN_CARDS_PER_WORKER procesos;
+    con menos tarjetas se renderiza en serie en el propio proceso.
+
+    Args:
+        template_bytes: Bytes de la plantilla .docx
+        jobs: Lista de (clave, contexto); la clave se usa como nombre de archivo
+        output_dir: Directorio donde se escriben los DOCX
+        workers: Procesos simultáneos como máximo (por defecto CARD_RENDER_WORKERS)
+
+    Yields:
+        Tuplas (clave, ruta_docx, error) en orden, a medida que terminan;
+        ruta_docx es None y error contiene el mensaje si la tarjeta falló
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    file_jobs = [(key, context, os.path.join(output_dir, f"{key}.docx")) for key, context in jobs]
+    workers = min(max(1, workers or CARD_RENDER_WORKERS), len(file_jobs) // CARD_RENDER_MIN_CARDS_PER_WORKER)
+
+    if workers <= 1:
+        _init_worker(template_bytes)
+        for job in file_jobs:
+            yield _render_to_file(job)
+        return
+
+    # 'spawn' evita heredar los hilos del servidor de Streamlit al crear procesos
+    chunksize = max(1, len(file_jobs) // (workers * 4))
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(template_bytes,)
+    ) as executor:
+        yield from executor.map(_render_to_file, file_jobs, chunksize=chunksize)
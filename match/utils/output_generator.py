@@ -1,10 +1,17 @@
 """
 Funciones para generar los archivos Excel de salida con los resultados del match.
 """
+import numpy as np
 import pandas as pd
+from pandas.api.extensions import take
+from collections import OrderedDict
 from io import BytesIO
 from typing import Set, Optional, List
 
+from shared.excel_writer import write_sheets_streaming
+from shared.normalization import clean_number_series
+from preprocessing.utils.temp_storage import get_temp_path, write_atomic
+
 # Definir columnas deseadas y orden para el reporte final de asignaciones
 ASSIGNED_OUTPUT_COLUMNS_ORDER = [
     'ID Ruru', 'ID Yaku', 'Nombre Ruru', 'Nombre Yaku', 'Area',
@@ -25,39 +32,81 @@ ASSIGNED_OUTPUT_COLUMNS_ORDER = [
 
 # Columnas para reportes de no asignados
 UNASSIGNED_YAKU_COLS = ['yaku_id', 'nombre', 'dni', 'correo', 'celular', 'area', 'grado', 'quechua', 'asignatura', 'taller', 'horario_lunes', 'horario_martes', 'horario_miercoles', 'horario_jueves', 'horario_viernes', 'horario_sabado', 'horario_domingo']
+# Columnas que se consultan de Yakus y Rurus para el reporte de asignaciones
+RURU_ID_COL = 'ID del estudiante:'
+YAKU_LOOKUP_COLS = [
+    'nombre', 'dni', 'correo', 'celular', 'area', 'quechua', 'asignatura', 'taller',
+    'horario_lunes', 'horario_martes', 'horario_miercoles', 'horario_jueves',
+    'horario_viernes', 'horario_sabado', 'horario_domingo'
+]
+RURU_LOOKUP_COLS = [
+    'nombre', 'apellido', 'DNI', 'grado_original', 'quechua',
+    'nombre_apoderado', 'apellido_apoderado', 'celular', 'celular_asesoria',
+    'horario_lunes', 'horario_martes', 'horario_miercoles', 'horario_jueves',
+    'horario_viernes', 'horario_sabado', 'horario_domingo'
+]
+
+# Hoja opcional con el diagnóstico de Rurus no asignados (ver core.diagnostics)
+DIAGNOSTICS_SHEET = 'Diagnóstico No Asignados'
+# Hoja opcional con Yakus de horario cercano para los Rurus no asignados (ver core.near_miss)
+NEAR_MISS_SHEET = 'Yakus Cercanos'
+
 UNASSIGNED_RURU_COLS = ['ID del estudiante:', 'nombre', 'apellido', 'DNI', 'area', 'grado_original', 'quechua', 'asignatura_opcion1', 'asignatura_opcion2', 'taller_opcion1', 'taller_opcion2', 'taller_opcion3', 'horario_lunes', 'horario_martes', 'horario_miercoles', 'horario_jueves', 'horario_viernes', 'horario_sabado', 'horario_domingo']
 
-# --- MOVER clean_str_number AQUÍ ---
-def clean_str_number(val):
-    """Limpia números leídos de Excel/pandas, convirtiéndolos a string limpio."""
-    if pd.isna(val) or val == '':
-        return ''
-    try:
-        # Intentar convertir a entero primero para eliminar decimales/notación científica
-        # Luego a string
-        cleaned_val = str(int(float(str(val))))
-    except (ValueError, TypeError):
-        # Si falla (ej. ya es un string con caracteres no numéricos), usar el string original
-        cleaned_val = str(val).strip()
-    # Eliminar '.0' residual por si acaso (aunque int() debería quitarlo)
-    if cleaned_val.endswith('.0'):
-        cleaned_val = cleaned_val[:-2]
-    return cleaned_val
-# --- FIN MOVER clean_str_number ---
+
+
+def build_lookup_table(df: pd.DataFrame, id_column: str, columns: List[str]) -> pd.DataFrame:
+    """
+    Construye una tabla de consulta indexada por ID con solo las columnas del reporte.
+
+    Si un ID aparece repetido se conserva su primera fila.
+
+    Args:
+        df: DataFrame de Yakus o Rurus.
+        id_column: Columna con el ID.
+        columns: Columnas a conservar (las ausentes se omiten).
+
+    Returns:
+        DataFrame indexado por ID.
+    """
+    first = ~df[id_column].duplicated().to_numpy()
+    present = [col for col in columns if col in df.columns]
+    table = df.loc[first, present]
+    table.index = pd.Index(df.loc[first, id_column].to_numpy(), name=id_column)
+    return table
+
+
+def _gather(table: pd.DataFrame, positions: np.ndarray, column: str, default=np.nan) -> np.ndarray:
+    """Toma por posición los valores de una columna (-1 o columna ausente -> default)."""
+    if column not in table.columns:
+        return np.full(len(positions), default, dtype=object)
+    return take(table[column].to_numpy(), positions, allow_fill=True, fill_value=default)
+
+
+def _concat_names(first: np.ndarray, second: np.ndarray) -> pd.Series:
+    """Une nombre y apellido tratando los vacíos como ''."""
+    return pd.Series(first).fillna('') + ' ' + pd.Series(second).fillna('')
 
 
 def format_assigned_output(
     assigned_df: pd.DataFrame,
     yakus_df: pd.DataFrame,
-    rurus_df: pd.DataFrame
+    rurus_df: pd.DataFrame,
+    yaku_lookup: Optional[pd.DataFrame] = None,
+    ruru_lookup: Optional[pd.DataFrame] = None
 ) -> pd.DataFrame:
     """
     Prepara el DataFrame de asignados con información detallada y columnas ordenadas.
 
+    En lugar de unir los DataFrames completos, busca la posición de cada ID en
+    tablas de consulta indexadas por ID y toma solo las columnas del reporte.
+
     Args:
         assigned_df: DataFrame con ('yaku_id', 'ruru_id', 'score').
         yakus_df: DataFrame completo de Yakus para el área (con 'yaku_id').
         rurus_df: DataFrame filtrado de Rurus para el área (con 'ID del estudiante:').
+        yaku_lookup: Tabla de Yakus ya construida con build_lookup_table (opcional).
+        ruru_lookup: Tabla de Rurus ya construida con build_lookup_table (opcional).
 
     Returns:
         DataFrame formateado para el reporte de asignaciones.
@@ -65,68 +114,59 @@ def format_assigned_output(
     if assigned_df is None or assigned_df.empty:
         return pd.DataFrame(columns=ASSIGNED_OUTPUT_COLUMNS_ORDER)
 
-    # 1. Merge para añadir datos del Yaku
-    # Seleccionar columnas Yaku relevantes antes del merge para evitar duplicados innecesarios
-    yaku_cols_to_merge = [
-        'yaku_id', 'nombre', 'dni', 'correo', 'celular', 'area', 'quechua',
-        'asignatura', 'taller', # Incluir asignatura/taller
-        'horario_lunes', 'horario_martes', 'horario_miercoles', 'horario_jueves',
-        'horario_viernes', 'horario_sabado', 'horario_domingo'
-    ]
-    # Asegurarse de que solo existan las columnas presentes en yakus_df
-    yaku_cols_present = [col for col in yaku_cols_to_merge if col in yakus_df.columns]
-    merged_df = pd.merge(assigned_df, yakus_df[yaku_cols_present], on='yaku_id', how='left')
-
-    # 2. Merge para añadir datos del Ruru
-    ruru_id_col = 'ID del estudiante:'
-    ruru_cols_to_merge = [
-        ruru_id_col, 'nombre', 'apellido', 'DNI', 'grado_original', 'quechua',
-        'nombre_apoderado', 'apellido_apoderado', 'celular', 'celular_asesoria',
-        'horario_lunes', 'horario_martes', 'horario_miercoles', 'horario_jueves',
-        'horario_viernes', 'horario_sabado', 'horario_domingo'
-    ]
-    # Asegurarse de que solo existan las columnas presentes en rurus_df
-    ruru_cols_present = [col for col in ruru_cols_to_merge if col in rurus_df.columns]
-    # Usar 'ruru_id' (el ID en assigned_df) y ruru_id_col (el ID en rurus_df)
-    merged_df = pd.merge(merged_df, rurus_df[ruru_cols_present], left_on='ruru_id', right_on=ruru_id_col, how='left', suffixes=('_yaku', '_ruru'))
-
-    # 3. Crear columnas combinadas y renombrar
-    merged_df['Nombre Ruru'] = merged_df['nombre_ruru'].fillna('') + ' ' + merged_df['apellido'].fillna('')
-    merged_df['Nombre Yaku'] = merged_df['nombre_yaku'] # Ya viene completo
-    merged_df['Nombre Apoderado Ruru'] = merged_df['nombre_apoderado'].fillna('') + ' ' + merged_df['apellido_apoderado'].fillna('')
-    merged_df['Grado Original Ruru'] = merged_df['grado_original']
-    merged_df['Area'] = merged_df['area'] # Viene del Yaku
-    merged_df['Score Match'] = merged_df['score']
-    merged_df['ID Ruru'] = merged_df['ruru_id']
-    merged_df['ID Yaku'] = merged_df['yaku_id']
-    merged_df['DNI Ruru'] = merged_df.get('DNI', '').apply(clean_str_number)
-    merged_df['DNI Yaku'] = merged_df.get('dni', '').apply(clean_str_number)
-    merged_df['Celular Yaku'] = merged_df.get('celular_yaku', '').apply(clean_str_number)
-    merged_df['Celular Apoderado Ruru'] = merged_df.get('celular_ruru', '').apply(clean_str_number)
-    merged_df['Celular Asesoria Ruru'] = merged_df.get('celular_asesoria', '').apply(clean_str_number)
-    merged_df['Correo Yaku'] = merged_df['correo']
-    merged_df['Quechua Yaku'] = merged_df['quechua_yaku']
-    merged_df['Quechua Ruru'] = merged_df['quechua_ruru']
-
-    # Renombrar columnas de horarios para claridad
-    for dia in ["lunes", "martes", "miercoles", "jueves", "viernes", "sabado", "domingo"]:
-        merged_df[f'Horario {dia.capitalize()} Yaku'] = merged_df.get(f'horario_{dia}_yaku', pd.NA)
-        merged_df[f'Horario {dia.capitalize()} Ruru'] = merged_df.get(f'horario_{dia}_ruru', pd.NA)
-
-    # Crear columna Asignatura/Taller
-    if 'asignatura' in merged_df.columns:
-        merged_df['Asignatura/Taller Asignado'] = merged_df['asignatura']
-    elif 'taller' in merged_df.columns:
-        merged_df['Asignatura/Taller Asignado'] = merged_df['taller']
-    else:
-        merged_df['Asignatura/Taller Asignado'] = "N/A" # Para Bienestar
+    # 1. Tablas de consulta por ID (una vez por ejecución) y posiciones de cada par
+    if yaku_lookup is None:
+        yaku_lookup = build_lookup_table(yakus_df, 'yaku_id', YAKU_LOOKUP_COLS)
+    if ruru_lookup is None:
+        ruru_lookup = build_lookup_table(rurus_df, RURU_ID_COL, RURU_LOOKUP_COLS)
+    yaku_pos = yaku_lookup.index.get_indexer(assigned_df['yaku_id'])
+    ruru_pos = ruru_lookup.index.get_indexer(assigned_df['ruru_id'])
 
+    def yaku(column, default=np.nan):
+        return _gather(yaku_lookup, yaku_pos, column, default)
 
-    # 4. Seleccionar y ordenar columnas finales
-    final_columns_present = [col for col in ASSIGNED_OUTPUT_COLUMNS_ORDER if col in merged_df.columns]
-    final_df = merged_df[final_columns_present].copy()
+    def ruru(column, default=np.nan):
+        return _gather(ruru_lookup, ruru_pos, column, default)
 
-    return final_df
+    # 2. Columna Asignatura/Taller (viene del Yaku)
+    if 'asignatura' in yaku_lookup.columns:
+        subject = yaku('asignatura')
+    elif 'taller' in yaku_lookup.columns:
+        subject = yaku('taller')
+    else:
+        subject = np.full(len(assigned_df), "N/A", dtype=object) # Para Bienestar
+
+    # 3. Construir todas las columnas del reporte
+    columns = {
+        'ID Ruru': assigned_df['ruru_id'].to_numpy(),
+        'ID Yaku': assigned_df['yaku_id'].to_numpy(),
+        'Nombre Ruru': _concat_names(ruru('nombre'), ruru('apellido')),
+        'Nombre Yaku': yaku('nombre'), # Ya viene completo
+        'Area': yaku('area'),
+        'Asignatura/Taller Asignado': subject,
+        'Grado Original Ruru': ruru('grado_original'),
+        'Score Match': assigned_df['score'].to_numpy(),
+    }
+    for dia in ["lunes", "martes", "miercoles", "jueves", "viernes", "sabado", "domingo"]:
+        columns[f'Horario {dia.capitalize()} Yaku'] = yaku(f'horario_{dia}', pd.NA)
+        columns[f'Horario {dia.capitalize()} Ruru'] = ruru(f'horario_{dia}', pd.NA)
+    columns.update({
+        'Nombre Apoderado Ruru': _concat_names(ruru('nombre_apoderado'), ruru('apellido_apoderado')),
+        'Celular Apoderado Ruru': clean_number_series(pd.Series(ruru('celular'))),
+        'Celular Asesoria Ruru': clean_number_series(pd.Series(ruru('celular_asesoria'))),
+        'DNI Ruru': clean_number_series(pd.Series(ruru('DNI'))),
+        'Correo Yaku': yaku('correo'),
+        'Celular Yaku': clean_number_series(pd.Series(yaku('celular'))),
+        'DNI Yaku': clean_number_series(pd.Series(yaku('dni'))),
+        'Quechua Yaku': yaku('quechua'),
+        'Quechua Ruru': ruru('quechua'),
+    })
+
+    # 4. Un único DataFrame en el orden final
+    return pd.DataFrame(
+        {col: np.asarray(columns[col]) for col in ASSIGNED_OUTPUT_COLUMNS_ORDER},
+        index=pd.RangeIndex(len(assigned_df))
+    )
 
 def format_unassigned_output(
     unassigned_ids: Set[str],
@@ -151,45 +191,105 @@ def format_unassigned_output(
     cols_to_str = ['DNI', 'dni', 'celular', 'celular_asesoria']
     for col in cols_to_str:
         if col in final_unassigned_df.columns:
-            final_unassigned_df[col] = final_unassigned_df[col].apply(clean_str_number)
+            final_unassigned_df[col] = clean_number_series(final_unassigned_df[col])
     # --- FIN FORZAR TIPO ---
 
     return final_unassigned_df
 
 
+def _output_sheets(
+    assigned_df: pd.DataFrame,
+    unassigned_yakus_df: pd.DataFrame,
+    unassigned_rurus_df: pd.DataFrame,
+    diagnostics_df: Optional[pd.DataFrame] = None,
+    near_miss_df: Optional[pd.DataFrame] = None
+) -> "OrderedDict[str, pd.DataFrame]":
+    """
+    Arma las hojas del Excel de resultados, con un mensaje cuando una está vacía.
+
+    Las hojas de diagnóstico y de Yakus cercanos solo se agregan si se pasan.
+
+    Returns:
+        Diccionario ordenado {nombre_hoja: DataFrame}
+    """
+    def _or_placeholder(df: Optional[pd.DataFrame], message: str) -> pd.DataFrame:
+        if df is not None and not df.empty:
+            return df
+        return pd.DataFrame([{"Resultado": message}])
+
+    sheets = OrderedDict([
+        ('Asignaciones', _or_placeholder(assigned_df, "No se realizaron asignaciones")),
+        ('Yakus No Asignados', _or_placeholder(unassigned_yakus_df, "Todos los Yakus fueron asignados o no había Yakus")),
+        ('Rurus No Asignados', _or_placeholder(unassigned_rurus_df, "Todos los Rurus fueron asignados o no había Rurus compatibles")),
+    ])
+    if diagnostics_df is not None:
+        sheets[DIAGNOSTICS_SHEET] = _or_placeholder(diagnostics_df, "No hay Rurus no asignados que diagnosticar")
+    if near_miss_df is not None:
+        sheets[NEAR_MISS_SHEET] = _or_placeholder(near_miss_df, "No hay Yakus libres cercanos que recomendar")
+    return sheets
+
+
 def generate_excel_output(
     assigned_df: pd.DataFrame,
     unassigned_yakus_df: pd.DataFrame,
-    unassigned_rurus_df: pd.DataFrame
+    unassigned_rurus_df: pd.DataFrame,
+    diagnostics_df: Optional[pd.DataFrame] = None,
+    near_miss_df: Optional[pd.DataFrame] = None
 ) -> BytesIO:
     """
     Genera un archivo Excel en memoria con hojas separadas para los resultados.
 
+    Para resultados grandes es preferible generate_excel_output_file, que
+    escribe en disco con memoria constante.
+
     Args:
         assigned_df: DataFrame formateado de asignaciones.
         unassigned_yakus_df: DataFrame formateado de Yakus no asignados.
         unassigned_rurus_df: DataFrame formateado de Rurus no asignados.
+        diagnostics_df: Diagnóstico de Rurus no asignados (opcional).
+        near_miss_df: Yakus de horario cercano para los Rurus no asignados (opcional).
 
     Returns:
         BytesIO object conteniendo el archivo Excel.
     """
     output_buffer = BytesIO()
     with pd.ExcelWriter(output_buffer, engine='xlsxwriter') as writer:
-        if assigned_df is not None and not assigned_df.empty:
-            assigned_df.to_excel(writer, sheet_name='Asignaciones', index=False)
-        else:
-             pd.DataFrame([{"Resultado": "No se realizaron asignaciones"}]).to_excel(writer, sheet_name='Asignaciones', index=False)
-
-        if unassigned_yakus_df is not None and not unassigned_yakus_df.empty:
-            unassigned_yakus_df.to_excel(writer, sheet_name='Yakus No Asignados', index=False)
-        else:
-            pd.DataFrame([{"Resultado": "Todos los Yakus fueron asignados o no había Yakus"}]).to_excel(writer, sheet_name='Yakus No Asignados', index=False)
-
-        if unassigned_rurus_df is not None and not unassigned_rurus_df.empty:
-            unassigned_rurus_df.to_excel(writer, sheet_name='Rurus No Asignados', index=False)
-        else:
-            pd.DataFrame([{"Resultado": "Todos los Rurus fueron asignados o no había Rurus compatibles"}]).to_excel(writer, sheet_name='Rurus No Asignados', index=False)
+        for sheet_name, df in _output_sheets(assigned_df, unassigned_yakus_df, unassigned_rurus_df, diagnostics_df, near_miss_df).items():
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
 
     # El writer guarda en el buffer al salir del 'with'
     output_buffer.seek(0) # Mover el cursor al inicio del buffer para lectura
-    return output_buffer 
\ No newline at end of file
+    return output_buffer
+
+
+def generate_excel_output_file(
+    assigned_df: pd.DataFrame,
+    unassigned_yakus_df: pd.DataFrame,
+    unassigned_rurus_df: pd.DataFrame,
+    file_name: str = "resultados_match.xlsx",
+    diagnostics_df: Optional[pd.DataFrame] = None,
+    near_miss_df: Optional[pd.DataFrame] = None
+) -> str:
+    """
+    Genera el Excel de resultados en el almacén temporal de la sesión.
+
+    Escribe fila por fila en modo de memoria constante, con las columnas de
+    IDs, DNIs y teléfonos como texto. Solo la ruta debe guardarse en la
+    sesión; la descarga lee el archivo directamente del disco.
+
+    Args:
+        assigned_df: DataFrame formateado de asignaciones.
+        unassigned_yakus_df: DataFrame formateado de Yakus no asignados.
+        unassigned_rurus_df: DataFrame formateado de Rurus no asignados.
+        file_name: Nombre del archivo dentro del almacén temporal.
+        diagnostics_df: Diagnóstico de Rurus no asignados (opcional).
+        near_miss_df: Yakus de horario cercano para los Rurus no asignados (opcional).
+
+    Returns:
+        Ruta al archivo Excel generado.
+    """
+    sheets = _output_sheets(assigned_df, unassigned_yakus_df, unassigned_rurus_df, diagnostics_df, near_miss_df)
+    file_path = get_temp_path(file_name)
+    write_atomic(file_path, lambda path: write_sheets_streaming(sheets, path))
+    return file_path
+
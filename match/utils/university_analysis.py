@@ -0,0 +1,110 @@
+"""
+Análisis de las universidades de los Yakus asignados, para todas las áreas a la vez.
+
+El archivo global de Yakus se convierte una sola vez en un índice
+DNI normalizado -> universidad; las asignaciones de todas las áreas se cruzan
+con ese índice en una sola operación y los conteos por universidad y área
+salen de un groupby, sin recorrer DNIs uno a uno.
+"""
+
+from typing import Any, Dict, List
+
+import pandas as pd
+
+GLOBAL_DNI_COL = "DNI o Pasaporte"
+GLOBAL_UNIVERSITY_COL = "Universidades"
+UNKNOWN_UNIVERSITY = 'Universidad Desconocida/Vacía'
+NO_AREA_LABEL = "Sin área"
+
+# Columnas de la tabla de resultados de un área
+RESULT_COLUMNS = ['Universidad', 'Cantidad', 'Porcentaje']
+
+
+def clean_dni_series(series: pd.Series) -> pd.Series:
+    """Limpia una serie de Pandas que contiene DNIs."""
+    # Asegurar que sea string, quitar espacios y '.0' si viene de número
+    return series.astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
+
+
+def build_dni_index(global_df: pd.DataFrame) -> pd.Series:
+    """
+    Construye el índice DNI normalizado -> universidad del archivo global.
+
+    Si un DNI se repite se usa su primera fila; las universidades vacías se
+    reemplazan por UNKNOWN_UNIVERSITY.
+
+    Args:
+        global_df: Lista maestra de Yakus (con GLOBAL_DNI_COL y GLOBAL_UNIVERSITY_COL)
+
+    Returns:
+        Serie de universidades indexada por DNI limpio (índice único)
+    """
+    universities = global_df[GLOBAL_UNIVERSITY_COL]
+    blank = universities.isna() | (universities.astype(str).str.strip() == '')
+    index = pd.Series(
+        universities.where(~blank, UNKNOWN_UNIVERSITY).to_numpy(),
+        index=clean_dni_series(global_df[GLOBAL_DNI_COL]).to_numpy(),
+        name='Universidad'
+    )
+    return index[~index.index.duplicated(keep='first')]
+
+
+def assigned_yaku_dnis(asignaciones_df: pd.DataFrame, default_area: str) -> pd.DataFrame:
+    """
+    Extrae el área y el DNI limpio de cada Yaku asignado.
+
+    Args:
+        asignaciones_df: Hoja 'Asignaciones' (con 'DNI Yaku' y opcionalmente 'Area')
+        default_area: Área para las filas sin 'Area'
+
+    Returns:
+        DataFrame con columnas 'Area' y 'DNI'
+    """
+    if 'Area' in asignaciones_df.columns:
+        areas = asignaciones_df['Area'].fillna(default_area).astype(str).str.strip()
+    else:
+        areas = pd.Series(default_area, index=asignaciones_df.index)
+    return pd.DataFrame({
+        'Area': areas.to_numpy(),
+        'DNI': clean_dni_series(asignaciones_df['DNI Yaku']).to_numpy(),
+    })
+
+
+def analyze_universities(dni_index: pd.Series, assignments: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Cuenta las universidades de los Yakus asignados de todas las áreas en una pasada.
+
+    Cada Yaku (DNI) cuenta una vez por área.
+
+    Args:
+        dni_index: Índice de build_dni_index
+        assignments: Asignaciones de todas las áreas (salida de assigned_yaku_dnis, concatenada)
+
+    Returns:
+        Diccionario con:
+        - 'counts': tabla Universidad x Área (con columna 'Total')
+        - 'by_area': {área: DataFrame con RESULT_COLUMNS, de mayor a menor}
+        - 'not_found': {área: DNIs que no están en el archivo global}
+    """
+    pairs = assignments.drop_duplicates(subset=['Area', 'DNI'], keep='first')
+    positions = dni_index.index.get_indexer(pairs['DNI'])
+    found = positions >= 0
+    matched = pairs[found].assign(Universidad=dni_index.to_numpy()[positions[found]])
+    areas: List[str] = pairs['Area'].unique().tolist()
+
+    counts = pd.crosstab(matched['Universidad'], matched['Area']).reindex(columns=areas, fill_value=0)
+    counts['Total'] = counts.sum(axis=1)
+    counts = counts.sort_values('Total', ascending=False)
+
+    grouped = matched.groupby(['Area', 'Universidad']).size().rename('Cantidad').reset_index()
+    grouped['Porcentaje'] = (grouped['Cantidad'] / grouped.groupby('Area')['Cantidad'].transform('sum') * 100).round(2)
+    grouped = grouped.sort_values(['Area', 'Cantidad', 'Universidad'], ascending=[True, False, True])
+    by_area = {area: pd.DataFrame(columns=RESULT_COLUMNS) for area in areas}
+    for area, table in grouped.groupby('Area', sort=False):
+        by_area[area] = table[RESULT_COLUMNS].reset_index(drop=True)
+
+    missing = pairs[~found]
+    not_found = {area: [] for area in areas}
+    not_found.update(missing.groupby('Area', sort=False)['DNI'].agg(list).to_dict())
+
+    return {'counts': counts, 'by_area': by_area, 'not_found': not_found}
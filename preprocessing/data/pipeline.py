@@ -0,0 +1,272 @@
+"""
+Pipeline declarativo de preprocesamiento de Rurus.
+
+Encadena las funciones de datos que usan los tabs de Estandarización,
+Transformación, Filtrado y Validación como etapas de un único proceso, de modo
+que un export crudo del formulario se convierte en un archivo listo para el
+match sin descargas ni recargas intermedias.
+
+Un pipeline es una lista de pasos declarativos:
+
+    [{"stage": "estandarizacion", "params": {...}}, {"stage": "area"}, ...]
+
+Cada etapa guarda su salida en el almacén temporal con una clave derivada de
+la clave de su entrada y de su configuración. Al volver a ejecutar tras un
+cambio pequeño, las etapas anteriores al cambio se leen de caché y solo se
+recalculan las siguientes.
+
+Uso sin interfaz:
+
+    python -m preprocessing.data.pipeline entrada.xlsx salida.xlsx [--area AREA]
+"""
+
+import argparse
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from shared.digest import config_digest, dataframe_digest
+from .filters import combine_filters
+from .validators import validate_column, validate_dni, validate_email, get_validation_summary
+from .column_handlers import standardize_column_values, standardize_dni, standardize_email
+from .ruru_transform import (
+    RURU_COLUMN_MAPPING,
+    standardize_ruru_columns,
+    create_area_column,
+    standardize_schedules,
+    standardize_grades,
+    standardize_languages
+)
+from ..utils.temp_storage import save_data, load_data
+
+
+# --- Etapas ---
+# Cada etapa recibe un DataFrame (copia propia) y sus parámetros, y devuelve
+# (DataFrame, info) donde info es un dict con detalles para el reporte.
+
+def _stage_standardize_columns(df: pd.DataFrame, column_mapping: Optional[Dict[str, str]] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Renombra y selecciona columnas según el mapeo del formulario."""
+    result = standardize_ruru_columns(df, column_mapping or RURU_COLUMN_MAPPING)
+    if result is None:
+        raise ValueError("No se pudieron estandarizar las columnas del archivo de Rurus.")
+    return result, {'columnas': len(result.columns)}
+
+
+def _stage_area(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Crea la columna única de 'area'."""
+    result = create_area_column(df)
+    return result, {'areas': result['area'].value_counts().to_dict()}
+
+
+def _stage_schedules(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Estandariza los horarios al formato de Yakus."""
+    return standardize_schedules(df), {}
+
+
+def _stage_grades(
+    df: pd.DataFrame,
+    id_column_name: str = "ID del estudiante:",
+    original_grade_col: str = "Grado del estudiante:"
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Estandariza los grados conservando el original."""
+    warnings: List[str] = []
+    result = standardize_grades(df, id_column_name=id_column_name, original_grade_col=original_grade_col, on_warning=warnings.append)
+    return result, {'warnings': warnings}
+
+
+def _stage_languages(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Detecta el nivel de quechua a partir de los idiomas."""
+    result = standardize_languages(df)
+    info = result['quechua'].value_counts().to_dict() if 'quechua' in result.columns else {}
+    return result, {'quechua': info}
+
+
+def _stage_filter(
+    df: pd.DataFrame,
+    area_column: Optional[str] = "area",
+    selected_area: Optional[str] = None,
+    id_column: Optional[str] = None,
+    id_list: Optional[List[str]] = None
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Filtra por área y/o lista de identificadores."""
+    result, not_found_ids = combine_filters(df, area_column, selected_area, id_column, id_list)
+    return result, {'not_found_ids': not_found_ids}
+
+
+def _stage_validation(df: pd.DataFrame, column: str = "DNI", tipo: str = "dni") -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Estandariza y valida una columna de DNI o correo."""
+    if column not in df.columns:
+        return df, {'error': f"La columna '{column}' no existe"}
+    if tipo == "email":
+        standardize_function, validator_function = standardize_email, validate_email
+    else:
+        standardize_function, validator_function = standardize_dni, validate_dni
+    result, changes = standardize_column_values(df, column, standardize_function)
+    summary = get_validation_summary(validate_column(result, column, validator_function))
+    summary['standardized_values'] = int(changes)
+    return result, summary
+
+
+# Mapeo de nombres de etapa a funciones
+STAGE_REGISTRY: Dict[str, Callable[..., Tuple[pd.DataFrame, Dict[str, Any]]]] = {
+    "estandarizacion": _stage_standardize_columns,
+    "area": _stage_area,
+    "horarios": _stage_schedules,
+    "grado": _stage_grades,
+    "idioma": _stage_languages,
+    "filtro": _stage_filter,
+    "validacion": _stage_validation,
+}
+
+# Etiquetas legibles para la interfaz
+STAGE_LABELS = {
+    "estandarizacion": "Estandarizar columnas",
+    "area": "Crear columna única de 'area'",
+    "horarios": "Estandarizar formato de horarios",
+    "grado": "Estandarizar grados",
+    "idioma": "Estandarizar idiomas",
+    "filtro": "Filtrar por área / IDs",
+    "validacion": "Validar DNIs",
+}
+
+# Pipeline por defecto: export crudo del formulario -> Rurus listos para el match
+DEFAULT_RURU_PIPELINE: List[Dict[str, Any]] = [
+    {"stage": "estandarizacion", "params": {"column_mapping": RURU_COLUMN_MAPPING}},
+    {"stage": "area"},
+    {"stage": "horarios"},
+    {"stage": "grado"},
+    {"stage": "idioma"},
+    {"stage": "validacion", "params": {"column": "DNI", "tipo": "dni"}},
+]
+
+
+def build_ruru_pipeline(
+    stages: Optional[List[str]] = None,
+    selected_area: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Construye la lista de pasos del pipeline de Rurus.
+
+    Args:
+        stages: Nombres de etapas a incluir (None para todas las del pipeline por defecto)
+        selected_area: Si se indica, añade una etapa de filtrado por esa área
+
+    Returns:
+        Lista de pasos declarativos
+    """
+    steps = [dict(step) for step in DEFAULT_RURU_PIPELINE if stages is None or step["stage"] in stages]
+    if selected_area and selected_area != "Todas las áreas":
+        steps.append({"stage": "filtro", "params": {"area_column": "area", "selected_area": selected_area}})
+    return steps
+
+
+def _stage_key(input_key: str, step: Dict[str, Any]) -> str:
+    """Clave de caché de una etapa: clave de su entrada + nombre + parámetros."""
+    return config_digest({
+        'input': input_key,
+        'stage': step["stage"],
+        'params': step.get("params", {}),
+    })
+
+
+def run_pipeline(
+    df: pd.DataFrame,
+    steps: List[Dict[str, Any]],
+    use_cache: bool = True,
+    progress_callback: Optional[Callable[[int, int, str], None]] = None
+) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+    """
+    Ejecuta un pipeline declarativo sobre un DataFrame.
+
+    La clave de la primera etapa se deriva del contenido del DataFrame de
+    entrada; la de cada etapa siguiente, de la clave de la anterior. Así, un
+    cambio de configuración invalida solo esa etapa y las posteriores.
+
+    Args:
+        df: DataFrame de entrada (no se modifica)
+        steps: Lista de pasos {"stage": nombre, "params": {...}}
+        use_cache: Si se deben leer y guardar resultados en caché
+        progress_callback: Función opcional (índice, total, etapa) para reportar avance
+
+    Returns:
+        Tupla con (DataFrame final, reporte por etapa)
+        El reporte contiene 'stage', 'cached', 'rows', 'seconds' e 'info'
+
+    Raises:
+        ValueError: Si una etapa no existe en STAGE_REGISTRY
+    """
+    unknown = [step["stage"] for step in steps if step["stage"] not in STAGE_REGISTRY]
+    if unknown:
+        raise ValueError(f"Etapas desconocidas en el pipeline: {', '.join(unknown)}")
+
+    current_df = df
+    current_key = dataframe_digest(df)
+    report = []
+
+    for i, step in enumerate(steps):
+        stage_name = step["stage"]
+        if progress_callback:
+            progress_callback(i, len(steps), stage_name)
+
+        current_key = _stage_key(current_key, step)
+        cache_key = f"pipeline_{stage_name}_{current_key[:32]}"
+        start = time.perf_counter()
+
+        cached = load_data(cache_key) if use_cache else None
+        if cached is not None:
+            current_df, info = cached
+            was_cached = True
+        else:
+            stage_function = STAGE_REGISTRY[stage_name]
+            # Cada etapa trabaja sobre su propia copia: las funciones de los tabs
+            # modifican el DataFrame en el lugar y la entrada puede venir de caché
+            current_df, info = stage_function(current_df.copy(), **step.get("params", {}))
+            if use_cache:
+                save_data((current_df, info), cache_key)
+            was_cached = False
+
+        report.append({
+            'stage': stage_name,
+            'cached': was_cached,
+            'rows': len(current_df),
+            'seconds': round(time.perf_counter() - start, 3),
+            'info': info,
+        })
+
+    if progress_callback:
+        progress_callback(len(steps), len(steps), "")
+
+    return current_df, report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Punto de entrada para ejecutar el pipeline sin interfaz."""
+    parser = argparse.ArgumentParser(description="Pipeline de preprocesamiento de Rurus")
+    parser.add_argument("entrada", help="Export crudo del formulario (Excel o CSV)")
+    parser.add_argument("salida", help="Archivo Excel de salida con los Rurus transformados")
+    parser.add_argument("--area", default=None, help="Filtrar por esta área al final")
+    parser.add_argument("--etapas", default=None, help="Etapas separadas por comas (por defecto todas)")
+    parser.add_argument("--sin-cache", action="store_true", help="No leer ni guardar resultados en caché")
+    args = parser.parse_args(argv)
+
+    if args.entrada.lower().endswith(".csv"):
+        df = pd.read_csv(args.entrada)
+    else:
+        df = pd.read_excel(args.entrada)
+
+    stages = [name.strip() for name in args.etapas.split(",")] if args.etapas else None
+    steps = build_ruru_pipeline(stages, args.area)
+    result, report = run_pipeline(df, steps, use_cache=not args.sin_cache)
+
+    for entry in report:
+        origen = "caché" if entry['cached'] else f"{entry['seconds']}s"
+        print(f"{entry['stage']:<16} {entry['rows']:>6} filas  ({origen})")
+
+    result.to_excel(args.salida, index=False)
+    print(f"Resultado guardado en {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,256 @@
+"""
+Actualización incremental de un archivo de resultados del match.
+
+Compara, por ID de Ruru, las hojas de un archivo de resultados con una nueva
+versión de Rurus Transformados y clasifica cada Ruru como:
+
+- agregado: Ruru del área que aún no aparece en el archivo (va a No Asignados)
+- eliminado: Ruru del archivo que ya no está en Rurus Transformados (se
+  conserva tal cual y se reporta)
+- contacto actualizado: sus celulares o DNI cambiaron
+- sin cambios
+
+La comparación usa una huella por fila de los datos de contacto, así que
+solo las filas cuya huella difiere se modifican y se anotan en el registro
+de cambios.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from shared.digest import row_fingerprints
+from shared.normalization import clean_number_series
+
+RURU_SOURCE_ID_COL = 'ID del estudiante:'
+
+CHANGE_LOG_SHEET = "Registro de Cambios"
+CHANGE_LOG_COLUMNS = ['Hoja', 'ID Ruru', 'Cambio', 'Columna', 'Valor Anterior', 'Valor Nuevo']
+
+CHANGE_ADDED = 'Agregado'
+CHANGE_REMOVED = 'Eliminado'
+CHANGE_CONTACT = 'Contacto actualizado'
+
+# Columna de ID del Ruru en cada hoja que contiene Rurus
+SHEET_RURU_ID_COLUMNS = {
+    'Asignaciones': 'ID Ruru',
+    'Rurus No Asignados': RURU_SOURCE_ID_COL,
+}
+
+# Datos de contacto: {columna en Rurus Transformados: {hoja: columna en la hoja}}
+CONTACT_COLUMNS = {
+    'celular': {'Asignaciones': 'Celular Apoderado Ruru', 'Rurus No Asignados': 'Celular Apoderado Ruru'},
+    'celular_asesoria': {'Asignaciones': 'Celular Asesoria Ruru', 'Rurus No Asignados': 'Celular Asesoria Ruru'},
+    'DNI': {'Asignaciones': 'DNI Ruru', 'Rurus No Asignados': 'DNI'},
+}
+
+# Columnas de Rurus Transformados copiadas a 'Rurus No Asignados' para los Rurus nuevos
+NEW_RURU_COLUMN_MAP = {
+    RURU_SOURCE_ID_COL: RURU_SOURCE_ID_COL,
+    'nombre': 'nombre',
+    'apellido': 'apellido',
+    'DNI': 'DNI',
+    'area': 'area',
+    'grado_original': 'grado_original',
+    'quechua': 'quechua',
+    'celular': 'Celular Apoderado Ruru',
+    'celular_asesoria': 'Celular Asesoria Ruru',
+    'horario_lunes': 'horario_lunes',
+}
+
+# Columnas de 'Rurus No Asignados' cuando la hoja original está vacía
+BASIC_RURU_NA_COLUMNS = [
+    RURU_SOURCE_ID_COL, 'nombre', 'apellido', 'DNI', 'area',
+    'grado_original', 'quechua', 'Celular Apoderado Ruru', 'Celular Asesoria Ruru'
+]
+
+
+def build_contact_snapshot(rurus_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Prepara los datos de contacto limpios de Rurus Transformados, indexados por ID.
+
+    Args:
+        rurus_df: Rurus Transformados (todas las áreas)
+
+    Returns:
+        DataFrame con una columna por dato de contacto y el ID como índice
+        (si un ID se repite se usa su primera aparición)
+    """
+    source = rurus_df.drop_duplicates(subset=[RURU_SOURCE_ID_COL], keep='first')
+    return pd.DataFrame(
+        {col: clean_number_series(source[col]).to_numpy() for col in CONTACT_COLUMNS},
+        index=pd.Index(source[RURU_SOURCE_ID_COL].astype(str), name=RURU_SOURCE_ID_COL)
+    )
+
+
+def _change_log(sheet: str, ids: Any, change: str, column: str = '', old: Any = '', new: Any = '') -> pd.DataFrame:
+    """Filas del registro de cambios para varios IDs."""
+    return pd.DataFrame({
+        'Hoja': sheet, 'ID Ruru': ids, 'Cambio': change,
+        'Columna': column, 'Valor Anterior': old, 'Valor Nuevo': new
+    }, columns=CHANGE_LOG_COLUMNS)
+
+
+def patch_contacts(
+    sheet_df: pd.DataFrame,
+    sheet_name: str,
+    snapshot: pd.DataFrame
+) -> Tuple[pd.DataFrame, List[pd.DataFrame], Dict[str, int]]:
+    """
+    Actualiza los datos de contacto de una hoja con Rurus.
+
+    Todas las columnas de contacto se normalizan (formato de número limpio);
+    solo las filas cuya huella de contacto difiere de la de Rurus
+    Transformados reciben valores nuevos.
+
+    Args:
+        sheet_df: Hoja 'Asignaciones' o 'Rurus No Asignados'
+        sheet_name: Nombre de la hoja
+        snapshot: Contactos de build_contact_snapshot
+
+    Returns:
+        Tupla (hoja actualizada, partes del registro de cambios,
+        conteos {'contact_changed', 'removed', 'unchanged'})
+    """
+    counts = {'contact_changed': 0, 'removed': 0, 'unchanged': 0}
+    id_col = SHEET_RURU_ID_COLUMNS[sheet_name]
+    if sheet_df.empty or id_col not in sheet_df.columns:
+        return sheet_df, [], counts
+
+    df = sheet_df.copy()
+    df[id_col] = df[id_col].astype(str)
+    ids = df[id_col].to_numpy()
+    targets = {source: columns[sheet_name] for source, columns in CONTACT_COLUMNS.items()}
+    sources = list(targets)
+
+    # Contactos actuales normalizados (una columna ausente cuenta como vacía)
+    current = pd.DataFrame({
+        source: clean_number_series(df[target]).to_numpy() if target in df.columns else np.full(len(df), '', dtype=object)
+        for source, target in targets.items()
+    })
+
+    positions = snapshot.index.get_indexer(ids)
+    found = positions >= 0
+    found_rows = np.flatnonzero(found)
+    incoming = snapshot.iloc[positions[found]]
+    changed = row_fingerprints(current.iloc[found_rows], sources) != row_fingerprints(incoming, sources)
+    changed_rows = found_rows[changed]
+    incoming_changed = incoming[changed]
+
+    log_parts = []
+    for source, target in targets.items():
+        values = current[source].to_numpy()
+        old_values = values[changed_rows]
+        new_values = incoming_changed[source].to_numpy()
+        values[changed_rows] = new_values
+        df[target] = values
+
+        differs = old_values != new_values
+        if differs.any():
+            log_parts.append(_change_log(
+                sheet_name, ids[changed_rows][differs], CHANGE_CONTACT, target,
+                old_values[differs], new_values[differs]
+            ))
+
+    if not found.all():
+        log_parts.append(_change_log(sheet_name, ids[~found], CHANGE_REMOVED))
+
+    counts['contact_changed'] = len(changed_rows)
+    counts['removed'] = int((~found).sum())
+    counts['unchanged'] = len(found_rows) - len(changed_rows)
+    return df, log_parts, counts
+
+
+def format_new_rurus(new_rurus: pd.DataFrame, target_columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Da a los Rurus nuevos el formato de la hoja 'Rurus No Asignados'.
+
+    Args:
+        new_rurus: Filas de Rurus Transformados a agregar
+        target_columns: Columnas de la hoja destino (si es None, las de
+            BASIC_RURU_NA_COLUMNS disponibles)
+
+    Returns:
+        DataFrame con las columnas de target_columns (vacías si el Ruru no tiene el dato)
+    """
+    formatted = new_rurus.rename(columns={k: v for k, v in NEW_RURU_COLUMN_MAP.items() if k in new_rurus.columns})
+    for col in ['Celular Apoderado Ruru', 'Celular Asesoria Ruru', 'DNI']:
+        if col in formatted.columns:
+            formatted[col] = clean_number_series(formatted[col])
+    if target_columns is None:
+        target_columns = [col for col in BASIC_RURU_NA_COLUMNS if col in formatted.columns]
+    return formatted.reindex(columns=target_columns, fill_value='')
+
+
+def update_results_bundle(
+    results: Dict[str, pd.DataFrame],
+    rurus_df: pd.DataFrame,
+    area: str
+) -> Tuple[Dict[str, pd.DataFrame], pd.DataFrame, Dict[str, int]]:
+    """
+    Aplica una nueva versión de Rurus Transformados a un archivo de resultados de un área.
+
+    Args:
+        results: Hojas 'Asignaciones', 'Yakus No Asignados' y 'Rurus No Asignados'
+        rurus_df: Rurus Transformados actualizados (todas las áreas)
+        area: Área del archivo de resultados
+
+    Returns:
+        Tupla (hojas actualizadas, registro de cambios, resumen con los conteos
+        'added', 'removed', 'contact_changed' y 'unchanged')
+    """
+    snapshot = build_contact_snapshot(rurus_df)
+    log_parts: List[pd.DataFrame] = []
+    summary = {'added': 0, 'removed': 0, 'contact_changed': 0, 'unchanged': 0}
+
+    # 1. Contactos de Rurus ya presentes en el archivo
+    sheets = {}
+    for sheet_name in ['Asignaciones', 'Rurus No Asignados']:
+        sheet_df, sheet_log, counts = patch_contacts(results.get(sheet_name, pd.DataFrame()), sheet_name, snapshot)
+        sheets[sheet_name] = sheet_df
+        log_parts.extend(sheet_log)
+        for key, value in counts.items():
+            summary[key] += value
+
+    df_asignaciones = sheets['Asignaciones']
+    if not df_asignaciones.empty:
+        if 'dni' in df_asignaciones.columns: # Nombre esperado post-match
+            df_asignaciones['DNI Yaku'] = clean_number_series(df_asignaciones['dni'])
+        if 'Celular Yaku' in df_asignaciones.columns:
+            df_asignaciones['Celular Yaku'] = clean_number_series(df_asignaciones['Celular Yaku'])
+
+    # 2. Rurus nuevos del área: los que no aparecen en ninguna hoja del archivo
+    existing_ids = [
+        sheets[sheet_name][id_col].to_numpy()
+        for sheet_name, id_col in SHEET_RURU_ID_COLUMNS.items()
+        if id_col in sheets[sheet_name].columns
+    ]
+    existing_ids = np.concatenate(existing_ids) if existing_ids else np.array([], dtype=object)
+    area_rurus = rurus_df[rurus_df['area'] == area]
+    new_rurus = area_rurus[~area_rurus[RURU_SOURCE_ID_COL].astype(str).isin(existing_ids)]
+
+    df_rurus_na = sheets['Rurus No Asignados']
+    if not new_rurus.empty:
+        new_rows = format_new_rurus(new_rurus, df_rurus_na.columns.tolist() or None)
+        new_rows[RURU_SOURCE_ID_COL] = new_rows[RURU_SOURCE_ID_COL].astype(str)
+        df_rurus_na = pd.concat([df_rurus_na, new_rows], ignore_index=True)
+        log_parts.append(_change_log('Rurus No Asignados', new_rows[RURU_SOURCE_ID_COL].to_numpy(), CHANGE_ADDED))
+        summary['added'] = len(new_rows)
+    if RURU_SOURCE_ID_COL in df_rurus_na.columns:
+        # Eliminar duplicados por ID por si acaso
+        df_rurus_na = df_rurus_na.drop_duplicates(subset=[RURU_SOURCE_ID_COL], keep='first')
+
+    # 3. Yakus No Asignados: solo formato de números
+    df_yakus_na = results.get("Yakus No Asignados", pd.DataFrame()).copy()
+    for col in ['dni', 'celular']:
+        if col in df_yakus_na.columns:
+            df_yakus_na[col] = clean_number_series(df_yakus_na[col])
+
+    updated = {
+        'Asignaciones': df_asignaciones,
+        'Yakus No Asignados': df_yakus_na,
+        'Rurus No Asignados': df_rurus_na,
+    }
+    change_log = pd.concat(log_parts, ignore_index=True) if log_parts else pd.DataFrame(columns=CHANGE_LOG_COLUMNS)
+    return updated, change_log, summary
@@ -0,0 +1,378 @@
+"""
+Transformaciones de datos de Rurus.
+
+Funciones sin interfaz para estandarizar las columnas del formulario de
+inscripción de Rurus y transformar sus valores (área, horarios, grados e
+idiomas). Las usan los tabs de Estandarización y Transformación y el
+pipeline de preprocesamiento.
+"""
+
+import pandas as pd
+from typing import Callable, Dict, Optional
+
+
+# Mapeo de columnas del formulario de inscripción de Rurus
+# El mapeo tiene el formato {"columna_original": "columna_nueva"}
+# Añadimos la columna F para el ID del estudiante
+RURU_COLUMN_MAPPING = {
+    "F": "ID del estudiante:",
+    "H": "nombre",
+    "I": "apellido",
+    "J": "DNI",
+    "K": "colegio",
+    "L": "Grado del estudiante:",
+    "R": "idiomas",
+    "AA": "nombre_apoderado",
+    "AB": "apellido_apoderado",
+    "AD": "celular",
+    "BD": "arte_y_cultura",
+    "BE": "bienestar_psicologico",
+    "BF": "asesoria_a_colegios_nacionales",
+    "BM": "taller_opcion1",
+    "BN": "taller_opcion2",
+    "BO": "taller_opcion3",
+    "BP": "asignatura_opcion1",
+    "BQ": "asignatura_opcion2",
+    "BY": "celular_asesoria",
+    "CH": "lunes_mañana",
+    "CI": "lunes_tarde",
+    "CJ": "lunes_noche",
+    "CL": "martes_mañana",
+    "CM": "martes_tarde",
+    "CN": "martes_noche",
+    "CP": "miercoles_mañana",
+    "CQ": "miercoles_tarde",
+    "CR": "miercoles_noche",
+    "CT": "jueves_mañana",
+    "CU": "jueves_tarde",
+    "CV": "jueves_noche",
+    "CX": "viernes_mañana",
+    "CY": "viernes_tarde",
+    "CZ": "viernes_noche",
+    "DB": "sabado_mañana",
+    "DC": "sabado_tarde",
+    "DD": "sabado_noche",
+    "DF": "domingo_mañana",
+    "DG": "domingo_tarde",
+    "DH": "domingo_noche",
+}
+
+
+def standardize_ruru_columns(df: pd.DataFrame, column_mapping: Dict[str, str]) -> pd.DataFrame:
+    """
+    Estandariza las columnas de un DataFrame de Rurus según un mapeo.
+    
+    Args:
+        df: DataFrame original
+        column_mapping: Mapeo de columnas originales a nuevos nombres
+    
+    Returns:
+        DataFrame con columnas estandarizadas (None si df está vacío)
+
+    Raises:
+        ValueError: Si ocurre un error al estandarizar
+    """
+    if df is None or df.empty:
+        return None
+    
+    try:
+        # Crear una copia del DataFrame para no modificar el original
+        processed_df = df.copy()
+        
+        # Lista para almacenar las columnas que vamos a conservar
+        columns_to_keep = []
+        
+        # Diccionario para mapear índices a nuevos nombres
+        index_to_name = {}
+        
+        # Primero, procesamos el mapeo para convertir letras a índices
+        for col_orig, col_new in column_mapping.items():
+            if col_orig.isalpha():
+                # Convertir letras de Excel (A, B, C..., AA, AB...) a índice (0, 1, 2...)
+                col_idx = sum((ord(c.upper()) - ord('A') + 1) * 26**i for i, c in enumerate(reversed(col_orig))) - 1
+                
+                # Verificar que el índice está dentro del rango
+                if col_idx < len(processed_df.columns):
+                    index_to_name[col_idx] = col_new
+            else:
+                # Si no es letra, asumir que es nombre de columna
+                if col_orig in processed_df.columns:
+                    index_to_name[list(processed_df.columns).index(col_orig)] = col_new
+        
+        # Crear un nuevo DataFrame con solo las columnas seleccionadas
+        new_df = pd.DataFrame()
+        
+        # Añadir columnas al nuevo DataFrame con los nombres nuevos
+        for idx, new_name in index_to_name.items():
+            if idx < len(processed_df.columns):
+                new_df[new_name] = processed_df.iloc[:, idx]
+        
+        return new_df
+    
+    except Exception as e:
+        raise ValueError(f"Error al estandarizar columnas: {str(e)}") from e
+
+
+
+def create_area_column(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Crea una columna única de "area" basada en las columnas de área específicas.
+    
+    Args:
+        df: DataFrame con columnas de áreas
+        
+    Returns:
+        DataFrame con nueva columna "area"
+    """
+    # Verificar que las columnas necesarias existen
+    area_columns = ["arte_y_cultura", "bienestar_psicologico", "asesoria_a_colegios_nacionales"]
+    
+    # Crear columna "area" vacía
+    df["area"] = ""
+    
+    # Condición para cada área
+    for area_col in area_columns:
+        if area_col in df.columns:
+            # Reemplazar valores vacíos con 0 y convertir a entero
+            df[area_col] = df[area_col].fillna(0).astype(str)
+            
+            # Donde el valor es "1", asignar el nombre del área correspondiente
+            area_name = area_col.replace("_", " ").title()
+            
+            # Las áreas tienen estas correspondencias:
+            area_map = {
+                "arte_y_cultura": "Arte & Cultura",
+                "bienestar_psicologico": "Bienestar Psicológico",
+                "asesoria_a_colegios_nacionales": "Asesoría a Colegios Nacionales"
+            }
+            
+            # Asignar nombre de área estandarizado donde hay 1
+            df.loc[df[area_col] == "1", "area"] = area_map.get(area_col, area_name)
+    
+    return df
+
+
+def standardize_schedules(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Estandariza el formato de horarios para coincidir con el formato de Yakus.
+    
+    Args:
+        df: DataFrame con columnas de horarios
+        
+    Returns:
+        DataFrame con horarios estandarizados
+    """
+    # Obtener todas las columnas de horarios
+    dias = ["lunes", "martes", "miercoles", "jueves", "viernes", "sabado", "domingo"]
+    turnos = ["mañana", "tarde", "noche"]
+    
+    horario_columns = [f"{dia}_{turno}" for dia in dias for turno in turnos]
+    
+    # Crear las columnas de horario unificadas para cada día
+    for dia in dias:
+        # Verificar si existen las columnas de turnos para este día
+        turnos_dia = [f"{dia}_{turno}" for turno in turnos]
+        turnos_existentes = [col for col in turnos_dia if col in df.columns]
+        
+        if turnos_existentes:
+            # Crear columna unificada para este día
+            col_horario = f"horario_{dia}"
+            df[col_horario] = ""
+            
+            # Formato para cada turno, similar al formato de Yakus
+            formato_turnos = {
+                f"{dia}_mañana": "Mañana (8am -12 m)",
+                f"{dia}_tarde": "Tarde (2pm -6 pm)",
+                f"{dia}_noche": "Noche (6pm -10 pm)"
+            }
+            
+            # Crear un diccionario para seguir los turnos ya añadidos para cada fila
+            turnos_añadidos = {i: set() for i in range(len(df))}
+            
+            # Procesar cada turno
+            for turno_col in turnos_existentes:
+                if turno_col in df.columns:
+                    # Convertir la columna a un formato que podamos procesar
+                    df[turno_col] = df[turno_col].fillna(0)
+                    
+                    # Intentar convertir a numérico (para manejar strings, floats, ints, etc.)
+                    try:
+                        df[turno_col] = pd.to_numeric(df[turno_col], errors='coerce').fillna(0)
+                    except:
+                        # Si falla, asegurar que tenemos strings
+                        df[turno_col] = df[turno_col].astype(str)
+                    
+                    # Ahora verificar si hay disponibilidad (valor 1 como número o string)
+                    if pd.api.types.is_numeric_dtype(df[turno_col]):
+                        disponible_mask = df[turno_col] == 1
+                    else:
+                        # Para strings, verificar "1" o valores que indiquen disponibilidad
+                        disponible_mask = df[turno_col].isin(["1", "true", "True", "yes", "Yes", "disponible", "Disponible"])
+                    
+                    # Obtener el formato de turno correspondiente
+                    formato_turno = formato_turnos.get(turno_col, "")
+                    
+                    # Iterar sobre cada fila que tiene disponibilidad
+                    for idx in df.index[disponible_mask]:
+                        # Verificar si el turno ya fue añadido para esta fila
+                        if formato_turno not in turnos_añadidos[idx]:
+                            # Si la columna está vacía, simplemente asignar el formato
+                            if df.loc[idx, col_horario] == "":
+                                df.loc[idx, col_horario] = formato_turno
+                            else:
+                                # Si ya hay otros valores, añadir con coma
+                                df.loc[idx, col_horario] += f", {formato_turno}"
+                            
+                            # Marcar este turno como añadido para esta fila
+                            turnos_añadidos[idx].add(formato_turno)
+            
+            # Donde no haya disponibilidad, poner "No disponible"
+            df.loc[df[col_horario] == "", col_horario] = "No disponible"
+            
+            # Eliminar columnas de turnos individuales
+            df = df.drop(columns=turnos_existentes, errors='ignore')
+    
+    return df
+
+
+def standardize_grades(
+    df: pd.DataFrame,
+    id_column_name: str = "ID del estudiante:",
+    original_grade_col: str = "Grado del estudiante:",
+    on_warning: Optional[Callable[[str], None]] = None
+) -> pd.DataFrame:
+    """
+    Estandariza los grados escolares usando búsqueda de palabras clave.
+
+    Las advertencias (columnas faltantes, grados no reconocidos) se entregan a
+    on_warning, por ejemplo st.warning desde un tab; si es None se omiten.
+    """
+    warn = on_warning or (lambda message: None)
+    # Verificar columna de grado original
+    if original_grade_col not in df.columns:
+        warn(f"⚠️ La columna de grado original '{original_grade_col}' no se encontró. No se puede estandarizar.")
+        return df
+
+    # Verificar si existe la columna de ID
+    if id_column_name not in df.columns:
+        warn(f"⚠️ La columna de ID '{id_column_name}' no se encontró. Asegúrate de que exista para el reporte final.")
+        # Considerar manejo de error si el ID es absolutamente crucial
+
+    # Conservar el grado original
+    df['grado_original'] = df[original_grade_col].astype(str)
+
+    # Función interna para aplicar la estandarización con palabras clave
+    def standardize_grade_value(grade_str):
+        if pd.isna(grade_str):
+            return "No especificado"
+
+        # Limpiar, convertir a minúsculas
+        lower_grade = str(grade_str).strip().lower()
+
+        if not lower_grade:
+             return "No especificado"
+
+        # --- Lógica de Palabras Clave ---
+        # ** Añadir caso especial para "2 primaria" **
+        if "2" in lower_grade and "primaria" in lower_grade and "segundo" not in lower_grade: # Evitar conflicto con "segundo" si existe
+            return "Primaria (3° y 4° grado)" # Mapeo especial solicitado
+
+        # Primaria (Continuar con las demás reglas)
+        elif "tercero" in lower_grade and "primaria" in lower_grade:
+            return "Primaria (3° y 4° grado)"
+        elif "cuarto" in lower_grade and "primaria" in lower_grade:
+            return "Primaria (3° y 4° grado)"
+        elif "quinto" in lower_grade and "primaria" in lower_grade:
+            return "Primaria (5° y 6° grado)"
+        elif "sexto" in lower_grade and "primaria" in lower_grade:
+            return "Primaria (5° y 6° grado)"
+        elif "primero" in lower_grade and "primaria" in lower_grade:
+             return "Primaria (1° y 2° grado)"
+        elif "segundo" in lower_grade and "primaria" in lower_grade:
+             # Esta regla ahora no se aplicará si "2 primaria" ya coincidió antes
+             return "Primaria (1° y 2° grado)"
+        # Secundaria
+        elif "primero" in lower_grade and "secundaria" in lower_grade:
+            return "Secundaria (1°, 2° y 3° grado)"
+        elif "segundo" in lower_grade and "secundaria" in lower_grade:
+            return "Secundaria (1°, 2° y 3° grado)"
+        elif "tercero" in lower_grade and "secundaria" in lower_grade:
+            return "Secundaria (1°, 2° y 3° grado)"
+
+        # Fallback: Si ninguna combinación coincide, devolver el original limpiado
+        return str(grade_str).strip() # Devolver el original (sin convertir a minúscula)
+
+    # Aplicar estandarización para crear la nueva columna 'grado'
+    df["grado"] = df['grado_original'].apply(standardize_grade_value)
+
+    # Añadir registro estadístico
+    standard_grades_list = [
+        "Primaria (1° y 2° grado)",
+        "Primaria (3° y 4° grado)",
+        "Primaria (5° y 6° grado)",
+        "Secundaria (1°, 2° y 3° grado)",
+        "No especificado"
+    ]
+    valores_no_estandarizados = df["grado"][
+        ~df["grado"].isin(standard_grades_list) & (df["grado"] != "No especificado")
+    ].unique()
+
+    if len(valores_no_estandarizados) > 0:
+        warn(f"⚠️ Algunos valores de grado ('{original_grade_col}') no pudieron ser estandarizados a un formato conocido y se mantuvieron como están en la columna 'grado': {list(valores_no_estandarizados)}")
+
+    # Reordenar columnas (opcional, para poner grado_original cerca de grado)
+    cols = df.columns.tolist()
+    if 'grado' in cols and 'grado_original' in cols:
+        try:
+            # Mover 'grado_original' justo después de 'grado'
+            cols.insert(cols.index('grado') + 1, cols.pop(cols.index('grado_original')))
+            df = df[cols]
+        except ValueError: # En caso de que 'grado' no esté presente por algún error
+            pass
+
+    return df
+
+
+def standardize_languages(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Estandariza los idiomas, creando una columna para nivel de quechua.
+    
+    Args:
+        df: DataFrame con columna de idiomas
+        
+    Returns:
+        DataFrame con idiomas estandarizados
+    """
+    if "idiomas" not in df.columns:
+        return df
+    
+    # Crear columna para nivel de quechua
+    df["quechua"] = "No lo hablo"
+    
+    # Función para detectar nivel de quechua
+    def detect_quechua(idioms_str):
+        if pd.isna(idioms_str) or not isinstance(idioms_str, str):
+            return "No lo hablo"
+            
+        idioms_lower = idioms_str.lower()
+        
+        # Detectar si habla quechua y posible nivel
+        if "quechua" in idioms_lower or "kichwa" in idioms_lower or "qheswa" in idioms_lower:
+            # Intentar detectar nivel
+            if any(nivel in idioms_lower for nivel in ["avanzado", "fluido", "nativo"]):
+                return "Nivel avanzado"
+            elif any(nivel in idioms_lower for nivel in ["intermedio", "regular"]):
+                return "Nivel intermedio"
+            elif any(nivel in idioms_lower for nivel in ["básico", "basico", "poco"]):
+                return "Nivel básico"
+            else:
+                # Si solo menciona quechua sin nivel, asumir nivel básico
+                return "Nivel básico"
+                
+        return "No lo hablo"
+    
+    # Aplicar estandarización
+    df["quechua"] = df["idiomas"].apply(detect_quechua)
+    
+    return df
+
@@ -15,6 +15,7 @@ from .tabs.filter_area_tab import filter_area_tab
 from .tabs.ruru_standardization_tab import ruru_standardization_tab
 from .tabs.ruru_transform_tab import ruru_transform_tab
 from .tabs.update_match_results_tab import update_match_results_tab
+from .tabs.ruru_pipeline_tab import ruru_pipeline_tab
 
 # Mapeo de nombres de tabs a funciones
 # (Añadir el nuevo tab al final o donde prefieras)
@@ -24,6 +25,7 @@ TAB_MAP = {
     "Filtrado por Área/ID": filter_area_tab,
     "Estandarización Rurus": ruru_standardization_tab,
     "Transformación Rurus": ruru_transform_tab,
+    "Pipeline Rurus": ruru_pipeline_tab,
     "Actualizar Resultados Match": update_match_results_tab, # <-- Nuevo Tab
 }
 
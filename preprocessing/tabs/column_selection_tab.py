@@ -14,6 +14,17 @@ from preprocessing.utils.session_state import get_dataframe, set_dataframe, set_
 from preprocessing.ui.uploader import file_uploader
 from preprocessing.ui.selectors import select_columns
 from preprocessing.ui.download import download_buttons
+from shared.upload_cache import parse_upload
+
+
+def _read_table(uploaded_file):
+    """Lee un Excel o CSV subido según su extensión (None si no es ninguno)."""
+    file_ext = os.path.splitext(uploaded_file.name)[1].lower()
+    if file_ext in ['.xlsx', '.xls']:
+        return pd.read_excel(uploaded_file)
+    elif file_ext == '.csv':
+        return pd.read_csv(uploaded_file)
+    return None
 
 
 def column_selection_tab():
@@ -36,14 +47,8 @@ def column_selection_tab():
     # Procesar archivo
     if uploaded_file is not None:
         try:
-            # Leer archivo
-            df = None
-            file_ext = os.path.splitext(uploaded_file.name)[1].lower()
-            
-            if file_ext in ['.xlsx', '.xls']:
-                df = pd.read_excel(uploaded_file)
-            elif file_ext == '.csv':
-                df = pd.read_csv(uploaded_file)
+            # Leer archivo (solo se vuelve a parsear si cambia su contenido)
+            df = parse_upload(uploaded_file, "column_select_upload", _read_table)
             
             if df is not None and not df.empty:
                 # Guardar DataFrame original en estado de sesión
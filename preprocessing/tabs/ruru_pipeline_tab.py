@@ -0,0 +1,127 @@
+"""
+Pestaña para ejecutar el pipeline completo de preprocesamiento de Rurus.
+
+Este módulo permite pasar de un export crudo del formulario a un archivo de
+Rurus listo para el match en un solo paso, encadenando Estandarización,
+Transformación, Filtrado y Validación (ver preprocessing.data.pipeline).
+"""
+
+import streamlit as st
+import pandas as pd
+
+# Importamos componentes de UI
+from ..ui.file_uploaders import upload_excel_file, show_download_buttons
+from ..ui.displays import preview_dataframe
+
+# Importamos el pipeline
+from ..data.pipeline import (
+    DEFAULT_RURU_PIPELINE,
+    STAGE_LABELS,
+    build_ruru_pipeline,
+    run_pipeline
+)
+
+# Importamos utilidades
+from ..utils.temp_storage import save_data
+
+
+def ruru_pipeline_tab():
+    """
+    Tab para ejecutar el pipeline de Rurus de principio a fin.
+    """
+    st.header("Pipeline Completo de Rurus")
+    st.write("""
+    Esta sección ejecuta de una vez la estandarización de columnas, la transformación
+    (área, horarios, grados, idiomas), el filtrado opcional por área y la validación de DNIs.
+    Si vuelves a ejecutar tras cambiar una opción, solo se recalculan las etapas afectadas.
+    """)
+
+    # Paso 1: Cargar export crudo
+    st.subheader("Paso 1: Cargar export del formulario")
+    raw_df, raw_file_name, success = upload_excel_file(
+        key="ruru_pipeline_upload",
+        label="Cargar export crudo de Rurus (Excel o CSV)",
+        help_text="Archivo tal como se descarga del formulario de inscripción"
+    )
+
+    if not (success and raw_df is not None):
+        st.info("👆 Carga el export del formulario de Rurus para comenzar.")
+        return
+
+    # Paso 2: Configurar etapas
+    st.subheader("Paso 2: Configurar etapas")
+    selected_stages = []
+    for step in DEFAULT_RURU_PIPELINE:
+        stage_name = step["stage"]
+        if st.checkbox(STAGE_LABELS[stage_name], value=True, key=f"pipeline_check_{stage_name}"):
+            selected_stages.append(stage_name)
+
+    area_options = ["Todas las áreas", "Asesoría a Colegios Nacionales", "Arte & Cultura", "Bienestar Psicológico"]
+    selected_area = st.selectbox("Filtrar resultado por área:", area_options, key="pipeline_area")
+
+    use_cache = st.checkbox("Reutilizar resultados de etapas sin cambios", value=True, key="pipeline_use_cache")
+
+    # Paso 3: Ejecutar
+    st.subheader("Paso 3: Ejecutar pipeline")
+    if st.button("Ejecutar pipeline", key="run_ruru_pipeline", disabled=not selected_stages):
+        steps = build_ruru_pipeline(selected_stages, selected_area)
+        progress_bar = st.progress(0)
+
+        def _update_progress(index, total, stage_name):
+            progress_bar.progress(index / total if total else 1.0)
+
+        try:
+            with st.spinner("Ejecutando pipeline..."):
+                result_df, report = run_pipeline(raw_df, steps, use_cache=use_cache, progress_callback=_update_progress)
+        except Exception as e:
+            progress_bar.empty()
+            st.error(f"❌ Error al ejecutar el pipeline: {str(e)}")
+            return
+        progress_bar.empty()
+
+        # Guardar resultado para los demás tabs y la sesión
+        save_data(result_df, "ruru_transformed_df")
+        st.session_state.ruru_pipeline_result = result_df
+        st.session_state.ruru_pipeline_report = report
+        st.success(f"✅ Pipeline completado. {len(result_df)} Rurus listos para el match.")
+
+    result_df = st.session_state.get("ruru_pipeline_result")
+    report = st.session_state.get("ruru_pipeline_report")
+    if result_df is None:
+        return
+
+    # Reporte por etapa
+    st.subheader("Resultado por etapa")
+    st.dataframe(pd.DataFrame([
+        {
+            "Etapa": STAGE_LABELS.get(entry['stage'], entry['stage']),
+            "Filas": entry['rows'],
+            "Origen": "Caché" if entry['cached'] else "Calculado",
+            "Tiempo (s)": entry['seconds'],
+        }
+        for entry in report
+    ]))
+
+    for entry in report:
+        for warning in entry['info'].get('warnings', []):
+            st.warning(warning)
+        if entry['stage'] == "validacion" and entry['info'].get('invalid_records'):
+            st.warning(f"⚠️ {entry['info']['invalid_records']} DNIs no tienen un formato válido. Revísalos en el tab 'Validación DNI/Correo'.")
+
+    preview_dataframe(
+        result_df,
+        rows=10,
+        title="Vista previa de Rurus transformados",
+        expanded=True,
+        key="preview_pipeline"
+    )
+
+    base_filename = "rurus_transformados"
+    if raw_file_name:
+        base_filename = f"{raw_file_name.split('.')[0]}_transformado"
+    show_download_buttons(result_df, base_filename)
+
+
+if __name__ == "__main__":
+    # Esto permite probar el tab individualmente
+    ruru_pipeline_tab()
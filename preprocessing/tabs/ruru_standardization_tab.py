@@ -17,6 +17,9 @@ from ..ui.displays import preview_dataframe, show_column_statistics
 from ..utils.file_io import save_temp_file
 from ..utils.temp_storage import save_data, load_data
 
+# Transformaciones de datos (sin interfaz)
+from ..data.ruru_transform import RURU_COLUMN_MAPPING, standardize_ruru_columns
+
 
 def ruru_standardization_tab():
     """
@@ -56,51 +59,8 @@ def ruru_standardization_tab():
         # Paso 2: Estandarizar columnas
         st.subheader("Paso 2: Estandarizar columnas")
         
-        # Definir mapeo de columnas
-        # El mapeo tiene el formato {"columna_original": "columna_nueva"}
-        # Añadimos la columna F para el ID del estudiante
-        column_mapping = {
-            "F": "ID del estudiante:",
-            "H": "nombre",
-            "I": "apellido",
-            "J": "DNI",
-            "K": "colegio",
-            "L": "Grado del estudiante:",
-            "R": "idiomas",
-            "AA": "nombre_apoderado",
-            "AB": "apellido_apoderado",
-            "AD": "celular",
-            "BD": "arte_y_cultura",
-            "BE": "bienestar_psicologico",
-            "BF": "asesoria_a_colegios_nacionales",
-            "BM": "taller_opcion1",
-            "BN": "taller_opcion2",
-            "BO": "taller_opcion3",
-            "BP": "asignatura_opcion1",
-            "BQ": "asignatura_opcion2",
-            "BY": "celular_asesoria",
-            "CH": "lunes_mañana",
-            "CI": "lunes_tarde",
-            "CJ": "lunes_noche",
-            "CL": "martes_mañana",
-            "CM": "martes_tarde",
-            "CN": "martes_noche",
-            "CP": "miercoles_mañana",
-            "CQ": "miercoles_tarde",
-            "CR": "miercoles_noche",
-            "CT": "jueves_mañana",
-            "CU": "jueves_tarde",
-            "CV": "jueves_noche",
-            "CX": "viernes_mañana",
-            "CY": "viernes_tarde",
-            "CZ": "viernes_noche",
-            "DB": "sabado_mañana",
-            "DC": "sabado_tarde",
-            "DD": "sabado_noche",
-            "DF": "domingo_mañana",
-            "DG": "domingo_tarde",
-            "DH": "domingo_noche",
-        }
+        # Mapeo de columnas predefinido (ver RURU_COLUMN_MAPPING)
+        column_mapping = RURU_COLUMN_MAPPING
         
         # Mostrar mapeo de columnas
         with st.expander("Ver mapeo de columnas", expanded=False):
@@ -130,7 +90,11 @@ def ruru_standardization_tab():
         # Botón para aplicar estandarización
         if st.button("Estandarizar columnas", key="standardize_columns_button"):
             # Procesar el DataFrame: renombrar columnas y eliminar no mencionadas
-            processed_df = standardize_ruru_columns(ruru_df, column_mapping)
+            try:
+                processed_df = standardize_ruru_columns(ruru_df, column_mapping)
+            except ValueError as e:
+                st.error(str(e))
+                processed_df = None
             
             # Guardar el DataFrame procesado en el estado de sesión
             save_data(processed_df, "ruru_standardized_df")
@@ -201,59 +165,6 @@ def ruru_standardization_tab():
         st.info("👆 Carga un archivo de Rurus para comenzar el proceso de estandarización.")
 
 
-def standardize_ruru_columns(df: pd.DataFrame, column_mapping: Dict[str, str]) -> pd.DataFrame:
-    """
-    Estandariza las columnas de un DataFrame de Rurus según un mapeo.
-    
-    Args:
-        df: DataFrame original
-        column_mapping: Mapeo de columnas originales a nuevos nombres
-    
-    Returns:
-        DataFrame con columnas estandarizadas
-    """
-    if df is None or df.empty:
-        return None
-    
-    try:
-        # Crear una copia del DataFrame para no modificar el original
-        processed_df = df.copy()
-        
-        # Lista para almacenar las columnas que vamos a conservar
-        columns_to_keep = []
-        
-        # Diccionario para mapear índices a nuevos nombres
-        index_to_name = {}
-        
-        # Primero, procesamos el mapeo para convertir letras a índices
-        for col_orig, col_new in column_mapping.items():
-            if col_orig.isalpha():
-                # Convertir letras de Excel (A, B, C..., AA, AB...) a índice (0, 1, 2...)
-                col_idx = sum((ord(c.upper()) - ord('A') + 1) * 26**i for i, c in enumerate(reversed(col_orig))) - 1
-                
-                # Verificar que el índice está dentro del rango
-                if col_idx < len(processed_df.columns):
-                    index_to_name[col_idx] = col_new
-            else:
-                # Si no es letra, asumir que es nombre de columna
-                if col_orig in processed_df.columns:
-                    index_to_name[list(processed_df.columns).index(col_orig)] = col_new
-        
-        # Crear un nuevo DataFrame con solo las columnas seleccionadas
-        new_df = pd.DataFrame()
-        
-        # Añadir columnas al nuevo DataFrame con los nombres nuevos
-        for idx, new_name in index_to_name.items():
-            if idx < len(processed_df.columns):
-                new_df[new_name] = processed_df.iloc[:, idx]
-        
-        return new_df
-    
-    except Exception as e:
-        st.error(f"Error al estandarizar columnas: {str(e)}")
-        return None
-
-
 if __name__ == "__main__":
     # Esto permite probar el tab individualmente
     ruru_standardization_tab() 
\ No newline at end of file
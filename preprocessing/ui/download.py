@@ -4,10 +4,19 @@ Componentes de UI para descarga de archivos.
 Contiene widgets reutilizables para descargar archivos procesados.
 """
 
+import os
 import streamlit as st
 import pandas as pd
 import io
 
+from shared.digest import dataframe_digest
+from ..utils.file_io import (
+    DOWNLOAD_MIME_TYPES,
+    get_cached_download,
+    get_download_payload
+)
+from ..utils.temp_storage import read_stored_file
+
 
 def get_excel_download_link(df, filename="datos_procesados"):
     """
@@ -23,14 +32,8 @@ def get_excel_download_link(df, filename="datos_procesados"):
     if df is None or df.empty:
         return None
         
-    # Convertir a Excel en memoria
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Datos')
-    
-    # Obtener bytes
-    excel_data = output.getvalue()
-    return excel_data
+    # Convertir a Excel (memorizado por contenido del DataFrame)
+    return get_download_payload(df, 'excel')
 
 
 def get_csv_download_link(df, filename="datos_procesados"):
@@ -47,14 +50,114 @@ def get_csv_download_link(df, filename="datos_procesados"):
     if df is None or df.empty:
         return None
         
-    # Convertir a CSV
-    return df.to_csv(index=False).encode('utf-8')
+    # Convertir a CSV (memorizado por contenido del DataFrame)
+    return get_download_payload(df, 'csv')
+
+
+@st.fragment
+def lazy_download_button(
+    df: pd.DataFrame,
+    file_format: str,
+    file_name: str,
+    label: str,
+    key: str,
+    digest: str = None,
+    lazy: bool = True
+) -> None:
+    """
+    Muestra un botón de descarga cuyo archivo se genera solo cuando se pide.
+    
+    Con lazy=True se muestra primero un botón "Preparar"; el archivo se
+    genera al pulsarlo y queda memorizado para los siguientes reruns. Al ser
+    un fragmento, pulsar "Preparar" solo vuelve a ejecutar este botón y no
+    el resto de la página.
+    
+    Args:
+        df: DataFrame a descargar
+        file_format: 'excel' o 'csv'
+        file_name: Nombre del archivo con extensión
+        label: Etiqueta del botón de descarga
+        key: Clave única para los widgets
+        digest: Huella ya calculada del DataFrame (opcional)
+        lazy: Si es False, el archivo se genera (una sola vez) al mostrar el botón
+    """
+    if digest is None:
+        digest = dataframe_digest(df)
+    
+    payload = get_cached_download(digest, file_format)
+    if payload is None:
+        if lazy and not st.button(f"⚙️ Preparar {label.replace('📥', '').strip()}", key=f"prepare_{key}"):
+            return
+        with st.spinner("Generando archivo..."):
+            payload = get_download_payload(df, file_format, digest)
+        if payload is None:
+            return  # El error ya se mostró; no hay archivo que descargar
+    
+    st.download_button(
+        label=label,
+        data=payload,
+        file_name=file_name,
+        mime=DOWNLOAD_MIME_TYPES[file_format],
+        key=f"download_{key}",
+        on_click="ignore"
+    )
+
+
+@st.fragment
+def lazy_file_download_button(
+    file_path: str,
+    file_name: str,
+    label: str,
+    mime: str,
+    key: str,
+    expired_message: str = "El archivo expiró del almacenamiento temporal."
+) -> None:
+    """
+    Muestra un botón de descarga para un archivo del almacén temporal que se
+    lee del disco solo cuando el usuario lo pide.
+    
+    st.download_button siempre recibe el contenido completo en memoria (no
+    puede transmitir desde el disco), así que el archivo se lee solo al
+    pulsar "Preparar" y únicamente dentro de este fragmento: los demás
+    reruns de la página no vuelven a cargarlo.
+    
+    Args:
+        file_path: Ruta del archivo guardada en la sesión
+        file_name: Nombre del archivo descargado
+        label: Etiqueta del botón de descarga
+        mime: Tipo MIME del archivo
+        key: Clave única para los widgets
+        expired_message: Aviso si el archivo ya no está en el almacén
+    """
+    if not os.path.isfile(file_path):
+        st.warning(expired_message)
+        return
+    
+    if not st.button(f"⚙️ Preparar {label.replace('📥', '').strip()}", key=f"prepare_{key}"):
+        return
+    
+    payload = read_stored_file(file_path)
+    if payload is None:
+        st.warning(expired_message)
+        return
+    
+    st.download_button(
+        label=label,
+        data=payload,
+        file_name=file_name,
+        mime=mime,
+        key=f"download_{key}",
+        on_click="ignore"
+    )
 
 
 def download_buttons(df, filename_prefix="datos"):
     """
     Muestra botones para descargar un DataFrame en diferentes formatos.
     
+    El Excel se genera solo si el usuario lo pide; el CSV, que es barato,
+    se genera al mostrar el botón. Ambos se memorizan por contenido.
+    
     Args:
         df (pd.DataFrame): DataFrame a descargar
         filename_prefix (str): Prefijo para el nombre del archivo
@@ -65,26 +168,19 @@ def download_buttons(df, filename_prefix="datos"):
     
     st.write("### Descargar datos")
     
+    digest = dataframe_digest(df)
     col1, col2 = st.columns(2)
     
     with col1:
         # Botón para Excel
-        excel_data = get_excel_download_link(df, filename_prefix)
-        st.download_button(
-            label="📥 Descargar Excel",
-            data=excel_data,
-            file_name=f"{filename_prefix}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            key=f"download_excel_{filename_prefix}"
+        lazy_download_button(
+            df, 'excel', f"{filename_prefix}.xlsx", "📥 Descargar Excel",
+            key=f"excel_{filename_prefix}", digest=digest
         )
     
     with col2:
         # Botón para CSV
-        csv_data = get_csv_download_link(df, filename_prefix)
-        st.download_button(
-            label="📥 Descargar CSV",
-            data=csv_data,
-            file_name=f"{filename_prefix}.csv",
-            mime="text/csv",
-            key=f"download_csv_{filename_prefix}"
-        ) 
\ No newline at end of file
+        lazy_download_button(
+            df, 'csv', f"{filename_prefix}.csv", "📥 Descargar CSV",
+            key=f"csv_{filename_prefix}", digest=digest, lazy=False
+        )
@@ -8,6 +8,7 @@ import streamlit as st
 from typing import Tuple, Optional, Any, List
 import pandas as pd
 from ..utils.file_io import read_file
+from shared.upload_cache import parse_upload
 
 
 def upload_excel_file(
@@ -42,8 +43,8 @@ def upload_excel_file(
         )
         
         if uploaded_file is not None:
-            # Leer el archivo
-            df, file_type, error = read_file(uploaded_file)
+            # Leer el archivo (solo se vuelve a parsear si cambia su contenido)
+            df, file_type, error = parse_upload(uploaded_file, key, read_file)
             
             if error:
                 st.error(f"Error: {error}")
@@ -59,7 +60,8 @@ def upload_excel_file(
                 with st.expander("Vista previa del archivo", expanded=True):
                     st.dataframe(df.head(5))
                 
-                return df, uploaded_file.name, True
+                # Copia para que los cambios del llamador no alteren el resultado guardado
+                return df.copy(), uploaded_file.name, True
         
         return None, None, False
 
@@ -79,7 +81,8 @@ def show_download_buttons(
         excel_label: Etiqueta para el botón de Excel
         csv_label: Etiqueta para el botón de CSV
     """
-    from ..utils.file_io import save_excel, save_csv
+    from .download import lazy_download_button
+    from shared.digest import dataframe_digest
     from datetime import datetime
     
     if df is None or df.empty:
@@ -90,27 +93,22 @@ def show_download_buttons(
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"{base_filename}_{timestamp}"
     
+    # La huella identifica el contenido: los archivos se generan una sola vez
+    digest = dataframe_digest(df)
+    
     # Crear columnas para los botones
     col1, col2 = st.columns(2)
     
-    # Botón para Excel
+    # Botón para Excel (se genera solo al pedirlo)
     with col1:
-        success, excel_data, excel_filename = save_excel(df, filename)
-        if success:
-            st.download_button(
-                label=excel_label,
-                data=excel_data,
-                file_name=excel_filename,
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+        lazy_download_button(
+            df, 'excel', f"{filename}.xlsx", excel_label,
+            key=f"excel_{base_filename}_{digest[:12]}", digest=digest
+        )
     
-    # Botón para CSV
+    # Botón para CSV (barato: se genera al mostrarlo, una vez por contenido)
     with col2:
-        success, csv_data, csv_filename = save_csv(df, filename)
-        if success:
-            st.download_button(
-                label=csv_label,
-                data=csv_data,
-                file_name=csv_filename,
-                mime="text/csv"
-            ) 
\ No newline at end of file
+        lazy_download_button(
+            df, 'csv', f"{filename}.csv", csv_label,
+            key=f"csv_{base_filename}_{digest[:12]}", digest=digest, lazy=False
+        )
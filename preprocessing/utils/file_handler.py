@@ -6,22 +6,23 @@ Funciones para guardar y cargar archivos temporales durante el procesamiento.
 
 import os
 import pandas as pd
-import tempfile
 import uuid
 from datetime import datetime
 
+from .temp_storage import get_temp_dir as get_session_temp_dir, write_atomic
+
 
 def get_temp_dir():
     """
     Obtiene el directorio temporal para archivos de la aplicación.
     
+    Usa el almacén temporal compartido (ver temp_storage), por lo que el
+    directorio es propio de la sesión actual.
+    
     Returns:
         str: Ruta al directorio temporal
     """
-    # Crear directorio temporal para la aplicación si no existe
-    temp_dir = os.path.join(tempfile.gettempdir(), "yachay-match")
-    os.makedirs(temp_dir, exist_ok=True)
-    return temp_dir
+    return get_session_temp_dir()
 
 
 def get_temp_file_path(prefix="data", extension="xlsx"):
@@ -63,11 +64,11 @@ def save_dataframe(df, prefix="data", extension="xlsx"):
         # Generar ruta del archivo
         file_path = get_temp_file_path(prefix, extension)
         
-        # Guardar según formato
+        # Guardar según formato (escritura atómica en el almacén temporal)
         if extension.lower() == 'xlsx':
-            df.to_excel(file_path, index=False)
+            write_atomic(file_path, lambda path: df.to_excel(path, index=False))
         elif extension.lower() == 'csv':
-            df.to_csv(file_path, index=False)
+            write_atomic(file_path, lambda path: df.to_csv(path, index=False))
         else:
             return None
         
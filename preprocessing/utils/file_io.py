@@ -10,9 +10,22 @@ import pandas as pd
 import streamlit as st
 from typing import Union, Optional, Tuple, Dict, List, Any
 import io
-import tempfile
+from collections import OrderedDict
 from datetime import datetime
 
+from shared.digest import dataframe_digest
+from shared.excel_writer import write_sheets_streaming
+from .temp_storage import get_temp_path, write_atomic, touch
+
+# Número máximo de archivos de descarga memorizados por sesión
+DOWNLOAD_CACHE_MAX_ENTRIES = 8
+
+# Tipos MIME por formato de descarga
+DOWNLOAD_MIME_TYPES = {
+    'excel': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    'csv': "text/csv",
+}
+
 
 def detect_file_type(file_name: str) -> str:
     """
@@ -62,22 +75,36 @@ def read_file(uploaded_file: Any) -> Tuple[pd.DataFrame, str, Optional[str]]:
         return None, None, f"Error al leer el archivo: {str(e)}"
 
 
-def save_excel(df: pd.DataFrame, file_name: Optional[str] = None) -> Tuple[bool, bytes, str]:
+def save_excel(
+    df: pd.DataFrame,
+    file_name: Optional[str] = None,
+    streaming: bool = False
+) -> Tuple[bool, Union[bytes, str], str]:
     """
     Guarda un DataFrame como archivo Excel y devuelve los bytes para descarga.
     
+    Con streaming=True el archivo se escribe en el almacén temporal con
+    memoria constante y se devuelve su ruta en lugar de los bytes; la
+    descarga puede leerse directamente de esa ruta.
+    
     Args:
         df: DataFrame a guardar
         file_name: Nombre base del archivo (sin extensión)
+        streaming: Si se debe escribir en disco y devolver la ruta
         
     Returns:
-        Tupla con (éxito, bytes_del_archivo, nombre_archivo)
+        Tupla con (éxito, bytes_del_archivo o ruta, nombre_archivo)
     """
     try:
         if file_name is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             file_name = f"datos_procesados_{timestamp}"
         
+        if streaming:
+            file_path = get_temp_path(f"{file_name}.xlsx")
+            write_atomic(file_path, lambda path: write_sheets_streaming({'Datos': df}, path))
+            return True, file_path, f"{file_name}.xlsx"
+        
         output = io.BytesIO()
         with pd.ExcelWriter(output, engine='openpyxl') as writer:
             df.to_excel(writer, index=False, sheet_name='Datos')
@@ -123,15 +150,11 @@ def save_temp_file(df: pd.DataFrame, file_name: str) -> str:
         Ruta al archivo temporal guardado
     """
     try:
-        # Crear directorio temporal si no existe
-        temp_dir = os.path.join(tempfile.gettempdir(), 'match_yaku_ruru')
-        os.makedirs(temp_dir, exist_ok=True)
+        # Ruta dentro del directorio de la sesión en el almacén temporal
+        file_path = get_temp_path(f"{file_name}.pkl")
         
-        # Crear ruta completa
-        file_path = os.path.join(temp_dir, f"{file_name}.pkl")
-        
-        # Guardar DataFrame
-        df.to_pickle(file_path)
+        # Guardar DataFrame (escritura atómica, con límite de tamaño del almacén)
+        write_atomic(file_path, df.to_pickle)
         
         return file_path
     except Exception as e:
@@ -150,9 +173,8 @@ def load_temp_file(file_name: str) -> Optional[pd.DataFrame]:
         DataFrame cargado o None si hay error
     """
     try:
-        # Obtener ruta completa
-        temp_dir = os.path.join(tempfile.gettempdir(), 'match_yaku_ruru')
-        file_path = os.path.join(temp_dir, f"{file_name}.pkl")
+        # Obtener ruta completa dentro de la sesión
+        file_path = get_temp_path(f"{file_name}.pkl")
         
         # Verificar si existe
         if not os.path.exists(file_path):
@@ -160,7 +182,91 @@ def load_temp_file(file_name: str) -> Optional[pd.DataFrame]:
         
         # Cargar DataFrame
         df = pd.read_pickle(file_path)
+        touch(file_path)
         return df
+    except FileNotFoundError:
+        return None
     except Exception as e:
         st.error(f"Error al cargar archivo temporal: {str(e)}")
-        return None 
\ No newline at end of file
+        return None
+
+
+def dataframe_to_bytes(df: pd.DataFrame, file_format: str) -> Optional[bytes]:
+    """
+    Serializa un DataFrame al formato de descarga indicado.
+    
+    Args:
+        df: DataFrame a serializar
+        file_format: 'excel' (hoja 'Datos', openpyxl) o 'csv' (UTF-8)
+        
+    Returns:
+        Bytes del archivo, o None si no se pudo generar (el error se muestra con st.error)
+    """
+    if file_format not in DOWNLOAD_MIME_TYPES:
+        raise ValueError(f"Formato de descarga no soportado: {file_format}")
+    try:
+        if file_format == 'excel':
+            output = io.BytesIO()
+            with pd.ExcelWriter(output, engine='openpyxl') as writer:
+                df.to_excel(writer, index=False, sheet_name='Datos')
+            return output.getvalue()
+        return df.to_csv(index=False).encode('utf-8')
+    except Exception as e:
+        # Por ejemplo, openpyxl rechaza celdas con caracteres de control
+        format_label = 'Excel' if file_format == 'excel' else 'CSV'
+        st.error(f"Error al guardar el archivo {format_label}: {str(e)}")
+        return None
+
+
+def _download_cache() -> "OrderedDict[Tuple[str, str], bytes]":
+    """Obtiene el caché de archivos de descarga de la sesión actual."""
+    if '_download_payloads' not in st.session_state:
+        st.session_state._download_payloads = OrderedDict()
+    return st.session_state._download_payloads
+
+
+def get_cached_download(digest: str, file_format: str) -> Optional[bytes]:
+    """
+    Obtiene un archivo de descarga ya generado, si existe.
+    
+    Args:
+        digest: Huella del DataFrame (ver shared.digest.dataframe_digest)
+        file_format: 'excel' o 'csv'
+        
+    Returns:
+        Bytes del archivo o None si aún no se generó
+    """
+    cache = _download_cache()
+    payload = cache.get((digest, file_format))
+    if payload is not None:
+        cache.move_to_end((digest, file_format))
+    return payload
+
+
+def get_download_payload(df: pd.DataFrame, file_format: str, digest: Optional[str] = None) -> Optional[bytes]:
+    """
+    Obtiene los bytes de descarga de un DataFrame, generándolos solo una vez.
+    
+    Los archivos se memorizan por huella del DataFrame y formato, de modo que
+    los reruns de Streamlit no vuelven a serializar datos que no cambiaron.
+    
+    Args:
+        df: DataFrame a descargar
+        file_format: 'excel' o 'csv'
+        digest: Huella ya calculada del DataFrame (opcional)
+        
+    Returns:
+        Bytes del archivo, o None si no se pudo generar (no se memoriza)
+    """
+    if digest is None:
+        digest = dataframe_digest(df)
+    payload = get_cached_download(digest, file_format)
+    if payload is None:
+        payload = dataframe_to_bytes(df, file_format)
+        if payload is None:
+            return None
+        cache = _download_cache()
+        cache[(digest, file_format)] = payload
+        while len(cache) > DOWNLOAD_CACHE_MAX_ENTRIES:
+            cache.popitem(last=False)
+    return payload
@@ -3,29 +3,336 @@ Funciones para el almacenamiento temporal de datos entre tabs.
 
 Este módulo proporciona funciones para guardar y recuperar datos temporales
 que deben ser compartidos entre diferentes tabs o sesiones.
+
+Todos los archivos temporales de la aplicación viven en un único directorio
+(`match_yaku_ruru`) con un subdirectorio por sesión de Streamlit, de modo que
+varios coordinadores pueden trabajar en el mismo servidor sin pisarse los datos.
+Las escrituras son atómicas y el tamaño total del almacén está acotado: al
+superar el límite se eliminan primero los archivos vencidos (TTL) y luego los
+usados hace más tiempo (LRU). Las cachés compartidas entre sesiones (por
+ejemplo, la de tarjetas) viven aparte, en `_shared`, con su propio límite.
 """
 
 import os
 import pandas as pd
 import streamlit as st
 import pickle
+import re
 import tempfile
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Any, Optional, Dict, List, Tuple
+from typing import Any, Optional, Dict, Iterable, Iterator, List, Set, Tuple
+
+# --- Configuración del almacén (ajustable por variables de entorno) ---
+TEMP_STORAGE_DIRNAME = "match_yaku_ruru"
+TEMP_STORAGE_MAX_BYTES = int(os.getenv("TEMP_STORAGE_MAX_MB", 512)) * 1024 * 1024
+TEMP_STORAGE_TTL_SECONDS = int(os.getenv("TEMP_STORAGE_TTL_HOURS", 24)) * 3600
+
+# Sesión usada cuando no hay un contexto de Streamlit (scripts, ejecución headless)
+LOCAL_SESSION_ID = "local"
+
+# Prefijo de los archivos parciales que aún se están escribiendo
+_PARTIAL_PREFIX = ".tmp-"
 
+# Directorio de las cachés compartidas entre sesiones; cada caché tiene su
+# propio límite de tamaño y queda fuera del límite del almacén de sesiones
+SHARED_CACHE_DIRNAME = "_shared"
 
-def get_temp_dir() -> str:
+_eviction_lock = threading.Lock()
+
+
+def _get_session_id() -> str:
     """
-    Obtiene el directorio temporal para guardar archivos, creándolo si no existe.
-    
+    Obtiene el identificador de la sesión de Streamlit actual.
+
+    Returns:
+        ID de la sesión o LOCAL_SESSION_ID si no hay contexto de Streamlit
+    """
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except Exception:
+        ctx = None
+    if ctx is None:
+        return LOCAL_SESSION_ID
+    return ctx.session_id
+
+
+def _safe_name(name: str) -> str:
+    """Convierte una clave en un nombre de archivo seguro."""
+    return re.sub(r'[^\w.\-]', '_', str(name))
+
+
+def get_base_temp_dir() -> str:
+    """
+    Obtiene el directorio raíz del almacén temporal, creándolo si no existe.
+
     Returns:
-        Ruta al directorio temporal
+        Ruta al directorio raíz compartido por todas las sesiones
+    """
+    base_dir = os.path.join(tempfile.gettempdir(), TEMP_STORAGE_DIRNAME)
+    os.makedirs(base_dir, exist_ok=True)
+    return base_dir
+
+
+def get_temp_dir(session_id: Optional[str] = None) -> str:
     """
-    temp_dir = os.path.join(tempfile.gettempdir(), 'match_yaku_ruru')
+    Obtiene el directorio temporal de la sesión actual, creándolo si no existe.
+
+    Args:
+        session_id: ID de sesión explícito (por defecto, la sesión de Streamlit actual)
+
+    Returns:
+        Ruta al directorio temporal de la sesión
+    """
+    if session_id is None:
+        session_id = _get_session_id()
+    temp_dir = os.path.join(get_base_temp_dir(), _safe_name(session_id))
     os.makedirs(temp_dir, exist_ok=True)
     return temp_dir
 
 
+def get_temp_path(file_name: str, session_id: Optional[str] = None) -> str:
+    """
+    Obtiene la ruta de un archivo dentro del directorio de la sesión.
+
+    Args:
+        file_name: Nombre del archivo (con extensión)
+        session_id: ID de sesión explícito (por defecto, la sesión actual)
+
+    Returns:
+        Ruta completa al archivo
+    """
+    return os.path.join(get_temp_dir(session_id), _safe_name(file_name))
+
+
+def get_shared_dir(namespace: str) -> str:
+    """
+    Obtiene el directorio de una caché compartida por todas las sesiones.
+
+    Sus archivos sobreviven a la recarga del navegador y no cuentan para
+    TEMP_STORAGE_MAX_BYTES; su tamaño se acota con enforce_shared_limits.
+
+    Args:
+        namespace: Nombre de la caché (p. ej. 'cards')
+
+    Returns:
+        Ruta al directorio de la caché
+    """
+    shared_dir = os.path.join(get_base_temp_dir(), SHARED_CACHE_DIRNAME, _safe_name(namespace))
+    os.makedirs(shared_dir, exist_ok=True)
+    return shared_dir
+
+
+@contextmanager
+def atomic_path(file_path: str, enforce: bool = True) -> Iterator[str]:
+    """
+    Entrega una ruta parcial donde escribir un archivo de forma atómica.
+
+    Al salir del bloque sin errores, el archivo parcial se renombra a
+    file_path y se aplica la política de evicción; si hay un error, se elimina.
+
+    Args:
+        file_path: Ruta final del archivo
+        enforce: Si es False no se aplica la evicción (quien escribe un lote
+            la aplica una sola vez al final)
+
+    Yields:
+        Ruta del archivo parcial (en el mismo directorio y con la misma extensión)
+    """
+    directory, file_name = os.path.split(file_path)
+    # Conservar la extensión: pandas la usa para elegir motor/compresión
+    suffix = os.path.splitext(file_name)[1]
+    fd, partial_path = tempfile.mkstemp(prefix=_PARTIAL_PREFIX, suffix=suffix, dir=directory)
+    os.close(fd)
+    try:
+        yield partial_path
+        os.replace(partial_path, file_path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    if enforce:
+        enforce_limits(keep=file_path)
+
+
+def write_atomic(file_path: str, writer, enforce: bool = True) -> None:
+    """
+    Escribe un archivo de forma atómica y aplica la política de evicción.
+
+    El contenido se escribe primero en un archivo parcial del mismo directorio
+    y luego se renombra, para que un lector nunca vea un archivo a medias.
+
+    Args:
+        file_path: Ruta final del archivo
+        writer: Función que recibe la ruta del archivo parcial y lo escribe
+        enforce: Si es False no se aplica la evicción (ver atomic_path)
+    """
+    with atomic_path(file_path, enforce=enforce) as partial_path:
+        writer(partial_path)
+
+
+def read_stored_file(file_path: Optional[str]) -> Optional[bytes]:
+    """
+    Lee completo un archivo del almacén cuya ruta se guardó en la sesión.
+
+    Args:
+        file_path: Ruta del archivo (o None)
+
+    Returns:
+        Contenido del archivo, o None si no existe (por ejemplo, si la
+        política de evicción lo eliminó)
+    """
+    if not file_path:
+        return None
+    try:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    touch(file_path)
+    return data
+
+
+def touch(file_path: str) -> None:
+    """Marca un archivo como usado recientemente (para la política LRU)."""
+    try:
+        os.utime(file_path, None)
+    except OSError:
+        pass
+
+
+def _iter_store_files() -> List[Tuple[str, float, int]]:
+    """
+    Lista todos los archivos del almacén (de todas las sesiones), sin las
+    cachés compartidas.
+
+    Returns:
+        Lista de tuplas (ruta, última_modificación, tamaño_en_bytes)
+    """
+    base_dir = get_base_temp_dir()
+    entries = []
+    for root, dirs, files in os.walk(base_dir):
+        if root == base_dir and SHARED_CACHE_DIRNAME in dirs:
+            dirs.remove(SHARED_CACHE_DIRNAME)
+        for filename in files:
+            file_path = os.path.join(root, filename)
+            try:
+                stats = os.stat(file_path)
+            except OSError:
+                continue  # Eliminado por otra sesión mientras recorríamos
+            entries.append((file_path, stats.st_mtime, stats.st_size))
+    return entries
+
+
+def _remove_quietly(file_path: str) -> None:
+    """Elimina un archivo ignorando que ya no exista."""
+    try:
+        os.remove(file_path)
+    except OSError:
+        pass
+
+
+def _evict(entries: List[Tuple[str, float, int]], max_bytes: int, keep: Set[str]) -> int:
+    """
+    Elimina los archivos vencidos (TTL) y luego los menos usados (LRU) hasta
+    que el total quede por debajo de max_bytes.
+
+    Args:
+        entries: Tuplas (ruta, última_modificación, tamaño_en_bytes)
+        max_bytes: Tamaño máximo permitido
+        keep: Rutas que no deben eliminarse
+
+    Returns:
+        Número de archivos eliminados
+    """
+    removed = 0
+    now = time.time()
+    remaining = []
+    for file_path, mtime, size in entries:
+        if file_path not in keep and now - mtime > TEMP_STORAGE_TTL_SECONDS:
+            _remove_quietly(file_path)
+            removed += 1
+        else:
+            remaining.append((file_path, mtime, size))
+
+    total_size = sum(size for _, _, size in remaining)
+    if total_size > max_bytes:
+        # Menos usados primero; los parciales ajenos no se tocan hasta vencer
+        remaining.sort(key=lambda entry: entry[1])
+        for file_path, _, size in remaining:
+            if total_size <= max_bytes:
+                break
+            if file_path in keep or os.path.basename(file_path).startswith(_PARTIAL_PREFIX):
+                continue
+            _remove_quietly(file_path)
+            total_size -= size
+            removed += 1
+    return removed
+
+
+def enforce_limits(keep: Optional[str] = None) -> int:
+    """
+    Aplica la política de TTL y tamaño máximo sobre todo el almacén.
+
+    Primero elimina los archivos más antiguos que el TTL y, si el total sigue
+    superando TEMP_STORAGE_MAX_BYTES, elimina los menos usados recientemente.
+
+    Args:
+        keep: Ruta de un archivo que no debe eliminarse (el recién escrito)
+
+    Returns:
+        Número de archivos eliminados
+    """
+    with _eviction_lock:
+        removed = _evict(_iter_store_files(), TEMP_STORAGE_MAX_BYTES, {keep} if keep else set())
+
+        # Eliminar directorios de sesión vacíos e inactivos
+        now = time.time()
+        base_dir = get_base_temp_dir()
+        for name in os.listdir(base_dir):
+            if name == SHARED_CACHE_DIRNAME:
+                continue
+            session_dir = os.path.join(base_dir, name)
+            try:
+                if (os.path.isdir(session_dir) and not os.listdir(session_dir)
+                        and now - os.stat(session_dir).st_mtime > TEMP_STORAGE_TTL_SECONDS):
+                    os.rmdir(session_dir)
+            except OSError:
+                pass
+    return removed
+
+
+def enforce_shared_limits(namespace: str, max_bytes: int, keep: Iterable[str] = ()) -> int:
+    """
+    Aplica la política de TTL y tamaño máximo sobre una caché compartida.
+
+    Se recorre solo el directorio de la caché, así que conviene llamarla una
+    vez por lote de escrituras y no después de cada archivo.
+
+    Args:
+        namespace: Nombre de la caché (ver get_shared_dir)
+        max_bytes: Tamaño máximo de la caché
+        keep: Rutas que no deben eliminarse (las usadas en el lote actual)
+
+    Returns:
+        Número de archivos eliminados
+    """
+    entries = []
+    with _eviction_lock:
+        with os.scandir(get_shared_dir(namespace)) as scan:
+            for entry in scan:
+                try:
+                    stats = entry.stat()
+                except OSError:
+                    continue  # Eliminado por otra sesión mientras recorríamos
+                if entry.is_file():
+                    entries.append((entry.path, stats.st_mtime, stats.st_size))
+        return _evict(entries, max_bytes, set(keep))
+
+
 def save_data(data: Any, key: str) -> bool:
     """
     Guarda datos temporales para uso entre tabs o sesiones.
@@ -38,15 +345,14 @@ def save_data(data: Any, key: str) -> bool:
         True si el guardado fue exitoso, False en caso contrario
     """
     try:
-        # Obtener directorio temporal
-        temp_dir = get_temp_dir()
+        # Crear ruta completa del archivo dentro de la sesión
+        file_path = get_temp_path(f"{key}.pkl")
         
-        # Crear ruta completa del archivo
-        file_path = os.path.join(temp_dir, f"{key}.pkl")
-        
-        # Guardar datos usando pickle
-        with open(file_path, 'wb') as f:
-            pickle.dump(data, f)
+        # Guardar datos usando pickle (escritura atómica)
+        def _dump(path):
+            with open(path, 'wb') as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        write_atomic(file_path, _dump)
         
         return True
     except Exception as e:
@@ -65,11 +371,8 @@ def load_data(key: str) -> Optional[Any]:
         Datos cargados o None si no se encuentran o hay error
     """
     try:
-        # Obtener directorio temporal
-        temp_dir = get_temp_dir()
-        
-        # Crear ruta completa del archivo
-        file_path = os.path.join(temp_dir, f"{key}.pkl")
+        # Crear ruta completa del archivo dentro de la sesión
+        file_path = get_temp_path(f"{key}.pkl")
         
         # Verificar si el archivo existe
         if not os.path.exists(file_path):
@@ -79,7 +382,10 @@ def load_data(key: str) -> Optional[Any]:
         with open(file_path, 'rb') as f:
             data = pickle.load(f)
         
+        touch(file_path)
         return data
+    except FileNotFoundError:
+        return None  # Eliminado por la evicción entre la comprobación y la lectura
     except Exception as e:
         st.error(f"Error al cargar datos temporales: {str(e)}")
         return None
@@ -87,20 +393,20 @@ def load_data(key: str) -> Optional[Any]:
 
 def list_temp_files() -> List[Dict[str, Any]]:
     """
-    Lista todos los archivos temporales disponibles.
+    Lista todos los archivos temporales disponibles en la sesión actual.
     
     Returns:
         Lista de diccionarios con información de los archivos
     """
     try:
-        # Obtener directorio temporal
+        # Obtener directorio temporal de la sesión
         temp_dir = get_temp_dir()
         
         # Listar archivos
         files = []
         
         for filename in os.listdir(temp_dir):
-            if filename.endswith('.pkl'):
+            if filename.endswith('.pkl') and not filename.startswith(_PARTIAL_PREFIX):
                 file_path = os.path.join(temp_dir, filename)
                 
                 # Obtener estadísticas del archivo
@@ -142,7 +448,7 @@ def list_temp_files() -> List[Dict[str, Any]]:
 
 def delete_temp_file(key: str) -> bool:
     """
-    Elimina un archivo temporal.
+    Elimina un archivo temporal de la sesión actual.
     
     Args:
         key: Clave única que identifica el archivo
@@ -151,11 +457,8 @@ def delete_temp_file(key: str) -> bool:
         True si la eliminación fue exitosa, False en caso contrario
     """
     try:
-        # Obtener directorio temporal
-        temp_dir = get_temp_dir()
-        
-        # Crear ruta completa del archivo
-        file_path = os.path.join(temp_dir, f"{key}.pkl")
+        # Crear ruta completa del archivo dentro de la sesión
+        file_path = get_temp_path(f"{key}.pkl")
         
         # Verificar si el archivo existe
         if not os.path.exists(file_path):
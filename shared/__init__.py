@@ -13,4 +13,25 @@ from .session_state import (
     has_value,
     get_all_values,
     clear_all_values
-) 
\ No newline at end of file
+) 
+
+# Huellas de contenido para claves de caché
+from .digest import (
+    bytes_digest,
+    config_digest,
+    dataframe_digest,
+    row_fingerprints
+)
+
+# Limpieza de DNIs, celulares e IDs leídos de Excel
+from .normalization import (
+    clean_str_number,
+    clean_number_series
+)
+
+# Parseo de archivos subidos solo cuando cambia su contenido
+from .upload_cache import (
+    parse_upload,
+    upload_signature,
+    clear_upload_cache
+)
@@ -0,0 +1,67 @@
+"""
+Escritura de archivos ZIP directamente en disco.
+
+Las entradas se escriben en el archivo a medida que se agregan, de modo que
+un ZIP con cientos de tarjetas no se mantiene en memoria. Los formatos que ya
+vienen comprimidos (PDF, DOCX, XLSX, imágenes) se guardan sin volver a
+comprimir: no reduce su tamaño y solo cuesta tiempo.
+"""
+
+import os
+import zipfile
+from typing import Optional
+
+# Extensiones que se almacenan sin compresión
+COMPRESSED_EXTENSIONS = {'.pdf', '.docx', '.xlsx', '.zip', '.png', '.jpg', '.jpeg'}
+
+
+class ZipArtifactWriter:
+    """
+    ZIP escrito en disco entrada por entrada.
+
+    Uso:
+        with ZipArtifactWriter(ruta) as zip_writer:
+            zip_writer.add_file(ruta_pdf, "CC123.pdf")
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.entries = 0
+        self._zip: Optional[zipfile.ZipFile] = None
+
+    def __enter__(self) -> "ZipArtifactWriter":
+        self._zip = zipfile.ZipFile(self.file_path, 'w', zipfile.ZIP_DEFLATED)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._zip.close()
+        self._zip = None
+
+    @staticmethod
+    def _compress_type(arcname: str) -> int:
+        """Método de compresión según la extensión del archivo."""
+        if os.path.splitext(arcname)[1].lower() in COMPRESSED_EXTENSIONS:
+            return zipfile.ZIP_STORED
+        return zipfile.ZIP_DEFLATED
+
+    def add_file(self, source_path: str, arcname: str) -> None:
+        """
+        Agrega un archivo del disco al ZIP.
+
+        Args:
+            source_path: Ruta del archivo a agregar
+            arcname: Nombre dentro del ZIP
+        """
+        self._zip.write(source_path, arcname, compress_type=self._compress_type(arcname))
+        self.entries += 1
+
+    def add_bytes(self, data: bytes, arcname: str) -> None:
+        """
+        Agrega un contenido en memoria al ZIP.
+
+        Args:
+            data: Contenido a agregar
+            arcname: Nombre dentro del ZIP
+        """
+        self._zip.writestr(arcname, data, compress_type=self._compress_type(arcname))
+        self.entries += 1
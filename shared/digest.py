@@ -0,0 +1,85 @@
+"""
+Funciones para calcular huellas (digests) de datos.
+
+Permiten identificar por contenido archivos subidos, DataFrames y
+configuraciones, para usarlos como claves de caché entre reruns.
+"""
+
+import hashlib
+import json
+from typing import Any, List
+
+import numpy as np
+import pandas as pd
+
+
+def bytes_digest(data: bytes) -> str:
+    """
+    Calcula la huella SHA-256 de un bloque de bytes.
+
+    Args:
+        data: Bytes a resumir
+
+    Returns:
+        Huella hexadecimal
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def config_digest(config: Any) -> str:
+    """
+    Calcula la huella de una configuración serializable (dict, lista, etc.).
+
+    Las claves se ordenan para que dos configuraciones equivalentes
+    produzcan siempre la misma huella.
+
+    Args:
+        config: Configuración a resumir
+
+    Returns:
+        Huella hexadecimal
+    """
+    payload = json.dumps(config, sort_keys=True, default=str, ensure_ascii=False)
+    return bytes_digest(payload.encode('utf-8'))
+
+
+def dataframe_digest(df: pd.DataFrame) -> str:
+    """
+    Calcula la huella de un DataFrame (valores, índice, columnas y tipos).
+
+    Args:
+        df: DataFrame a resumir
+
+    Returns:
+        Huella hexadecimal
+    """
+    hasher = hashlib.sha256()
+    hasher.update(json.dumps([str(col) for col in df.columns]).encode('utf-8'))
+    hasher.update(json.dumps([str(dtype) for dtype in df.dtypes]).encode('utf-8'))
+    if len(df) > 0:
+        try:
+            row_hashes = pd.util.hash_pandas_object(df, index=True).values
+        except TypeError:
+            # Celdas no hasheables (listas, dicts): resumir su representación
+            row_hashes = pd.util.hash_pandas_object(df.astype(str), index=True).values
+        hasher.update(row_hashes.tobytes())
+    return hasher.hexdigest()
+
+
+def row_fingerprints(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """
+    Calcula una huella de 64 bits por fila a partir de algunas columnas.
+
+    Dos filas con los mismos valores (comparados como texto) en esas
+    columnas, en el mismo orden, tienen la misma huella.
+
+    Args:
+        df: DataFrame a resumir
+        columns: Columnas que forman la huella
+
+    Returns:
+        Array uint64 con una huella por fila
+    """
+    if len(df) == 0:
+        return np.empty(0, dtype=np.uint64)
+    return pd.util.hash_pandas_object(df[columns].astype(str), index=False).to_numpy()
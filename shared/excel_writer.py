@@ -0,0 +1,104 @@
+"""
+Escritura de libros Excel en modo streaming (memoria constante).
+
+Usa el modo `constant_memory` de xlsxwriter: cada fila se escribe en disco en
+cuanto se completa, de modo que el consumo de memoria no crece con el número
+de filas. Las columnas de IDs y teléfonos se formatean como texto una sola
+vez por columna, para que Excel no las convierta a número.
+"""
+
+import math
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+import xlsxwriter
+
+# Columnas que siempre se escriben como texto (IDs, DNIs y teléfonos)
+DEFAULT_TEXT_COLUMNS = {
+    'ID Ruru', 'ID Yaku', 'DNI Ruru', 'DNI Yaku',
+    'Celular Yaku', 'Celular Apoderado Ruru', 'Celular Asesoria Ruru',
+    'ID del estudiante:', 'yaku_id', 'DNI', 'dni', 'celular', 'celular_asesoria',
+}
+
+# Filas que se convierten a objetos Python de una vez al recorrer el DataFrame
+STREAM_CHUNK_ROWS = 5000
+
+
+def _is_blank(value) -> bool:
+    """Indica si un valor debe dejarse como celda vacía."""
+    if value is None or value is pd.NaT or value is pd.NA:
+        return True
+    return isinstance(value, float) and math.isnan(value)
+
+
+def _iter_rows(df: pd.DataFrame) -> Iterable[List]:
+    """
+    Recorre las filas de un DataFrame como listas de valores Python nativos.
+
+    Convierte por bloques de STREAM_CHUNK_ROWS filas, columna a columna
+    (`Series.tolist()` ya devuelve int/float/str nativos), para no duplicar
+    el DataFrame completo en memoria.
+    """
+    for start in range(0, len(df), STREAM_CHUNK_ROWS):
+        block = df.iloc[start:start + STREAM_CHUNK_ROWS]
+        columns = [block.iloc[:, j].tolist() for j in range(block.shape[1])]
+        yield from (list(row) for row in zip(*columns))
+
+
+def write_sheets_streaming(
+    sheets: Dict[str, pd.DataFrame],
+    file_path: str,
+    text_columns: Optional[Iterable[str]] = None
+) -> str:
+    """
+    Escribe varios DataFrames como hojas de un libro Excel en memoria constante.
+
+    Args:
+        sheets: Diccionario {nombre_hoja: DataFrame}, en el orden deseado
+        file_path: Ruta del archivo .xlsx a escribir
+        text_columns: Columnas a escribir como texto (por defecto DEFAULT_TEXT_COLUMNS)
+
+    Returns:
+        La ruta del archivo escrito
+    """
+    text_columns = set(DEFAULT_TEXT_COLUMNS if text_columns is None else text_columns)
+
+    workbook = xlsxwriter.Workbook(file_path, {'constant_memory': True})
+    try:
+        # Mismo estilo de encabezado que pandas.ExcelWriter
+        header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+        text_format = workbook.add_format({'num_format': '@'})
+        datetime_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+        date_format = workbook.add_format({'num_format': 'yyyy-mm-dd'})
+
+        for sheet_name, df in sheets.items():
+            worksheet = workbook.add_worksheet(sheet_name)
+            columns = [str(col) for col in df.columns]
+            is_text = [col in text_columns for col in columns]
+
+            # Formato de texto por columna, definido una sola vez
+            for j, text in enumerate(is_text):
+                if text:
+                    worksheet.set_column(j, j, None, text_format)
+
+            worksheet.write_row(0, 0, columns, header_format)
+
+            for i, row in enumerate(_iter_rows(df), start=1):
+                for j, value in enumerate(row):
+                    if _is_blank(value):
+                        continue
+                    if is_text[j]:
+                        worksheet.write_string(i, j, str(value), text_format)
+                    elif isinstance(value, datetime):
+                        worksheet.write_datetime(i, j, value.replace(tzinfo=None), datetime_format)
+                    elif isinstance(value, date):
+                        worksheet.write_datetime(i, j, value, date_format)
+                    elif isinstance(value, (bool, int, float, str)):
+                        worksheet.write(i, j, value)
+                    else:
+                        worksheet.write_string(i, j, str(value))
+    finally:
+        workbook.close()
+
+    return file_path
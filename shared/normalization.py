@@ -0,0 +1,95 @@
+"""
+Normalización de números leídos de Excel (DNIs, celulares e IDs).
+
+Excel y pandas suelen entregar estos valores como float (`987654321.0`,
+`1.2e+07`) o como texto con espacios. `clean_str_number` los convierte a un
+string limpio; `clean_number_series` aplica exactamente la misma regla a una
+columna completa de forma vectorizada.
+"""
+
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+
+# Texto que float() convierte sin sorpresas (el resto pasa por la versión escalar)
+_NUMERIC_PATTERN = r'\s*[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?\s*'
+
+# Límite para truncar floats a int64 sin desbordar
+_INT64_LIMIT = 2.0 ** 63
+
+
+def clean_str_number(val: Any) -> str:
+    """Limpia números leídos de Excel/pandas, convirtiéndolos a string limpio."""
+    if pd.isna(val) or val == '':
+        return ''
+    try:
+        # Intentar convertir a entero primero para eliminar decimales/notación científica
+        # Luego a string
+        cleaned_val = str(int(float(str(val))))
+    except (ValueError, TypeError):
+        # Si falla (ej. ya es un string con caracteres no numéricos), usar el string original
+        cleaned_val = str(val).strip()
+    # Eliminar '.0' residual por si acaso (aunque int() debería quitarlo)
+    if cleaned_val.endswith('.0'):
+        cleaned_val = cleaned_val[:-2]
+    return cleaned_val
+
+
+def clean_number_series(values: Any) -> Any:
+    """
+    Aplica clean_str_number a una columna completa sin recorrerla elemento a elemento.
+
+    Los valores numéricos (y los textos con forma de número) se truncan a
+    entero en bloque con numpy; solo los valores restantes (textos no
+    numéricos, enteros enormes) usan la versión escalar. El resultado es
+    idéntico a `values.apply(clean_str_number)`.
+
+    Args:
+        values: Serie a limpiar (un valor escalar se limpia con clean_str_number)
+
+    Returns:
+        Serie de strings con el mismo índice, o el string limpio si se pasó un escalar
+    """
+    if not isinstance(values, pd.Series):
+        if np.ndim(values) == 0:
+            return clean_str_number(values)
+        values = pd.Series(values)
+
+    result = np.empty(len(values), dtype=object)
+    if len(values) == 0:
+        return pd.Series(result, index=values.index, dtype=object)
+
+    pending = ~values.isna().to_numpy(dtype=bool)
+    result[~pending] = ''
+
+    if is_numeric_dtype(values.dtype) and not is_bool_dtype(values.dtype):
+        floats = values.to_numpy(dtype='float64', na_value=np.nan)
+    else:
+        text = values.astype(str)
+        text_values = text.to_numpy(dtype=object)
+
+        empty = pending & (text_values == '')
+        result[empty] = ''
+        pending &= ~empty
+
+        floats = np.full(len(values), np.nan)
+        numeric = pending & text.str.fullmatch(_NUMERIC_PATTERN).to_numpy(dtype=bool, na_value=False)
+        if numeric.any():
+            try:
+                # astype(float) usa float() sobre cada texto, igual que la versión escalar
+                floats[numeric] = text_values[numeric].astype('float64')
+            except (ValueError, TypeError):
+                floats[:] = np.nan
+
+    with np.errstate(invalid='ignore'):
+        fast = pending & (np.abs(floats) < _INT64_LIMIT)
+    # astype(int64) trunca hacia cero, igual que int()
+    result[fast] = floats[fast].astype(np.int64).astype(str).astype(object)
+
+    rest = pending & ~fast
+    if rest.any():
+        result[rest] = [clean_str_number(val) for val in values.to_numpy(dtype=object)[rest]]
+
+    return pd.Series(result, index=values.index, dtype=object)
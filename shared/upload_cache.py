@@ -0,0 +1,127 @@
+"""
+Lectura de archivos subidos solo cuando su contenido cambia.
+
+Streamlit vuelve a ejecutar el script en cada interacción y `st.file_uploader`
+sigue devolviendo el mismo archivo, así que leerlo directamente con
+`pd.read_excel` lo vuelve a parsear con cada clic. `parse_upload` guarda el
+resultado en el estado de sesión junto con la firma del archivo (nombre,
+tamaño y huella de sus bytes) y solo vuelve a llamar al parser cuando la
+firma o los parámetros cambian.
+"""
+
+from typing import Any, Callable, List, Optional, Tuple
+
+import streamlit as st
+
+from .digest import bytes_digest, config_digest
+
+# Clave del estado de sesión donde se guardan los resultados por uploader
+UPLOAD_CACHE_STATE_KEY = "_upload_cache"
+
+
+def upload_signature(uploaded_file: Any) -> Tuple[str, int, str]:
+    """
+    Calcula la firma de un archivo subido.
+
+    Args:
+        uploaded_file: Archivo devuelto por st.file_uploader
+
+    Returns:
+        Tupla (nombre, tamaño en bytes, huella SHA-256 del contenido)
+    """
+    data = uploaded_file.getvalue()
+    return uploaded_file.name, len(data), bytes_digest(data)
+
+
+def parse_upload(uploaded_file: Any, cache_key: str, parser: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Devuelve parser(uploaded_file, *args, **kwargs), parseando solo si el archivo cambió.
+
+    El resultado se reutiliza mientras el archivo (nombre, tamaño y huella)
+    y los argumentos extra sean los mismos. Los mensajes que muestre el
+    parser (st.success, st.error...) solo aparecen cuando realmente se
+    parsea. El objeto devuelto es el mismo en cada rerun: si el llamador lo
+    modifica, debe trabajar sobre una copia. Un resultado None (el parser
+    falló) no se guarda, así que el archivo se vuelve a parsear y su error se
+    vuelve a mostrar en cada rerun.
+
+    Args:
+        uploaded_file: Archivo devuelto por st.file_uploader (o None)
+        cache_key: Identificador del uploader (normalmente su key)
+        parser: Función que recibe el archivo y devuelve el resultado parseado
+        *args, **kwargs: Argumentos extra para el parser (forman parte de la firma)
+
+    Returns:
+        Resultado del parser, o None si no hay archivo
+    """
+    cache = st.session_state.setdefault(UPLOAD_CACHE_STATE_KEY, {})
+    if uploaded_file is None:
+        cache.pop(cache_key, None)
+        return None
+
+    entry = cache.get(cache_key)
+    params = config_digest([getattr(parser, '__qualname__', str(parser)), args, kwargs])
+    file_id = getattr(uploaded_file, 'file_id', None)
+
+    # Mismo archivo subido y mismos parámetros: no hace falta ni calcular la huella
+    if entry and file_id is not None and entry['file_id'] == file_id and entry['params'] == params:
+        return entry['result']
+
+    signature = upload_signature(uploaded_file)
+    if entry and entry['signature'] == signature and entry['params'] == params:
+        entry['file_id'] = file_id
+        return entry['result']
+
+    uploaded_file.seek(0)
+    result = parser(uploaded_file, *args, **kwargs)
+    if result is None:
+        cache.pop(cache_key, None)
+        return None
+    cache[cache_key] = {'file_id': file_id, 'signature': signature, 'params': params, 'result': result}
+    return result
+
+
+def parse_uploads(uploaded_files: Optional[List[Any]], cache_key: str, parser: Callable[..., Any], *args, **kwargs) -> List[Any]:
+    """
+    Versión de parse_upload para un uploader con accept_multiple_files=True.
+
+    Cada archivo se guarda bajo su posición en el uploader y se olvidan las
+    posiciones que ya no existen, así que quitar un archivo del uploader
+    libera su resultado.
+
+    Args:
+        uploaded_files: Lista devuelta por st.file_uploader (o None)
+        cache_key: Identificador del uploader (normalmente su key)
+        parser: Función que recibe un archivo y devuelve el resultado parseado
+        *args, **kwargs: Argumentos extra para el parser
+
+    Returns:
+        Resultados del parser en el orden de los archivos (None si alguno falló)
+    """
+    uploaded_files = list(uploaded_files or [])
+    results = [
+        parse_upload(uploaded_file, f"{cache_key}_{position}", parser, *args, **kwargs)
+        for position, uploaded_file in enumerate(uploaded_files)
+    ]
+
+    cache = st.session_state.get(UPLOAD_CACHE_STATE_KEY, {})
+    prefix = f"{cache_key}_"
+    for key in list(cache):
+        position = key[len(prefix):]
+        if key.startswith(prefix) and position.isdigit() and int(position) >= len(uploaded_files):
+            del cache[key]
+    return results
+
+
+def clear_upload_cache(cache_key: Optional[str] = None) -> None:
+    """
+    Olvida los resultados guardados para forzar un nuevo parseo.
+
+    Args:
+        cache_key: Uploader a limpiar (todos si es None)
+    """
+    cache = st.session_state.get(UPLOAD_CACHE_STATE_KEY, {})
+    if cache_key is None:
+        cache.clear()
+    else:
+        cache.pop(cache_key, None)
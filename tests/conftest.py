@@ -0,0 +1,137 @@
+"""
+Fixtures compartidas por las pruebas.
+
+`smtp_server` levanta un servidor SMTP mínimo en 127.0.0.1 (puerto efímero)
+que guarda los mensajes recibidos y permite programar fallos: respuestas a
+MAIL FROM y a RCPT TO, destinatarios rechazados y cierres de conexión tras N
+mensajes.
+"""
+
+import socketserver
+import threading
+from typing import List, Optional, Tuple
+
+import pytest
+
+from emailing.core.email_sender import SMTPSender
+
+SENDER_EMAIL = "notificaciones@example.org"
+
+
+class _SMTPStubHandler(socketserver.StreamRequestHandler):
+    """Atiende una conexión SMTP (sin STARTTLS ni autenticación)."""
+
+    def _reply(self, line: str) -> None:
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self) -> None:
+        server = self.server
+        with server.lock:
+            server.connections += 1
+            connection_id = server.connections
+        delivered = 0
+        recipients: List[str] = []
+        self._reply("220 stub ESMTP")
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("utf-8", "replace").strip()
+            verb = command[:4].upper()
+            if verb == "EHLO":
+                self.wfile.write(b"250-stub\r\n250 8BITMIME\r\n")
+            elif verb == "HELO":
+                self._reply("250 stub")
+            elif verb == "MAIL":
+                with server.lock:
+                    scripted = server.mail_replies.pop(0) if server.mail_replies else None
+                if scripted:
+                    self._reply(scripted)
+                    continue
+                recipients = []
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                address = command[command.find("<") + 1:command.rfind(">")]
+                with server.lock:
+                    scripted = server.rcpt_replies.pop(0) if server.rcpt_replies else None
+                if scripted:
+                    self._reply(scripted)
+                    continue
+                if address in server.rejected_recipients:
+                    self._reply("550 Mailbox unavailable")
+                    continue
+                recipients.append(address)
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for data_line in self.rfile:
+                    if data_line == b".\r\n":
+                        break
+                    data.append(data_line)
+                with server.lock:
+                    server.messages.append((connection_id, list(recipients), b"".join(data)))
+                self._reply("250 OK")
+                delivered += 1
+                if server.drop_after and delivered >= server.drop_after:
+                    return  # El servidor cierra la conexión sin QUIT
+            elif verb in ("RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    """Servidor SMTP de prueba con registro de conexiones y mensajes."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SMTPStubHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages: List[Tuple[int, List[str], bytes]] = []  # (conexión, destinatarios, datos)
+        self.mail_replies: List[str] = []        # Respuestas programadas para los próximos MAIL FROM
+        self.rcpt_replies: List[str] = []        # Respuestas programadas para los próximos RCPT TO
+        self.rejected_recipients = set()         # Destinatarios rechazados con 550
+        self.drop_after: Optional[int] = None    # Cerrar cada conexión tras N mensajes
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def received(self) -> List[str]:
+        """Destinatarios de los mensajes aceptados, en orden de llegada."""
+        with self.lock:
+            return [recipient for _, recipients, _ in self.messages for recipient in recipients]
+
+
+@pytest.fixture
+def smtp_server():
+    server = SMTPStub()
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_sender(smtp_server):
+    """Crea emisores SMTPSender apuntando al servidor de prueba."""
+
+    def _make(**kwargs) -> SMTPSender:
+        options = dict(
+            host="127.0.0.1", port=smtp_server.port, user=None, password=None,
+            use_tls=False, rate_per_minute=0, backoff=0.01, timeout=5,
+            sender_email=SENDER_EMAIL
+        )
+        options.update(kwargs)
+        return SMTPSender(**options)
+
+    return _make
@@ -0,0 +1,132 @@
+"""Pruebas del envío masivo con registro de entregas contra un servidor SMTP local."""
+
+import asyncio
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+import emailing.core.email_dispatcher as email_dispatcher
+from emailing.core.email_dispatcher import (
+    STATUS_FAILED,
+    STATUS_SENT,
+    dispatch_async,
+    dispatch_key,
+    dispatch_name,
+    get_journal,
+    start_dispatch,
+)
+
+
+class _Interrupted(Exception):
+    """Simula que el proceso se detiene a mitad del envío."""
+
+
+def _messages(count):
+    return [
+        {
+            'key': dispatch_key(f"Y{i}", f"R{i}", "Letras"),
+            'recipient_email': f"yaku{i}@example.org",
+            'subject': f"Asignación {i}",
+            'html_content': f"<p>Hola {i}</p>",
+        }
+        for i in range(count)
+    ]
+
+
+def _wait(job, timeout=10):
+    deadline = time.monotonic() + timeout
+    while job.running and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not job.running
+
+
+def test_resume_skips_sent_and_retries_failed(smtp_server, make_sender, monkeypatch, tmp_path):
+    monkeypatch.setattr(email_dispatcher, "EMAIL_JOURNAL_DIR", str(tmp_path))
+    journal = get_journal("bienvenida_Letras")
+    messages = _messages(8)
+    by_key = {message['key']: message['recipient_email'] for message in messages}
+
+    # 1. Primer envío: el segundo destinatario se rechaza y el proceso se
+    #    interrumpe tras registrar tres resultados
+    smtp_server.rejected_recipients = {messages[1]['recipient_email']}
+    finished = []
+
+    def _interrupt(key, status):
+        finished.append((key, status))
+        if len(finished) == 3:
+            raise _Interrupted()
+
+    with make_sender(pool_size=1) as sender, pytest.raises(_Interrupted):
+        asyncio.run(dispatch_async(messages, journal, sender, concurrency=1, on_result=_interrupt))
+
+    records = journal.load()
+    sent_before = {by_key[key] for key, record in records.items() if record['status'] == STATUS_SENT}
+    failed_before = {by_key[key] for key, record in records.items() if record['status'] == STATUS_FAILED}
+    assert sent_before == {messages[0]['recipient_email'], messages[2]['recipient_email']}
+    assert failed_before == {messages[1]['recipient_email']}
+    assert len(records) == len(messages)  # Los no terminados quedan como 'queued'
+
+    # 2. Reanudar con el servidor ya aceptando a todos
+    smtp_server.rejected_recipients = set()
+    job = start_dispatch("bienvenida_Letras", messages, concurrency=2, sender_factory=lambda: make_sender(pool_size=2))
+    _wait(job)
+
+    assert job.error is None
+    assert job.summary['skipped'] == len(sent_before)
+    assert job.summary[STATUS_FAILED] == 0
+    assert all(record['status'] == STATUS_SENT for record in journal.load().values())
+
+    received = Counter(smtp_server.received())
+    # Nadie registrado como enviado recibe un segundo correo
+    assert all(received[recipient] == 1 for recipient in sent_before)
+    # El fallido se reintenta y todos los pendientes se entregan
+    assert received[messages[1]['recipient_email']] == 1
+    assert set(received) == set(by_key.values())
+
+
+def test_completed_dispatch_sends_nothing_again(smtp_server, make_sender, monkeypatch, tmp_path):
+    monkeypatch.setattr(email_dispatcher, "EMAIL_JOURNAL_DIR", str(tmp_path))
+    messages = _messages(5)
+
+    for _ in range(2):
+        job = start_dispatch("recordatorio", messages, sender_factory=lambda: make_sender(pool_size=2))
+        _wait(job)
+        assert job.error is None
+
+    assert job.summary == {STATUS_SENT: 0, STATUS_FAILED: 0, 'skipped': len(messages)}
+    assert sorted(smtp_server.received()) == sorted(message['recipient_email'] for message in messages)
+
+
+def test_dispatches_are_scoped_to_their_message_set(smtp_server, make_sender, monkeypatch, tmp_path):
+    monkeypatch.setattr(email_dispatcher, "EMAIL_JOURNAL_DIR", str(tmp_path))
+    mine, theirs = _messages(3), _messages(6)[3:]
+    assert dispatch_name("asignacion", mine) == dispatch_name("asignacion", list(reversed(mine)))
+    assert dispatch_name("asignacion", mine) != dispatch_name("asignacion", theirs)
+
+    # Un envío en curso (bloqueado hasta soltar el evento) para "mis" mensajes
+    release = threading.Event()
+
+    def _blocked_sender():
+        release.wait(10)
+        return make_sender(pool_size=1)
+
+    name = dispatch_name("asignacion", mine)
+    job = start_dispatch(name, mine, sender_factory=_blocked_sender)
+    try:
+        # Otro coordinador con sus propios mensajes obtiene su propio envío
+        other = start_dispatch(dispatch_name("asignacion", theirs), theirs, sender_factory=lambda: make_sender(pool_size=1))
+        assert other is not job
+        _wait(other)
+        # Con el mismo registro, solo se reutiliza el envío si los mensajes coinciden
+        assert start_dispatch(name, mine) is job
+        with pytest.raises(RuntimeError):
+            start_dispatch(name, theirs)
+    finally:
+        release.set()
+    _wait(job)
+
+    assert sorted(smtp_server.received()) == sorted(m['recipient_email'] for m in mine + theirs)
+    # Cada conjunto tiene su propio registro
+    assert set(get_journal(name).load()) == {m['key'] for m in mine}
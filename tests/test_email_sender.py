@@ -0,0 +1,70 @@
+"""Pruebas de SMTPSender contra un servidor SMTP local."""
+
+import emailing.core.email_sender as email_sender
+
+
+def _messages(count):
+    return [
+        {'recipient_email': f"yaku{i}@example.org", 'subject': f"Asignación {i}", 'html_content': f"<p>Hola {i}</p>"}
+        for i in range(count)
+    ]
+
+
+def test_send_batch_reuses_one_pooled_connection(smtp_server, make_sender):
+    messages = _messages(10)
+    with make_sender(pool_size=1) as sender:
+        results = sender.send_batch(messages)
+
+    assert [result['recipient_email'] for result in results] == [m['recipient_email'] for m in messages]
+    assert all(result['success'] and result['attempts'] == 1 for result in results)
+    assert smtp_server.connections == 1
+    assert sorted(smtp_server.received()) == sorted(m['recipient_email'] for m in messages)
+
+
+def test_reconnects_after_server_drops_connection(smtp_server, make_sender):
+    smtp_server.drop_after = 3
+    messages = _messages(7)
+    with make_sender(pool_size=1) as sender:
+        results = sender.send_batch(messages)
+
+    assert all(result['success'] for result in results)
+    # Cada 3 mensajes el servidor cierra la conexión y el emisor abre otra
+    assert smtp_server.connections == 3
+    assert sorted(smtp_server.received()) == sorted(m['recipient_email'] for m in messages)
+
+
+def test_retries_transient_errors_with_backoff(smtp_server, make_sender, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(email_sender.time, "sleep", sleeps.append)
+    smtp_server.mail_replies = ["451 Try again later", "421 Service busy"]
+
+    with make_sender(pool_size=1, max_retries=3, backoff=0.5) as sender:
+        result = sender.send("yaku@example.org", "Asignación", "<p>Hola</p>")
+
+    assert result['success'] and result['attempts'] == 3
+    assert sleeps == [0.5, 1.0]
+    assert smtp_server.received() == ["yaku@example.org"]
+
+
+def test_retries_recipients_refused_with_transient_code(smtp_server, make_sender, monkeypatch):
+    monkeypatch.setattr(email_sender.time, "sleep", lambda seconds: None)
+    smtp_server.rcpt_replies = ["450 Greylisted, try again later"]
+
+    with make_sender(pool_size=1, max_retries=3) as sender:
+        result = sender.send("yaku@example.org", "Asignación", "<p>Hola</p>")
+
+    assert result['success'] and result['attempts'] == 2
+    assert smtp_server.received() == ["yaku@example.org"]
+
+
+def test_permanent_errors_are_not_retried(smtp_server, make_sender):
+    smtp_server.rejected_recipients = {"nadie@example.org"}
+    with make_sender(pool_size=1, max_retries=3) as sender:
+        rejected = sender.send("nadie@example.org", "Asignación", "<p>Hola</p>")
+        accepted = sender.send("yaku@example.org", "Asignación", "<p>Hola</p>")
+
+    assert not rejected['success'] and rejected['attempts'] == 1
+    assert accepted['success']
+    # Tras el rechazo la conexión se reinicia con RSET y se reutiliza
+    assert smtp_server.connections == 1
+    assert smtp_server.received() == ["yaku@example.org"]
@@ -1,3 +1,4 @@
+from collections import OrderedDict
 from itertools import product
 from google.oauth2.credentials import Credentials
 from google.oauth2 import service_account
@@ -42,9 +43,28 @@ class Yaku:
         self.nivel_quechua = nivel_quechua  # Nivel de idioma quechua
         self.grados = grados  # Lista de grados que puede enseñar
 
+# Máximo de intersecciones guardadas en el caché LRU de MatchMaker
+MAX_CACHE_INTERSECCIONES = 50000
+
+class Interseccion(dict):
+    """
+    Intersección de horarios ({dia: [(inicio, fin), ...]} en formato HHMM)
+    que además guarda sus horas, calculadas igual que calcular_horas_asignadas.
+    """
+    def __init__(self, rangos, horas):
+        super().__init__(rangos)
+        self.horas = horas
+
 class MatchMaker:
-    def __init__(self):
-        self._cache_intersecciones = {}
+    def __init__(self, max_cache_intersecciones=MAX_CACHE_INTERSECCIONES):
+        # Caché LRU acotado: (id horario Ruru, id horario Yaku) -> Interseccion
+        self._cache_intersecciones = OrderedDict()
+        self._max_cache_intersecciones = max_cache_intersecciones
+        # Horarios internados: contenido -> id, y por id sus rangos por día en HHMM y en horas
+        self._ids_horarios = {}
+        self._horarios_internados = []
+        # Atajo por identidad del diccionario (se guarda la referencia para que su id no se reutilice)
+        self._ids_por_objeto = {}
     
     def es_idioma_compatible(self, idioma_ruru, nivel_quechua_yaku):
         """
@@ -72,6 +92,9 @@ class MatchMaker:
         """
         Calcula cuántas horas hay en la intersección de horarios.
         """
+        # Las intersecciones de encontrar_interseccion ya traen sus horas
+        if isinstance(interseccion, Interseccion):
+            return interseccion.horas
         total_horas = 0
         for dia, rangos in interseccion.items():
             for (inicio, fin) in rangos:
@@ -80,48 +103,131 @@ class MatchMaker:
                 total_horas += (h2 - h1)
         return round(total_horas, 1)
 
+    def _internar_horario(self, horarios):
+        """
+        Devuelve el id entero de un horario, registrándolo la primera vez.
+
+        Horarios con el mismo contenido comparten id. Se asume que la
+        disponibilidad de un Ruru o Yaku no se modifica después de usarla.
+        """
+        entrada = self._ids_por_objeto.get(id(horarios))
+        if entrada is not None and entrada[0] is horarios:
+            return entrada[1]
+
+        clave = tuple((dia, tuple(rangos)) for dia, rangos in sorted(horarios.items()))
+        horario_id = self._ids_horarios.get(clave)
+        if horario_id is None:
+            horario_id = len(self._horarios_internados)
+            self._ids_horarios[clave] = horario_id
+            self._horarios_internados.append({
+                dia: [(inicio, fin, (inicio // 100) + (inicio % 100) / 60, (fin // 100) + (fin % 100) / 60)
+                      for inicio, fin in rangos]
+                for dia, rangos in horarios.items()
+            })
+        self._ids_por_objeto[id(horarios)] = (horarios, horario_id)
+        return horario_id
+
     def encontrar_interseccion(self, horarios_ruru, horarios_yaku):
-        # Crear una clave única para esta combinación de horarios
-        clave = (
-            tuple((d, tuple(h)) for d,h in sorted(horarios_ruru.items())),
-            tuple((d, tuple(h)) for d,h in sorted(horarios_yaku.items()))
-        )
-        
-        if clave not in self._cache_intersecciones:
-            self._cache_intersecciones[clave] = self._calcular_interseccion(horarios_ruru, horarios_yaku)
-        
-        return self._cache_intersecciones[clave]
+        # Clave de dos enteros: los horarios se internan una sola vez
+        clave = (self._internar_horario(horarios_ruru), self._internar_horario(horarios_yaku))
+
+        interseccion = self._cache_intersecciones.get(clave)
+        if interseccion is None:
+            interseccion = self._calcular_interseccion(*clave)
+            self._cache_intersecciones[clave] = interseccion
+            # Caché acotado: se descarta la intersección usada hace más tiempo
+            while len(self._cache_intersecciones) > self._max_cache_intersecciones:
+                self._cache_intersecciones.popitem(last=False)
+        else:
+            self._cache_intersecciones.move_to_end(clave)
+
+        return interseccion
 
-    def _calcular_interseccion(self, horarios_ruru, horarios_yaku):
+    def _calcular_interseccion(self, id_ruru, id_yaku):
         """
-        Calcula la intersección de horarios entre un Ruru y un Yaku.
-        Retorna un diccionario con los rangos de tiempo que coinciden.
+        Calcula la intersección de horarios entre un Ruru y un Yaku (por id internado).
+        Retorna una Interseccion con los rangos de tiempo que coinciden y sus horas.
         """
-        interseccion = {}
-        
+        horarios_ruru = self._horarios_internados[id_ruru]
+        horarios_yaku = self._horarios_internados[id_yaku]
+        rangos_comunes = {}
+        total_horas = 0
+
         # Iterar sobre los días que aparecen en ambos horarios
         dias_comunes = set(horarios_ruru.keys()) & set(horarios_yaku.keys())
-        
+
         for dia in dias_comunes:
-            rangos_ruru = horarios_ruru[dia]
-            rangos_yaku = horarios_yaku[dia]
-            
             # Encontrar intersecciones para cada combinación de rangos
             rangos_interseccion = []
-            for (inicio_r, fin_r) in rangos_ruru:
-                for (inicio_y, fin_y) in rangos_yaku:
-                    # Calcular el rango de intersección
+            for (inicio_r, fin_r, h_inicio_r, h_fin_r) in horarios_ruru[dia]:
+                for (inicio_y, fin_y, h_inicio_y, h_fin_y) in horarios_yaku[dia]:
                     inicio = max(inicio_r, inicio_y)
                     fin = min(fin_r, fin_y)
-                    
+
                     if inicio < fin:  # Si hay intersección
                         rangos_interseccion.append((inicio, fin))
-            
+                        # Mismas horas (y mismo orden de suma) que calcular_horas_asignadas
+                        h1 = h_inicio_r if inicio == inicio_r else h_inicio_y
+                        h2 = h_fin_r if fin == fin_r else h_fin_y
+                        total_horas += (h2 - h1)
+
             # Si encontramos intersecciones para este día, las guardamos
             if rangos_interseccion:
-                interseccion[dia] = rangos_interseccion
-        
-        return interseccion
+                rangos_comunes[dia] = rangos_interseccion
+
+        return Interseccion(rangos_comunes, round(total_horas, 1))
+
+    def construir_indice_candidatos(self, yakus):
+        """
+        Indexa a los Yakus por (opción, grado, habla quechua).
+
+        Retorna el índice {(opcion, grado, habla_quechua): [posiciones]} con las
+        posiciones en el orden de la lista, y un nivel de quechua representativo
+        de cada clase para evaluar es_idioma_compatible una vez por clase.
+        """
+        indice = {}
+        niveles_por_clase = {}
+        for posicion, yaku in enumerate(yakus):
+            clase = yaku.nivel_quechua != "No lo hablo"
+            niveles_por_clase.setdefault(clase, yaku.nivel_quechua)
+            for opcion in set(yaku.opciones):
+                for grado in set(yaku.grados):
+                    indice.setdefault((opcion, grado, clase), []).append(posicion)
+        return indice, niveles_por_clase
+
+    def _candidatos(self, ruru, indice, niveles_por_clase):
+        """
+        Posiciones de los Yakus que pasan _es_match_valido para el Ruru, en el orden original.
+        """
+        clases = [clase for clase, nivel in niveles_por_clase.items() if self.es_idioma_compatible(ruru.idioma, nivel)]
+        posiciones = set()
+        for opcion in ruru.opciones:
+            for clase in clases:
+                posiciones.update(indice.get((opcion, ruru.grado, clase), ()))
+        return sorted(posiciones)
+
+    def _mejor_yaku(self, ruru, candidatos, yakus, rurus_por_yaku, horas_minimas):
+        """
+        Elige entre los candidatos el Yaku con más horas en común (>= horas_minimas),
+        desempatando por menor carga y luego por orden en la lista.
+        """
+        mejor_match = None
+        mejor_horas = 0.0
+        menor_carga = float('inf')  # Para contar cuántos Rurus ya tiene el Yaku
+
+        for posicion in candidatos:
+            yaku = yakus[posicion]
+            inter = self.encontrar_interseccion(ruru.disponibilidad, yaku.disponibilidad)
+            horas = self.calcular_horas_asignadas(inter)
+            if horas >= horas_minimas:
+                carga_actual = rurus_por_yaku[yaku.nombre]
+                # Priorizar Yakus con menos carga
+                if (horas > mejor_horas) or (horas == mejor_horas and carga_actual < menor_carga):
+                    mejor_horas = horas
+                    menor_carga = carga_actual
+                    opcion_comun = next(op for op in ruru.opciones if op in yaku.opciones)
+                    mejor_match = (ruru.nombre, yaku.nombre, opcion_comun, inter, 0)
+        return mejor_match
 
     def encontrar_match(self, rurus, yakus):
         matches_principales = []
@@ -130,51 +236,25 @@ class MatchMaker:
         # Diccionario para llevar cuenta de cuántos Rurus tiene cada Yaku
         rurus_por_yaku = {yaku.nombre: 0 for yaku in yakus}
 
-        # Fase 1: matches de 2+ horas
-        for ruru in rurus:
-            mejor_match = None
-            mejor_horas = 0.0
-            menor_carga = float('inf')  # Para contar cuántos Rurus ya tiene el Yaku
-
-            for yaku in yakus:
-                if self._es_match_valido(ruru, yaku):
-                    inter = self.encontrar_interseccion(ruru.disponibilidad, yaku.disponibilidad)
-                    horas = self.calcular_horas_asignadas(inter)
-                    if horas >= 2:
-                        carga_actual = rurus_por_yaku[yaku.nombre]
-                        # Priorizar Yakus con menos carga
-                        if (horas > mejor_horas) or (horas == mejor_horas and carga_actual < menor_carga):
-                            mejor_horas = horas
-                            menor_carga = carga_actual
-                            opcion_comun = next(op for op in ruru.opciones if op in yaku.opciones)
-                            mejor_match = (ruru.nombre, yaku.nombre, opcion_comun, inter, 0)
+        # Candidatos de cada Ruru (opción, grado y quechua compatibles), calculados una vez para ambas fases
+        indice, niveles_por_clase = self.construir_indice_candidatos(yakus)
+        candidatos_por_ruru = [self._candidatos(ruru, indice, niveles_por_clase) for ruru in rurus]
 
+        # Fase 1: matches de 2+ horas
+        rurus_con_match = set()
+        for ruru, candidatos in zip(rurus, candidatos_por_ruru):
+            mejor_match = self._mejor_yaku(ruru, candidatos, yakus, rurus_por_yaku, 2)
             if mejor_match:
                 matches_principales.append(mejor_match)
+                rurus_con_match.add(ruru.nombre)
                 # Actualizar el contador de Rurus para este Yaku
                 rurus_por_yaku[mejor_match[1]] += 1
 
-        # Identificar rurus sin match principal 
-        rurus_sin_match = [r for r in rurus if not any(m[0] == r.nombre for m in matches_principales)]
-        
-        # Fase 2: matches de 1+ hora (similar a la fase 1 pero con diferente umbral de horas)
-        for ruru in rurus_sin_match:
-            mejor_match = None
-            mejor_horas = 0.0
-            menor_carga = float('inf')
-
-            for yaku in yakus:
-                if self._es_match_valido(ruru, yaku):
-                    inter = self.encontrar_interseccion(ruru.disponibilidad, yaku.disponibilidad)
-                    horas = self.calcular_horas_asignadas(inter)
-                    if horas >= 1:
-                        carga_actual = rurus_por_yaku[yaku.nombre]
-                        if (horas > mejor_horas) or (horas == mejor_horas and carga_actual < menor_carga):
-                            mejor_horas = horas
-                            menor_carga = carga_actual
-                            opcion_comun = next(op for op in ruru.opciones if op in yaku.opciones)
-                            mejor_match = (ruru.nombre, yaku.nombre, opcion_comun, inter, 0)
-
+        # Fase 2: matches de 1+ hora para los Rurus sin match principal
+        for ruru, candidatos in zip(rurus, candidatos_por_ruru):
+            if ruru.nombre in rurus_con_match:
+                continue
+            mejor_match = self._mejor_yaku(ruru, candidatos, yakus, rurus_por_yaku, 1)
             if mejor_match:
                 matches_secundarios.append(mejor_match)
                 rurus_por_yaku[mejor_match[1]] += 1